@@ -0,0 +1,204 @@
+"""
+asyncio fetch engine for the Realtime Database REST API.
+
+The engine is thread-backed: there is no async HTTP client among the
+dependencies, so each request is a blocking firebase_rest.fetch() on a worker
+thread. The event loop schedules work and applies backpressure: new requests
+are started only as results are consumed. Up to `max_in_flight` requests are
+queued, but at most MAX_THREADS run at once, so a large in-flight limit costs
+queued tasks rather than OS threads. requests.Session is not documented as
+thread-safe, so every worker thread has its own session with a one-connection
+keep-alive pool: each thread reuses its TCP+TLS connection from request to
+request.
+
+    fetcher = AsyncFetcher(max_in_flight=128)
+    data = asyncio.run(fetcher.fetch("Device_1/BME_01", shallow=True))  # same signature as fetch()
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+import requests
+
+import firebase_rest
+from firebase_rest import SHARD_DEPTH, ShardCheckpoint, new_session, print_shard_progress, set_path, shard_entry
+
+
+# Worker threads, each running one blocking request at a time; further in-flight requests wait for one
+MAX_THREADS = 64
+
+
+class AsyncFetcher:
+    """Awaitable drop-in for firebase_rest.fetch(), run on a bounded pool of threads with a session each."""
+
+    def __init__(self, max_in_flight: int = 64, max_threads: int = MAX_THREADS):
+        self.max_in_flight = max(1, max_in_flight)
+        self.threads = max(1, min(self.max_in_flight, max_threads))
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="rtdb-fetch")
+        self._local = threading.local()
+        self._sessions: list[requests.Session] = []
+        self._sessions_lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        """The calling worker thread's own keep-alive session."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = new_session(pool_size=1)
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def _fetch(self, path: str, shallow: bool, timeout: int, query: Optional[dict], missing: Any) -> Any:
+        return firebase_rest.fetch(path, shallow, timeout, query, self._session(), missing=missing)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        for session in self._sessions:
+            session.close()
+
+    def __enter__(self) -> "AsyncFetcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    async def fetch(
+        self,
+        path: str = "",
+        shallow: bool = False,
+        timeout: int = 120,
+        query: Optional[dict] = None,
+        missing: Any = None,
+    ) -> Any:
+        """Same arguments and result as firebase_rest.fetch(); None on failure."""
+        loop = asyncio.get_running_loop()
+        call = partial(self._fetch, path, shallow, timeout, query, missing)
+        return await loop.run_in_executor(self._executor, call)
+
+    async def timed_fetch(self, path: str, **kwargs) -> tuple[str, Any, float]:
+        """fetch() that also reports the path and the seconds it took."""
+        start = time.perf_counter()
+        value = await self.fetch(path, **kwargs)
+        return path, value, time.perf_counter() - start
+
+    async def fetch_many(self, paths: Iterable[str], **kwargs) -> AsyncIterator[tuple[str, Any, float]]:
+        """
+        Yield (path, value, seconds) as requests finish. At most max_in_flight requests are
+        outstanding and `paths` is consumed lazily, so a slow consumer throttles the producer.
+        """
+        remaining = iter(paths)
+        pending: set[asyncio.Task] = set()
+
+        def launch() -> None:
+            while len(pending) < self.max_in_flight:
+                path = next(remaining, None)
+                if path is None:
+                    return
+                pending.add(asyncio.create_task(self.timed_fetch(path, **kwargs)))
+
+        launch()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+            launch()
+
+
+async def crawl_sharded(
+    fetcher: AsyncFetcher,
+    timeout: int = 180,
+    progress: Optional[Callable[[int, int, dict], None]] = print_shard_progress,
+    checkpoint: Optional[ShardCheckpoint] = None,
+) -> tuple[Optional[dict], list[dict]]:
+    """
+    Async counterpart of firebase_rest.fetch_sharded(). Listing and downloading are pipelined:
+    as soon as a BME listing returns, its Hp shards are queued next to the shallow requests still
+    running, instead of waiting for a whole level to finish. Returns the same (data, shards) and
+    honours `checkpoint` the same way.
+    """
+    root = await fetcher.fetch("", shallow=True, timeout=min(timeout, 60))
+    if root is None:
+        return None, []
+    tree: dict = {}
+    if not isinstance(root, dict):
+        return tree, []
+
+    # (path, depth): depth < SHARD_DEPTH means a shallow listing, depth == SHARD_DEPTH a leaf download
+    todo = deque((key, 1) for key in sorted(root))
+    pending: dict[asyncio.Task, tuple[str, int]] = {}
+    shards: list[dict] = []
+    leaves_seen = leaves_done = 0
+
+    def finish_leaf(path: str, value: Any, seconds: float, cached: bool = False) -> None:
+        nonlocal leaves_done
+        shard = shard_entry(path, value, seconds, cached=cached)
+        if value is not None:
+            set_path(tree, path, value)
+        shards.append(shard)
+        leaves_done += 1
+        if progress:
+            # The total grows while listings are still arriving
+            progress(leaves_done, leaves_seen, shard)
+
+    while todo or pending:
+        while todo and len(pending) < fetcher.max_in_flight:
+            path, depth = todo.popleft()
+            if depth == SHARD_DEPTH and checkpoint:
+                value = checkpoint.load(path)
+                if value is not None:
+                    finish_leaf(path, value, 0.0, cached=True)
+                    continue
+            if depth < SHARD_DEPTH:
+                task = asyncio.create_task(fetcher.timed_fetch(path, shallow=True, timeout=min(timeout, 60)))
+            else:
+                # A node deleted since it was listed is empty, not a failed shard
+                task = asyncio.create_task(fetcher.timed_fetch(path, timeout=timeout, missing={}))
+            pending[task] = (path, depth)
+        if not pending:
+            # Every leaf queued so far came from the checkpoint
+            continue
+
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            path, depth = pending.pop(task)
+            _path, value, seconds = task.result()
+            if depth < SHARD_DEPTH:
+                if isinstance(value, dict):
+                    children = [(f"{path}/{key}", depth + 1) for key in sorted(value)]
+                    if depth + 1 == SHARD_DEPTH:
+                        leaves_seen += len(children)
+                        # Leaves go first so finished listings turn into downloads promptly
+                        todo.extendleft(reversed(children))
+                    else:
+                        todo.extend(children)
+                elif value is None:
+                    shards.append(shard_entry(path, None, seconds))
+                else:
+                    set_path(tree, path, value)
+                continue
+
+            if value is not None and checkpoint:
+                checkpoint.save(path, value)
+            finish_leaf(path, value, seconds)
+
+    shards.sort(key=lambda s: s["path"])
+    return tree, shards
+
+
+def fetch_sharded_async(
+    max_in_flight: int = 64,
+    timeout: int = 180,
+    progress: Optional[Callable[[int, int, dict], None]] = print_shard_progress,
+    checkpoint: Optional[ShardCheckpoint] = None,
+) -> tuple[Optional[dict], list[dict]]:
+    """Blocking entry point: run crawl_sharded() on a fresh event loop with its own worker threads."""
+    async def run():
+        with AsyncFetcher(max_in_flight=max_in_flight) as fetcher:
+            return await crawl_sharded(fetcher, timeout=timeout, progress=progress, checkpoint=checkpoint)
+
+    return asyncio.run(run())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the schema extractor stages on generated trees.
+
+Each size runs in a fresh process, so one size's garbage does not inflate the
+next size's memory. Per stage it records wall time, the peak RSS reached
+while the stage ran (Linux: VmHWM is reset before each stage) and, in a
+second tracemalloc pass, the peak and net Python allocations.
+
+Usage: python scripts/benchmark_schema.py --output bench.json                 # 10k, 1M, 10M records
+       python scripts/benchmark_schema.py --sizes 10000 1000000 --save-baseline baseline.json
+       python scripts/benchmark_schema.py --sizes 10000 1000000 --baseline baseline.json  # exit 1 on regression
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from multiprocessing import get_context
+from typing import Any, Callable, Optional
+
+from extract_firebase_schema import (
+    build_detailed_schema, extract_complete_schema, extract_complete_schema_parallel, print_schema,
+)
+from generate_dataset import DatasetConfig, iter_events
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+BENCHMARK_VERSION = 1
+
+
+def build_tree(records: int, seed: int = 0) -> dict:
+    """Generated tree with ~100k records per device, so larger sizes also mean a larger fleet."""
+    config = DatasetConfig(devices=max(3, records // 100_000), records=records, seed=seed)
+    tree: dict = {}
+    for device_id, sensor_id, hp_id, ts_key, record in iter_events(config):
+        tree.setdefault(device_id, {}).setdefault(sensor_id, {}).setdefault(hp_id, {})[ts_key] = record
+    return tree
+
+
+def print_both(state: dict) -> None:
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        print_schema(state["complete_schema"])
+        print_schema(state["detailed_schema"], max_children=15)
+
+
+# Stages run in this order; each reads the tree (and earlier results) from `state` and returns its result
+STAGES: dict[str, Callable[[dict], Any]] = {
+    "extract_complete_schema": lambda state: extract_complete_schema(state["tree"]),
+    "extract_complete_schema_value_stats": lambda state: extract_complete_schema(
+        state["tree"], value_stats=True, map_formats=True,
+    ),
+    "build_detailed_schema": lambda state: build_detailed_schema(state["tree"], "root"),
+    "print_schema": print_both,
+}
+_RESULT_KEYS = {"extract_complete_schema": "complete_schema", "build_detailed_schema": "detailed_schema"}
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's high-water mark for this process (Linux only); False if unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _rss_mb(field: str) -> Optional[float]:
+    """VmRSS / VmHWM from /proc/self/status in MB, None where unavailable."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def run_size(records: int, seed: int = 0, allocations: bool = True, workers: int = 0) -> list[dict]:
+    """
+    Run every stage on one generated tree (in the current process); one result dict per stage.
+    With `workers`, extract_complete_schema_parallel on that many processes is timed as well.
+    """
+    state = {"tree": build_tree(records, seed)}
+    stages = dict(STAGES)
+    if workers:
+        stages["extract_complete_schema_parallel"] = lambda state: extract_complete_schema_parallel(state["tree"], workers)
+    results = []
+    for stage, run in stages.items():
+        gc.collect()
+        rss_before = _rss_mb("VmRSS")
+        resettable = _reset_peak_rss()
+        start = time.perf_counter()
+        value = run(state)
+        seconds = time.perf_counter() - start
+        if resettable:
+            peak = _rss_mb("VmHWM")
+        else:
+            # ru_maxrss is the lifetime peak (KB on Linux, bytes on macOS)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        result = {
+            "records": records,
+            "stage": stage,
+            "seconds": round(seconds, 4),
+            "rss_before_mb": round(rss_before, 1) if rss_before is not None else None,
+            "peak_rss_mb": round(peak, 1),
+        }
+
+        if allocations:
+            # Separate pass: tracemalloc slows the stage down too much to time it at the same time
+            gc.collect()
+            tracemalloc.start()
+            run(state)
+            current, peak_traced = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["alloc_peak_mb"] = round(peak_traced / (1024 * 1024), 2)
+            result["alloc_net_mb"] = round(current / (1024 * 1024), 2)
+
+        if stage in _RESULT_KEYS:
+            state[_RESULT_KEYS[stage]] = value
+        results.append(result)
+        print(f"  {records:>11,} records  {stage:<32} {seconds:9.3f}s  peak RSS {result['peak_rss_mb']:8.1f} MB"
+              + (f"  alloc peak {result['alloc_peak_mb']:8.1f} MB" if allocations else ""), flush=True)
+    return results
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float, min_seconds: float, min_mb: float) -> list[str]:
+    """Regressions against a baseline results file: slower or bigger by more than `tolerance`, above noise floors."""
+    reference = {(r["records"], r["stage"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base = reference.get((result["records"], result["stage"]))
+        if base is None:
+            continue
+        for metric, floor in (("seconds", min_seconds), ("peak_rss_mb", min_mb), ("alloc_peak_mb", min_mb)):
+            new, old = result.get(metric), base.get(metric)
+            if new is None or old is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > floor:
+                regressions.append(f"{result['stage']} @ {result['records']:,} records: {metric} {old} -> {new} "
+                                   f"(+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the schema extractor stages on generated trees.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Record counts to benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Also benchmark extract_complete_schema_parallel with this many processes")
+    parser.add_argument("--no-allocations", action="store_true", help="Skip the tracemalloc pass (halves the run time)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Results file to compare against; exit status 1 on regression")
+    parser.add_argument("--save-baseline", metavar="FILE", help="Also write the results to FILE as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown / growth (0.25 = 25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="Ignore time differences below this")
+    parser.add_argument("--min-mb", type=float, default=20.0, help="Ignore memory differences below this")
+    args = parser.parse_args()
+
+    report = {
+        "version": BENCHMARK_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": [],
+    }
+    print(f"Benchmarking {', '.join(STAGES)} on {', '.join(f'{n:,}' for n in args.sizes)} records")
+    for records in args.sizes:
+        # A fresh interpreter per size keeps memory figures independent
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            report["results"].extend(pool.submit(run_size, records, args.seed, not args.no_allocations, args.workers).result())
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Results saved to: {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report["results"], baseline, args.tolerance, args.min_seconds, args.min_mb)
+        if regressions:
+            print(f"\nREGRESSIONS against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Incremental (delta) sync of the Realtime Database into a local directory.
+
+Heater-profile timestamp keys only ever grow, so after the first run each
+Device/BME/Hp path is re-fetched with orderBy="$key"&startAt=<last seen key>
+and only the records after that key are downloaded.
+
+Layout of the sync directory:
+    state.json                          last seen key + record count per path, schema state
+    records/Device_X/BME_XX/Hp_XXX.jsonl  local copy, one [timestamp_key, record] per line
+"""
+
+import json
+import os
+import time
+from typing import Any, Callable, Iterator, Optional
+
+import firebase_rest
+from firebase_rest import (
+    fetch_paged, key_range_query, key_sort_key, list_shards, print_shard_progress, run_parallel, set_path, shard_entry,
+)
+from rtdb_stream import Event
+
+SYNC_STATE_VERSION = 1
+
+
+class DeltaSync:
+    """Persistent per-path sync state plus the append-only local copy of the records."""
+
+    def __init__(self, sync_dir: str):
+        self.sync_dir = sync_dir
+        self.state_file = os.path.join(sync_dir, "state.json")
+        self.shards: dict[str, dict] = {}
+        self.schema_state: Optional[dict] = None
+        self.report: list[dict] = []
+        if os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                state = json.load(f)
+            if state.get("version") != SYNC_STATE_VERSION:
+                raise ValueError(f"Unsupported sync state version in {self.state_file}: {state.get('version')}")
+            self.shards = state.get("shards", {})
+            self.schema_state = state.get("schema")
+
+    def save(self) -> None:
+        """Write state.json atomically, so a crash never leaves a half-written state behind."""
+        os.makedirs(self.sync_dir, exist_ok=True)
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"version": SYNC_STATE_VERSION, "shards": self.shards, "schema": self.schema_state}, f)
+        os.replace(tmp_file, self.state_file)
+
+    def _records_file(self, path: str) -> str:
+        return os.path.join(self.sync_dir, "records", *path.split("/")) + ".jsonl"
+
+    def _fetch_new(self, path: str, timeout: int, page_size: Optional[int] = None) -> Any:
+        """Fetch a shard, restricted to keys after the last one seen for it (in pages, with page_size)."""
+        last_key = self.shards.get(path, {}).get("last_key")
+        if page_size:
+            return fetch_paged(path, page_size, timeout=timeout, start_after=last_key)
+        if last_key is None:
+            return firebase_rest.fetch(path, timeout=timeout)
+        value = firebase_rest.fetch(path, timeout=timeout, query=key_range_query(start_at=last_key))
+        if isinstance(value, dict):
+            # startAt is inclusive
+            value.pop(last_key, None)
+        return value
+
+    def pull(
+        self,
+        max_workers: int = 8,
+        timeout: int = 180,
+        progress: Optional[Callable[[int, int, dict], None]] = print_shard_progress,
+        page_size: Optional[int] = None,
+    ) -> Iterator[Event]:
+        """
+        Fetch records newer than the last run for every Device/BME/Hp path (new paths in full),
+        append them to the local copy and yield them as (device, sensor, hp, timestamp, record)
+        events. Per-path outcomes are collected in self.report; call save() once consumed.
+        If the process dies before save(), the next run simply re-fetches from the old keys;
+        the duplicated lines this leaves in the local copy collapse again in load_local_copy().
+        """
+        self.report = []
+        tree: dict = {}
+        paths, failed_listings = list_shards(tree, timeout=min(timeout, 60), max_workers=max_workers)
+        if paths is None:
+            raise ConnectionError("Could not list the database root")
+        self.report.extend(shard_entry(path, None, 0.0) for path in failed_listings)
+
+        # Primitive nodes above the Hp level carry no records but still belong to the schema
+        for device_id, device_data in tree.items():
+            if not isinstance(device_data, dict):
+                yield (device_id, None, None, None, None)
+                continue
+            for sensor_id in device_data:
+                yield (device_id, sensor_id, None, None, None)
+
+        done = 0
+        for path, value, seconds in run_parallel(paths, lambda p: self._fetch_new(p, timeout, page_size), max_workers):
+            device_id, sensor_id, hp_id = path.split("/")
+            # In the server's key order, so the last one is where the next startAt must begin
+            new_keys = sorted(value, key=key_sort_key) if isinstance(value, dict) else []
+            shard = shard_entry(path, value, seconds)
+            self.report.append(shard)
+            done += 1
+            if progress:
+                progress(done, len(paths), shard)
+            if value is None:
+                continue
+            if not isinstance(value, dict) or not new_keys:
+                yield (device_id, sensor_id, hp_id, None, None)
+                continue
+
+            records_file = self._records_file(path)
+            os.makedirs(os.path.dirname(records_file), exist_ok=True)
+            with open(records_file, "a") as f:
+                for ts_key in new_keys:
+                    f.write(json.dumps([ts_key, value[ts_key]]) + "\n")
+            entry = self.shards.setdefault(path, {"last_key": None, "records": 0})
+            entry["last_key"] = new_keys[-1]
+            entry["records"] += len(new_keys)
+            entry["synced_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+            for ts_key in new_keys:
+                yield (device_id, sensor_id, hp_id, ts_key, value[ts_key])
+
+        self.report.sort(key=lambda s: s["path"])
+
+    def load_local_copy(self) -> dict:
+        """Rebuild the full nested tree from the local copy (O(all records), no network)."""
+        tree: dict = {}
+        for path in sorted(self.shards):
+            hp_data = {}
+            with open(self._records_file(path)) as f:
+                for line in f:
+                    ts_key, record = json.loads(line)
+                    hp_data[ts_key] = record
+            set_path(tree, path, hp_data)
+        return tree
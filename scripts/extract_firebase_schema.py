@@ -5,30 +5,50 @@ Uses REST API - no auth needed if database rules allow read.
 
 Usage: python scripts/extract_firebase_schema.py
        python scripts/extract_firebase_schema.py --output schema.json  # Save to file
+       python scripts/extract_firebase_schema.py --sharded --max-workers 16  # Parallel per-Hp download
+       python scripts/extract_firebase_schema.py --sharded --async --max-workers 256  # asyncio, pooled keep-alive
+       python scripts/extract_firebase_schema.py --checkpoint ckpt_dir --retries 5  # Resumable sharded download
+       python scripts/extract_firebase_schema.py --cache cache_dir [--sharded]  # Re-download only what changed (ETags)
+       python scripts/extract_firebase_schema.py --input snapshot.json --workers -1  # Schema on all cores
+       python scripts/extract_firebase_schema.py --value-stats --format-map  # Value statistics, per-path formats
+       python scripts/extract_firebase_schema.py --output schema.json --stream-detailed --max-breadth 100  # Wide trees
+       python scripts/extract_firebase_schema.py --output schema.json --dedup [--no-samples]  # Shared shapes stored once
+       python scripts/extract_firebase_schema.py --stream  # Parse the REST body incrementally
+       python scripts/extract_firebase_schema.py --stream --page-size 5000  # Bounded memory per Hp node
+       python scripts/extract_firebase_schema.py --input snapshot.json [--stream]  # Replay a saved snapshot
+       python scripts/extract_firebase_schema.py --since 24h [--stream]  # Only the last day (key-range queries)
+       python scripts/extract_firebase_schema.py --since 2026-02-01 --until 2026-02-08  # One week
+       python scripts/extract_firebase_schema.py --sync sync_dir  # Only fetch records newer than the last run
+       python scripts/extract_firebase_schema.py --store store_dir  # Also write the columnar record store
+       python scripts/extract_firebase_schema.py --store store_dir --parquet parquet_dir  # ... and export it as Parquet
+       python scripts/extract_firebase_schema.py --url http://127.0.0.1:8765  # e.g. local_rtdb_server.py
 """
 
+import argparse
 import json
+import multiprocessing
+import os
 import re
-import requests
 import sys
 from collections import defaultdict
-from typing import Any
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Iterable, Iterator, Optional, TextIO
 
-FIREBASE_URL = "https://knose-e1959-default-rtdb.firebaseio.com"
+import numpy as np
+import requests
 
-
-def fetch(path: str = "", shallow: bool = False, timeout: int = 120) -> Any:
-    """Fetch data from Firebase REST API."""
-    url = f"{FIREBASE_URL}/{path}.json"
-    if shallow:
-        url += "?shallow=true"
-    try:
-        resp = requests.get(url, timeout=timeout)
-        resp.raise_for_status()
-        return resp.json()
-    except requests.RequestException as e:
-        print(f"Error fetching {path}: {e}")
-        return None
+from async_fetch import MAX_THREADS, fetch_sharded_async
+from delta_sync import DeltaSync
+import firebase_rest
+from firebase_rest import ResponseCache, RetryPolicy, ShardCheckpoint, fetch, fetch_sharded
+from parquet_export import export_parquet
+from partial_schema import MAX_MALFORMED_EXAMPLES, QUANTILE_FIELDS, PartialSchema, classify_format
+from record_store import RecordStore, RecordStoreWriter, build_record_store
+from rtdb_stream import Event, RecordStream, iter_paged_events, window_events
+from schema_dedup import dedup_detailed_schema
+from timestamps import format_ns, parse_time_bound, parse_timestamp_keys, window_key_range
 
 
 def infer_type(value: Any) -> str:
@@ -50,157 +70,451 @@ def infer_type(value: Any) -> str:
     return "unknown"
 
 
-def extract_complete_schema(data: Any) -> dict:
+def extract_complete_schema(data: Any, value_stats: bool = False, map_formats: bool = False) -> dict:
     """
     Load full data and extract complete schema by walking entire structure.
     Aggregates all unique keys at each level across the entire database.
+    value_stats adds numeric ranges, per-Hp field statistics and quantiles (a pass over every value),
+    map_formats the per-path format map; both are off by default.
     """
-    schema = {
-        "structure": "Device_X / BME_XX / HP_XXX / timestamp / { record }",
-        "levels": {},
-        "record_fields": None,
-        "stats": {"total_devices": 0, "total_sensors": 0, "total_hps": 0, "total_records": 0},
-    }
+    visitor = SchemaVisitor(value_stats, map_formats)
+    if data and isinstance(data, dict):
+        visitor.visit_tree(data)
+    return visitor.schema()
 
-    if not data or not isinstance(data, dict):
-        return schema
 
-    all_devices = set()
-    all_sensors = set()
-    all_hps = set()
-    timestamp_pattern = None
-    record_fields = set()
-    total_records = 0
+# Tree shared with forked workers of extract_complete_schema_parallel(), so subtrees are not pickled
+_SHARED_TREE: Optional[dict] = None
 
-    # Timestamp pattern: YYYY-MM-DD_HH-MM-SS_nanoseconds
-    ts_regex = re.compile(r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}_\d+$")
 
-    for device_id, device_data in data.items():
-        all_devices.add(device_id)
-        if not isinstance(device_data, dict):
-            continue
+def _subtree(data: dict, path: tuple[str, ...]) -> Any:
+    for key in path:
+        data = data[key]
+    return data
 
-        for sensor_id, sensor_data in device_data.items():
-            all_sensors.add(sensor_id)
-            if not isinstance(sensor_data, dict):
-                continue
 
-            for hp_id, hp_data in sensor_data.items():
-                all_hps.add(hp_id)
-                if not isinstance(hp_data, dict):
-                    continue
+def _record_count(node: Any, depth: int) -> int:
+    """Records below a node `depth` levels above the Hp nodes (cheap: only Hp dicts are sized)."""
+    if not isinstance(node, dict):
+        return 0
+    if depth == 0:
+        return len(node)
+    return sum(_record_count(child, depth - 1) for child in node.values())
+
+
+def _visit_subtree(path: tuple[str, ...], options: dict, subtree: Any = None) -> "SchemaVisitor":
+    """Worker: partial schema of one Device_X or Device_X/BME_XX subtree."""
+    if subtree is None:
+        subtree = _subtree(_SHARED_TREE, path)
+    wrapped = subtree
+    for key in reversed(path):
+        wrapped = {key: wrapped}
+    visitor = SchemaVisitor(**options)
+    visitor.visit_tree(wrapped)
+    return visitor
 
-                for ts_key, record in hp_data.items():
-                    if ts_regex.match(ts_key):
-                        timestamp_pattern = "YYYY-MM-DD_HH-MM-SS_nanoseconds"
-                    total_records += 1
-                    if isinstance(record, dict):
-                        record_fields.update(record.keys())
-
-    schema["levels"]["root"] = {
-        "keys": sorted(all_devices),
-        "count": len(all_devices),
-        "type": "object",
-        "description": "Device IDs (Device_1, Device_2, ...)",
-    }
-    schema["levels"]["device"] = {
-        "keys": sorted(all_sensors),
-        "count": len(all_sensors),
-        "type": "object",
-        "description": "Sensor IDs (BME_01 to BME_16)",
-    }
-    schema["levels"]["sensor"] = {
-        "keys": sorted(all_hps),
-        "count": len(all_hps),
-        "type": "object",
-        "description": "Heater Profile IDs (Hp_301, Hp_322, ...)",
-    }
-    schema["levels"]["hp"] = {
-        "key_pattern": timestamp_pattern or "string",
-        "type": "object",
-        "description": "Timestamp keys (YYYY-MM-DD_HH-MM-SS_nanoseconds)",
-    }
-    schema["record_fields"] = {
-        "keys": sorted(record_fields),
-        "count": len(record_fields),
-        "description": "Fields in each reading record",
-    }
 
-    # Get sample record with types
-    sample_record = None
+def extract_complete_schema_parallel(
+    data: Any, workers: Optional[int] = None, split: str = "device", value_stats: bool = False, map_formats: bool = False,
+) -> dict:
+    """
+    extract_complete_schema() on a process pool: every Device_X subtree (split="device") or
+    Device_X/BME_XX subtree (split="sensor") is walked by a worker, and the partial schemas are
+    combined with SchemaVisitor.merge(). Where fork is available the workers read the tree
+    inherited from this process; otherwise each subtree is pickled to its worker.
+    """
+    global _SHARED_TREE
+    options = {"value_stats": value_stats, "map_formats": map_formats}
+    visitor = SchemaVisitor(**options)
+    if not data or not isinstance(data, dict):
+        return visitor.schema()
+
+    units: list[tuple[str, ...]] = []
     for device_id, device_data in data.items():
-        if not isinstance(device_data, dict):
-            continue
-        for sensor_id, sensor_data in device_data.items():
-            if not isinstance(sensor_data, dict):
+        if split == "sensor" and isinstance(device_data, dict) and device_data:
+            units.extend((device_id, sensor_id) for sensor_id in device_data)
+        else:
+            units.append((device_id,))
+
+    workers = min(workers or os.cpu_count() or 1, len(units))
+    # Biggest subtrees first, so one large device does not start last and finish alone
+    sizes = [_record_count(_subtree(data, unit), 3 - len(unit)) for unit in units]
+    order = sorted(range(len(units)), key=lambda i: -sizes[i])
+    use_fork = "fork" in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if use_fork else None)
+    _SHARED_TREE = data if use_fork else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            if use_fork:
+                futures = {i: pool.submit(_visit_subtree, units[i], options) for i in order}
+            else:
+                futures = {i: pool.submit(_visit_subtree, units[i], options, _subtree(data, units[i])) for i in order}
+            # Merge in tree order, so samples and examples match the serial walk
+            for i in range(len(units)):
+                visitor.merge(futures[i].result())
+    finally:
+        _SHARED_TREE = None
+    return visitor.schema()
+
+
+def extract_schema_from_events(events: Iterable[Event], value_stats: bool = False, map_formats: bool = False) -> dict:
+    """
+    Extract the complete schema in a single pass over (device, sensor, hp, timestamp, record) events.
+    Events come from iter_tree_records (in-memory tree) or a RecordStream (chunked REST body or file),
+    so only the current record has to be in memory.
+    """
+    visitor = SchemaVisitor(value_stats, map_formats)
+    visitor.visit(events)
+    return visitor.schema()
+
+
+_TIMESTAMP_PATTERN = "YYYY-MM-DD_HH-MM-SS_nanoseconds"
+_TIMESTAMP_KEY_SHAPE = re.compile(r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}_\d+$")
+
+# Integers up to this magnitude survive a round trip through float64 exactly
+_FLOAT_EXACT_INT = 2 ** 53
+
+
+def _signature_groups(records: list) -> dict[tuple, list[dict]]:
+    """
+    Records of one Hp node grouped by their (keys, value types) signature; records that are not objects
+    are left out. Nodes whose records all share one key tuple and one type per field, the usual case,
+    are recognised column by column with C-level passes instead of a signature per record.
+    """
+    count = len(records)
+    if count and set(map(type, records)) == {dict}:
+        keys = tuple(records[0])
+        width = len(keys)
+        # Equal lengths line the flattened keys up in columns, one per key of the first record
+        if set(map(len, records)) == {width}:
+            flat_keys = list(chain.from_iterable(records))
+            if all(flat_keys[i::width].count(key) == count for i, key in enumerate(keys)):
+                flat_types = list(map(type, chain.from_iterable(map(dict.values, records))))
+                types = tuple(flat_types[:width])
+                if all(flat_types[i::width].count(value_type) == count for i, value_type in enumerate(types)):
+                    return {(keys, types): records}
+
+    groups: dict[tuple, list[dict]] = {}
+    for record in records:
+        if type(record) is dict:
+            signature = (tuple(record), tuple(map(type, record.values())))
+            group = groups.get(signature)
+            if group is None:
+                groups[signature] = [record]
+            else:
+                group.append(record)
+    return groups
+
+
+class SchemaVisitor(PartialSchema):
+    """
+    Single-pass walker that fills a PartialSchema.
+
+    The hot loop only groups each Hp node's records by their (keys, value types) signature; key sets,
+    per-field type histograms and one sample per record format are derived from the signature counts
+    when schema() is called. Timestamp keys are parsed in batches spanning many Hp nodes, so small
+    nodes do not each pay for a vectorised call. With value_stats, numeric ranges, field statistics
+    and quantiles are taken per group in one numpy pass; with map_formats, mixed-format nodes are
+    classified record by record.
+    """
+
+    # Timestamp keys parsed per call of _flush_keys()
+    KEY_BATCH = 1 << 16
+
+    def __init__(self, value_stats: bool = False, map_formats: bool = False):
+        super().__init__(value_stats, map_formats)
+        self._pending_keys: list[str] = []
+        # (Hp id, path, records per format, per-record formats or None, number of keys) per pending node
+        self._pending_nodes: list[tuple] = []
+
+    def visit(self, events: Iterable[Event]) -> None:
+        """Consume (device, sensor, hp, timestamp, record) events, e.g. from a RecordStream."""
+        devices, sensors, hps = self.devices, self.sensors, self.hps
+        last_node = (None, None, None)
+        keys: list[str] = []
+        records: list[Any] = []
+
+        def flush(node: tuple) -> None:
+            self.visit_node(records, keys, node[2], "/".join(node))
+            keys.clear()
+            records.clear()
+
+        for device_id, sensor_id, hp_id, ts_key, record in events:
+            # Events arrive grouped by Hp node, so key sets only change when the node does
+            node = (device_id, sensor_id, hp_id)
+            if node != last_node:
+                if keys:
+                    flush(last_node)
+                last_node = node
+                devices.add(device_id)
+                if sensor_id is not None:
+                    sensors.add(sensor_id)
+                if hp_id is not None:
+                    hps.add(hp_id)
+            if ts_key is not None:
+                keys.append(ts_key)
+                records.append(record)
+                if len(keys) >= 4096:
+                    flush(node)
+        if keys:
+            flush(last_node)
+        self._flush_keys()
+
+    def visit_tree(self, data: dict) -> None:
+        """Walk an in-memory Device/BME/Hp tree directly, without going through events."""
+        devices, sensors, hps = self.devices, self.sensors, self.hps
+        for device_id, device_data in data.items():
+            devices.add(device_id)
+            if not isinstance(device_data, dict):
                 continue
-            for hp_id, hp_data in sensor_data.items():
-                if not isinstance(hp_data, dict):
+            for sensor_id, sensor_data in device_data.items():
+                sensors.add(sensor_id)
+                if not isinstance(sensor_data, dict):
                     continue
-                for ts_key, record in hp_data.items():
-                    if isinstance(record, dict) and record:
-                        sample_record = {k: {"type": infer_type(v), "sample": v} for k, v in record.items()}
-                        break
-                if sample_record:
-                    break
-            if sample_record:
-                break
-        if sample_record:
-            break
+                for hp_id, hp_data in sensor_data.items():
+                    hps.add(hp_id)
+                    if isinstance(hp_data, dict):
+                        path = f"{device_id}/{sensor_id}/{hp_id}"
+                        self.visit_node(list(hp_data.values()), list(hp_data), hp_id, path)
+        self._flush_keys()
+
+    def visit_node(self, records: list, keys: list[str], hp_id: str, path: str) -> None:
+        """
+        Records and their timestamp keys of one Hp node (or a batch of one). The keys are queued and
+        parsed with those of the following nodes; visit() and visit_tree() flush them at the end.
+        """
+        formats = self.visit_records(records, hp_id, path)
+        if not keys:
+            return
+        per_record = None
+        if self.map_formats and not (len(formats) == 1 and sum(formats.values()) == len(keys)):
+            # Unless the whole node is one format (its time range is then the node's), classify every record
+            per_record = np.array([classify_format(tuple(record)) if type(record) is dict else "" for record in records])
+        self._pending_keys.extend(keys)
+        self._pending_nodes.append((hp_id, path, formats, per_record, len(keys)))
+        if len(self._pending_keys) >= self.KEY_BATCH:
+            self._flush_keys()
+
+    def visit_records(self, records: list, hp_id: Optional[str] = None, path: Optional[str] = None) -> dict[str, int]:
+        """
+        Hot loop: group the records of one Hp node by their (keys, value types) signature.
+        Returns the number of records per format ("A" / "B" / "other"), classified once per signature.
+        """
+        self.total_records += len(records)
+        signatures, format_samples = self.signatures, self.format_samples
+        formats: dict[str, int] = {}
+        for signature, group in _signature_groups(records).items():
+            count = signatures.get(signature)
+            if count is None:
+                count = 0
+                key_set = tuple(sorted(signature[0]))
+                if key_set not in format_samples and group[0]:
+                    format_samples[key_set] = group[0]
+            signatures[signature] = count + len(group)
+            if self.value_stats:
+                stats = self.add_group_stats(hp_id, signature, group) if hp_id is not None else None
+                self._visit_ranges(signature, group, stats, path)
+            label = classify_format(signature[0])
+            formats[label] = formats.get(label, 0) + len(group)
+        return formats
+
+    def _visit_ranges(
+        self, signature: tuple, records: list[dict], stats: Optional[dict] = None, path: Optional[str] = None,
+    ) -> None:
+        """
+        Numeric min/max per field for records sharing one signature (so every column has one type),
+        plus sum and distinct values into the Hp's field stats and quantile sketches for the path.
+        """
+        keys, types = signature
+        numeric = [(key, value_type) for key, value_type in zip(keys, types) if value_type is int or value_type is float]
+        if not numeric:
+            return
+        if len(numeric) == len(keys):
+            values = chain.from_iterable(map(dict.values, records))
+        elif len(numeric) == 1:
+            values = map(itemgetter(numeric[0][0]), records)
+        else:
+            values = chain.from_iterable(map(itemgetter(*(key for key, _type in numeric)), records))
+        # One float64 matrix per group: a C-level pass instead of a Python loop per field
+        matrix = np.fromiter(values, dtype=np.float64, count=len(records) * len(numeric)).reshape(len(records), -1)
+        lows, highs = matrix.min(axis=0).tolist(), matrix.max(axis=0).tolist()
+        for column, ((key, value_type), low, high) in enumerate(zip(numeric, lows, highs)):
+            if value_type is int:
+                if max(-low, high) >= _FLOAT_EXACT_INT:
+                    values = [record[key] for record in records]
+                    low, high = min(values), max(values)
+                else:
+                    low, high = int(low), int(high)
+            self.add_field_range(key, low, high)
+            if stats is not None:
+                stats[key].add_numeric(matrix[:, column], low, high)
+            if path is not None and key in QUANTILE_FIELDS:
+                self.add_quantile_values(path, key, matrix[:, column])
+
+    def _flush_keys(self) -> None:
+        """Parse the queued timestamp keys in one vectorised call and add each node's time (and format) ranges."""
+        keys, nodes = self._pending_keys, self._pending_nodes
+        if not nodes:
+            return
+        ns, malformed = parse_timestamp_keys(keys)
+        if len(malformed):
+            self.add_malformed(len(malformed), [keys[i] for i in malformed[:MAX_MALFORMED_EXAMPLES]])
+        # Like the key regex of earlier versions, the pattern also counts keys that only look like timestamps
+        if len(malformed) < len(keys) or any(map(_TIMESTAMP_KEY_SHAPE.match, keys)):
+            self.timestamp_pattern = _TIMESTAMP_PATTERN
+        valid = np.ones(len(keys), dtype=bool)
+        valid[malformed] = False
+        sizes = [node[-1] for node in nodes]
+        starts = np.cumsum([0] + sizes[:-1])
+        # INVALID_NS is the smallest int64, so it only has to be kept out of the minimum
+        firsts = np.minimum.reduceat(np.where(valid, ns, np.iinfo(np.int64).max), starts).tolist()
+        lasts = np.maximum.reduceat(ns, starts).tolist()
+        counts = np.add.reduceat(valid, starts, dtype=np.int64).tolist()
+        for (hp_id, path, formats, per_record, size), start, first, last, count in zip(
+            nodes, starts.tolist(), firsts, lasts, counts,
+        ):
+            if count:
+                self.add_time_range(hp_id, first, last, count)
+            if self.map_formats:
+                self._add_path_formats(path, formats, per_record, ns[start:start + size], valid[start:start + size])
+        keys.clear()
+        nodes.clear()
+
+    def _add_path_formats(
+        self, path: str, formats: dict[str, int], per_record: Optional[np.ndarray], ns: np.ndarray, valid: np.ndarray,
+    ) -> None:
+        for label, count in formats.items():
+            selected = valid if per_record is None else valid & (per_record == label)
+            if selected.any():
+                self.add_path_format(path, label, int(ns[selected].min()), int(ns[selected].max()), count)
+            else:
+                self.add_path_format(path, label, None, None, count)
 
-    schema["record_fields"]["field_types"] = sample_record or {}
 
-    schema["stats"]["total_devices"] = len(all_devices)
-    schema["stats"]["total_sensors"] = len(all_sensors)
-    schema["stats"]["total_hps"] = len(all_hps)
-    schema["stats"]["total_records"] = total_records
+# Timestamp-level keys look like 2026-02-02_09-38-35_398398000. Only a level's first key is checked,
+# as in the original walker: that keeps the check O(1) per level, and the complete schema already
+# reports every key that is not a timestamp. A timestamp level whose first key is odd is expanded
+# in full instead of sampled.
+_TIMESTAMP_LEVEL_KEY = re.compile(r"^\d{4}-\d{2}-\d{2}_")
 
-    return schema
+# Events of iter_detailed_schema(): a complete node, a node whose children follow, or the end of one
+DetailedEvent = tuple
 
 
-def build_detailed_schema(data: Any, path: str = "", depth: int = 0) -> dict:
+def iter_detailed_schema(
+    data: Any, path: str = "", depth: int = 0, max_depth: Optional[int] = None, max_breadth: Optional[int] = None,
+) -> Iterator[DetailedEvent]:
+    """
+    Walk the tree with an explicit stack and describe the detailed schema as events, parents first:
+      ("leaf", slot, node)              a finished node
+      ("open", slot, header, container) a node whose children follow; container is "_children",
+                                        or None when the only child is its "_record_schema"
+      ("close",)                        end of the most recently opened node
+    slot is the key of the node in its parent (None for the root). Levels at `max_depth` are not
+    expanded (marked "_truncated"), and at most `max_breadth` children per level are described.
+    """
+    stack: list[tuple] = [("visit", data, path, depth, None)]
+    while stack:
+        item = stack.pop()
+        if item[0] == "close":
+            yield item
+            continue
+        _, node, node_path, node_depth, slot = item
+
+        if not node:
+            yield "leaf", slot, {"_type": "null", "_path": node_path}
+        elif isinstance(node, dict):
+            keys = list(node.keys())
+            # For timestamp level, sample ONE record only
+            if _TIMESTAMP_LEVEL_KEY.match(str(keys[0])):
+                sample_ts = keys[0]
+                sample_record = node[sample_ts]
+                header = {
+                    "_path": node_path,
+                    "_type": "object",
+                    "_key_pattern": "YYYY-MM-DD_HH-MM-SS_nanoseconds",
+                    "_key_count": len(keys),
+                    "_sample_keys": keys[:3],
+                }
+                if isinstance(sample_record, dict):
+                    yield "open", slot, header, None
+                    stack.append(("close",))
+                    stack.append(("visit", sample_record, f"{node_path}/{sample_ts}", node_depth + 1, "_record_schema"))
+                else:
+                    yield "leaf", slot, {**header, "_record_schema": {"_type": infer_type(sample_record)}}
+            # For record level (sensor reading - all values are primitives, not nested objects)
+            elif all(not isinstance(node[k], (dict, list)) for k in keys):
+                yield "leaf", slot, {
+                    "_path": node_path,
+                    "_type": "object",
+                    "_keys": sorted(keys),
+                    "_field_types": {k: infer_type(node[k]) for k in keys},
+                    "_sample_values": {k: node[k] for k in keys},
+                }
+            # For other levels (devices, sensors, HPs), expand the children
+            else:
+                keys.sort()
+                header = {"_path": node_path, "_type": "object", "_keys": keys, "_key_count": len(keys)}
+                if max_depth is not None and node_depth >= max_depth:
+                    yield "leaf", slot, {**header, "_truncated": "max_depth"}
+                    continue
+                expanded = keys if max_breadth is None else keys[:max_breadth]
+                if len(expanded) < len(keys):
+                    header["_omitted_children"] = len(keys) - len(expanded)
+                yield "open", slot, header, "_children"
+                stack.append(("close",))
+                for key in reversed(expanded):
+                    stack.append(("visit", node[key], f"{node_path}/{key}" if node_path else key, node_depth + 1, key))
+        else:
+            yield "leaf", slot, {"_path": node_path, "_type": infer_type(node), "_sample": node}
+
+
+def build_detailed_schema(
+    data: Any, path: str = "", depth: int = 0, max_depth: Optional[int] = None, max_breadth: Optional[int] = None,
+) -> dict:
     """Build detailed schema with full key lists at each level. Limits recursion at timestamp level."""
-    if not data:
-        return {"_type": "null", "_path": path}
-
-    if isinstance(data, dict):
-        keys = list(data.keys())
-        # For timestamp level (keys like 2026-02-02_09-38-35_398398000), sample ONE record only
-        if keys and re.match(r"^\d{4}-\d{2}-\d{2}_", str(keys[0])):
-            sample_ts = keys[0]
-            sample_record = data[sample_ts]
-            record_schema = build_detailed_schema(sample_record, f"{path}/{sample_ts}", depth + 1) if isinstance(sample_record, dict) else {"_type": infer_type(sample_record)}
-            return {
-                "_path": path,
-                "_type": "object",
-                "_key_pattern": "YYYY-MM-DD_HH-MM-SS_nanoseconds",
-                "_key_count": len(keys),
-                "_sample_keys": keys[:3],
-                "_record_schema": record_schema,
-            }
-        # For record level (sensor reading - all values are primitives, not nested objects)
-        if keys and all(not isinstance(data[k], (dict, list)) for k in keys):
-            return {
-                "_path": path,
-                "_type": "object",
-                "_keys": sorted(keys),
-                "_field_types": {k: infer_type(data[k]) for k in keys},
-                "_sample_values": {k: data[k] for k in keys},
-            }
-        # For other levels (devices, sensors, HPs), recurse into all children
-        children = {}
-        for key in sorted(keys):
-            child_path = f"{path}/{key}" if path else key
-            children[key] = build_detailed_schema(data[key], child_path, depth + 1)
-        return {
-            "_path": path,
-            "_type": "object",
-            "_keys": sorted(keys),
-            "_key_count": len(keys),
-            "_children": children,
-        }
-
-    return {"_path": path, "_type": infer_type(data), "_sample": data}
+    root: dict = {}
+    # (node, container name or None) for every open node
+    open_nodes: list[tuple[dict, Optional[str]]] = [(root, None)]
+    for event in iter_detailed_schema(data, path, depth, max_depth, max_breadth):
+        if event[0] == "close":
+            open_nodes.pop()
+            continue
+        kind, slot, node = event[0], event[1], event[2]
+        parent, container = open_nodes[-1]
+        (parent[container] if container else parent)[slot] = node
+        if kind == "open":
+            if event[3]:
+                node[event[3]] = {}
+            open_nodes.append((node, event[3]))
+    return root[None]
+
+
+def write_detailed_schema(events: Iterable[DetailedEvent], out: TextIO) -> None:
+    """Write the events of iter_detailed_schema() as one JSON object, node by node, without building it."""
+    def dump(value: Any) -> str:
+        return json.dumps(value, default=str)
+
+    # Per open node: its container name, and whether something was already written inside it
+    open_nodes: list[list] = [[None, False]]
+    for event in events:
+        if event[0] == "close":
+            container, _ = open_nodes.pop()
+            out.write("}}" if container else "}")
+            continue
+        kind, slot = event[0], event[1]
+        parent = open_nodes[-1]
+        if slot is not None:
+            out.write(f"{', ' if parent[1] else ''}{dump(slot)}: ")
+        parent[1] = True
+        if kind == "leaf":
+            out.write(dump(event[2]))
+            continue
+        header, container = event[2], event[3]
+        fields = ", ".join(f"{dump(k)}: {dump(v)}" for k, v in header.items())
+        out.write("{" + fields + (f", {dump(container)}: {{" if container else ""))
+        # The record schema of a timestamp node follows the header fields
+        open_nodes.append([container, container is None])
 
 
 def print_schema(schema: Any, indent: int = 0, max_children: int = 15) -> None:
@@ -235,52 +549,331 @@ def print_schema(schema: Any, indent: int = 0, max_children: int = 15) -> None:
         print(f"{prefix}{schema}")
 
 
-def main():
-    output_file = None
-    if "--output" in sys.argv:
-        idx = sys.argv.index("--output")
-        if idx + 1 < len(sys.argv):
-            output_file = sys.argv[idx + 1]
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Extract the schema of the K-nose Firebase Realtime Database.")
+    parser.add_argument("--output", help="Save complete and detailed schema to this JSON file")
+    parser.add_argument("--url", help="Database URL (default: FIREBASE_URL environment variable or the K-nose database)")
+    parser.add_argument("--input", help="Read a saved snapshot (JSON body of a root GET) instead of the live database")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Infer the complete schema on this many processes (0 = single process, -1 = all cores)")
+    parser.add_argument("--split", choices=["device", "sensor"], default="device",
+                        help="With --workers: unit of work per process, Device_X or Device_X/BME_XX subtrees")
+    parser.add_argument("--value-stats", action="store_true",
+                        help="Also report numeric min/max, per-Hp means and distinct counts, and p1/p50/p99 per path "
+                             "(a pass over every value)")
+    parser.add_argument("--format-map", action="store_true",
+                        help="Also report which record format each Device/BME/Hp path uses, and when")
+    parser.add_argument("--max-depth", type=int, help="Detailed schema: do not expand levels deeper than this (root = 0)")
+    parser.add_argument("--max-breadth", type=int, help="Detailed schema: describe at most this many children per level")
+    parser.add_argument("--stream-detailed", action="store_true",
+                        help="Write the detailed schema to --output node by node instead of building it in memory "
+                             "(it is then not printed)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Detailed schema: store each distinct subtree shape once, referenced by content hash "
+                             "(expand with schema_dedup.expand_detailed_schema)")
+    parser.add_argument("--no-samples", action="store_true", help="With --dedup: drop sample keys and values")
+    parser.add_argument("--stream", action="store_true",
+                        help="Parse the payload incrementally; memory stays bounded by one record (no detailed schema)")
+    parser.add_argument("--sharded", action="store_true", help="Download per Device/BME/Hp shard instead of one root GET")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="With --sharded: asyncio engine that pipelines listings and downloads over pooled connections")
+    parser.add_argument("--page-size", type=int,
+                        help="Fetch each Hp node in orderBy=$key pages of this many records, each retried on its own "
+                             "(implies --sharded; with --stream or --sync, memory stays bounded by one page)")
+    parser.add_argument("--since", metavar="TIME",
+                        help="Only records at or after TIME: a duration back from now (24h, 7d), an ISO date / date-time "
+                             "or a timestamp key (UTC wall clock, like the keys). Each Hp node is fetched with a "
+                             "startAt/endAt key-range query, so the download is proportional to the window (implies --sharded)")
+    parser.add_argument("--until", metavar="TIME", help="Only records before TIME (same forms as --since)")
+    parser.add_argument("--max-workers", type=int, default=8,
+                        help="Maximum concurrent shard requests (with --sharded/--sync); with --async, requests queued "
+                             f"in flight, of which at most {MAX_THREADS} run at once on worker threads")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="Retries per path on connection errors, timeouts, 5xx and 429 (jittered exponential backoff)")
+    parser.add_argument("--retry-delay", type=float, default=0.5,
+                        help="Base backoff in seconds; retry n waits up to retry-delay * 2**n, capped at 30s")
+    parser.add_argument("--checkpoint", metavar="DIR",
+                        help="Sharded download that saves each finished shard in DIR and skips those on the next run "
+                             "(implies --sharded)")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="Keep responses in DIR and revalidate them with ETags, so unchanged paths are not downloaded again")
+    parser.add_argument("--cache-size", type=float, default=1024, metavar="MB",
+                        help="With --cache: evict least recently used responses beyond this size")
+    parser.add_argument("--sync", metavar="DIR",
+                        help="Delta sync into DIR: fetch only records newer than the last run and update the stored schema")
+    parser.add_argument("--store", metavar="DIR",
+                        help="Write the records to a memory-mappable columnar store (per-field .npy arrays) in DIR")
+    parser.add_argument("--parquet", metavar="DIR",
+                        help="With --store: also export the store as Parquet files partitioned by device/date/hp in DIR")
+    args = parser.parse_args()
+    if args.stream_detailed and not args.output:
+        parser.error("--stream-detailed needs --output")
+    if args.no_samples and not args.dedup:
+        parser.error("--no-samples needs --dedup")
+    if args.parquet and not args.store:
+        parser.error("--parquet needs --store")
+    if args.page_size is not None and args.page_size < 1:
+        parser.error("--page-size must be positive")
+    if args.page_size and args.use_async:
+        parser.error("--page-size is not supported by the --async engine")
+    try:
+        args.since_ns = parse_time_bound(args.since) if args.since else None
+        args.until_ns = parse_time_bound(args.until) if args.until else None
+    except ValueError as e:
+        parser.error(str(e))
+    args.windowed = args.since_ns is not None or args.until_ns is not None
+    if args.windowed:
+        if args.since_ns is not None and args.until_ns is not None and args.since_ns >= args.until_ns:
+            parser.error("--since must be earlier than --until")
+        # Sync state and checkpoints describe whole Hp nodes, not a window of them
+        for option, name in ((args.sync, "--sync"), (args.checkpoint, "--checkpoint"), (args.use_async, "--async")):
+            if option:
+                parser.error(f"--since/--until cannot be combined with {name}")
+    return args
+
+
+def load_sharded(args: argparse.Namespace) -> tuple[Any, list[dict]]:
+    """Download the tree shard by shard, resuming from --checkpoint if given."""
+    checkpoint = ShardCheckpoint(args.checkpoint) if args.checkpoint else None
+    print(f"Sharded download: listing Device/BME/Hp paths, up to {args.max_workers} concurrent requests")
+    if checkpoint:
+        print(f"Checkpoint directory: {args.checkpoint} (finished shards are not downloaded again)")
+    if args.use_async:
+        full_data, shards = fetch_sharded_async(max_in_flight=args.max_workers, timeout=180, checkpoint=checkpoint)
+    else:
+        full_data, shards = fetch_sharded(
+            max_workers=args.max_workers, timeout=180, checkpoint=checkpoint, page_size=args.page_size,
+            start_at=args.start_at, end_at=args.end_at,
+        )
+    if shards:
+        failed = [s for s in shards if not s["ok"]]
+        cached = [s for s in shards if s["cached"]]
+        slowest = max(shards, key=lambda s: s["seconds"])
+        total_seconds = sum(s["seconds"] for s in shards)
+        print(f"\nShards: {len(shards) - len(failed)} fetched ({len(cached)} from checkpoint), {len(failed)} failed, "
+              f"{total_seconds:.1f}s total request time, slowest {slowest['path']} ({slowest['seconds']:.2f}s)")
+    return full_data, shards
+
+
+def restrict_to_window(data: Any, since_ns: Optional[int], until_ns: Optional[int]) -> Any:
+    """Drop, in place, the records of every Hp node whose timestamp key is outside [since_ns, until_ns)."""
+    if not isinstance(data, dict):
+        return data
+    for device_data in data.values():
+        for sensor_data in (device_data.values() if isinstance(device_data, dict) else ()):
+            for hp_id, hp_data in (sensor_data.items() if isinstance(sensor_data, dict) else ()):
+                if not isinstance(hp_data, dict) or not hp_data:
+                    continue
+                keys = list(hp_data)
+                ns, malformed = parse_timestamp_keys(keys)
+                keep = np.ones(len(keys), dtype=bool)
+                keep[malformed] = False
+                if since_ns is not None:
+                    keep &= ns >= since_ns
+                if until_ns is not None:
+                    keep &= ns < until_ns
+                if not keep.all():
+                    sensor_data[hp_id] = {keys[i]: hp_data[keys[i]] for i in np.flatnonzero(keep).tolist()}
+    return data
+
+
+def load_full_data(args: argparse.Namespace) -> tuple[Any, list[dict]]:
+    """Load the whole tree from a snapshot file, a sharded download or one root GET."""
+    if args.input:
+        with open(args.input) as f:
+            data = json.load(f)
+        return (restrict_to_window(data, args.since_ns, args.until_ns) if args.windowed else data), []
+    if args.sharded or args.checkpoint or args.page_size or args.windowed:
+        # The server bounds are whole seconds; the exact window is cut out afterwards
+        full_data, shards = load_sharded(args)
+        return (restrict_to_window(full_data, args.since_ns, args.until_ns) if args.windowed else full_data), shards
+    full_data = fetch("", shallow=False, timeout=180)
+    if full_data is None:
+        # One failed root GET would lose everything; shards fail (and retry) independently
+        print("Root GET failed; falling back to a sharded download to recover what can be fetched.")
+        return load_sharded(args)
+    return full_data, []
+
+
+def report_failures(shards: list[dict]) -> list[str]:
+    """Print the paths that still failed after all retries; returns them."""
+    failed = [s["path"] for s in shards if not s["ok"]]
+    if failed:
+        print(f"\nPermanently failed paths ({len(failed)}, after {firebase_rest.RETRY.retries} retries each); "
+              "the schema below covers everything else:")
+        for path in failed:
+            print(f"  FAILED: {path}")
+    return failed
+
+
+def report_record_store(manifest: dict, store_dir: str, parquet_dir: Optional[str] = None) -> None:
+    """Report on a freshly written record store; with parquet_dir, also export it as Parquet."""
+    rows = sum(p["rows"] for p in manifest["partitions"].values())
+    skipped = manifest["skipped"]
+    print(f"\nRecord store written to: {store_dir} ({rows} records in {len(manifest['partitions'])} partitions)")
+    if skipped["bad_timestamp"] or skipped["not_a_record"]:
+        print(f"  skipped: {skipped['bad_timestamp']} malformed timestamp keys, {skipped['not_a_record']} non-object records")
+    if parquet_dir:
+        files = export_parquet(RecordStore(store_dir), parquet_dir)["files"]
+        print(f"Parquet export written to: {parquet_dir} ({len(files)} files)")
+
+
+def save_result(output_file: str, result: dict, detailed_events: Optional[Iterable[DetailedEvent]] = None) -> None:
+    """Write the result JSON; with detailed_events, the detailed schema is streamed in after complete_schema."""
+    with open(output_file, "w") as f:
+        if detailed_events is None:
+            json.dump(result, f, indent=2, default=str)
+            return
+        rest = {key: value for key, value in result.items() if key != "complete_schema"}
+        f.write('{\n"complete_schema": ' + json.dumps(result["complete_schema"], indent=2, default=str) + ',\n"detailed_schema": ')
+        write_detailed_schema(detailed_events, f)
+        for key, value in rest.items():
+            f.write(f",\n{json.dumps(key)}: " + json.dumps(value, indent=2, default=str))
+        f.write("\n}\n")
+
+
+def main() -> int:
+    args = parse_args()
+    output_file = args.output
+    if args.url:
+        firebase_rest.FIREBASE_URL = args.url.rstrip("/")
+    firebase_rest.RETRY = RetryPolicy(retries=max(0, args.retries), base_delay=args.retry_delay)
+    if args.cache:
+        firebase_rest.CACHE = ResponseCache(args.cache, max_bytes=int(args.cache_size * 1024 * 1024))
+    args.start_at, args.end_at = window_key_range(args.since_ns, args.until_ns)
+    window = {
+        "since": format_ns(args.since_ns) if args.since_ns is not None else None,
+        "until": format_ns(args.until_ns) if args.until_ns is not None else None,
+    }
 
     print("=" * 70)
     print("Firebase Realtime Database - COMPLETE SCHEMA EXTRACTION")
-    print(f"URL: {FIREBASE_URL}")
+    print(f"URL: {args.input or firebase_rest.FIREBASE_URL}")
+    if args.windowed:
+        print(f"Time window: {window['since'] or 'start'} to {window['until'] or 'now'} (UTC wall clock)")
     print("Loading FULL data (this may take a moment for large databases)...")
     print("=" * 70)
 
-    # Load FULL data
-    full_data = fetch("", shallow=False, timeout=180)
-    if full_data is None:
-        print("Failed to load data.")
-        return
-
-    data_size_mb = len(json.dumps(full_data)) / (1024 * 1024)
-    print(f"\nData loaded: ~{data_size_mb:.2f} MB\n")
-
-    # Extract complete aggregated schema
-    print("--- COMPLETE SCHEMA (aggregated across full database) ---\n")
-    complete_schema = extract_complete_schema(full_data)
-    print_schema(complete_schema)
-
-    # Detailed schema (full structure with all keys)
-    print("\n--- DETAILED SCHEMA (full structure) ---\n")
-    detailed_schema = build_detailed_schema(full_data, "root")
-    print_schema(detailed_schema, max_children=15)
-
-    result = {
-        "complete_schema": complete_schema,
-        "detailed_schema": detailed_schema,
-    }
+    shards = []
+    detailed_schema = None
+    detailed_events = None
+    options = {"value_stats": args.value_stats, "map_formats": args.format_map}
+    if args.sync:
+        # Delta sync: only new records are downloaded and fed into the resumed schema state
+        syncer = DeltaSync(args.sync)
+        try:
+            visitor = SchemaVisitor.from_state(syncer.schema_state) if syncer.schema_state else SchemaVisitor(**options)
+            # The state keeps collecting what it did; statistics it lacks would only cover the new records
+            if (args.value_stats and not visitor.value_stats) or (args.format_map and not visitor.map_formats):
+                raise ValueError("The stored schema state was built without --value-stats / --format-map")
+        except ValueError as e:
+            # A state from another version cannot be resumed; the local copy holds every record it covered
+            print(f"{e}; rebuilding the schema state from the local copy in {args.sync}")
+            visitor = SchemaVisitor(**options)
+            visitor.visit_tree(syncer.load_local_copy())
+        records_before = visitor.total_records
+        print(f"Delta sync into {args.sync} ({len(syncer.shards)} paths already synced)")
+        try:
+            visitor.visit(syncer.pull(max_workers=args.max_workers, timeout=180, page_size=args.page_size))
+        except ConnectionError as e:
+            print(f"Failed to load data: {e}")
+            return 1
+        syncer.schema_state = visitor.to_state()
+        syncer.save()
+        shards = syncer.report
+        failed = [s["path"] for s in shards if not s["ok"]]
+        print(f"\nSynced {visitor.total_records - records_before} new records, {len(failed)} paths failed")
+        print("\n--- COMPLETE SCHEMA (aggregated across full database, delta sync) ---\n")
+        complete_schema = visitor.schema()
+        print_schema(complete_schema)
+        print("(Detailed schema needs the full tree and is skipped in --sync mode.)")
+        if args.store:
+            # The store is rebuilt from the local copy, which already holds every synced record
+            report_record_store(build_record_store(syncer.load_local_copy(), args.store), args.store, args.parquet)
+    elif args.stream:
+        # Streamed: records go straight from the parser (or the pages) into the schema walker
+        if args.input:
+            stream = RecordStream.from_file(args.input)
+        elif args.page_size or args.windowed:
+            stream = iter_paged_events(
+                args.page_size, timeout=180, max_workers=args.max_workers, start_at=args.start_at, end_at=args.end_at,
+            )
+        else:
+            stream = RecordStream.from_firebase("", timeout=180)
+        events = window_events(stream, args.since_ns, args.until_ns) if args.windowed else stream
+        writer = RecordStoreWriter(args.store) if args.store else None
+        print("\n--- COMPLETE SCHEMA (aggregated across full database, streamed) ---\n")
+        try:
+            complete_schema = extract_schema_from_events(writer.tap(events) if writer else events, **options)
+        except (requests.RequestException, ConnectionError, ValueError) as e:
+            print(f"Failed to stream data: {e}")
+            return 1
+        print_schema(complete_schema)
+        if writer:
+            report_record_store(writer.close(), args.store, args.parquet)
+        if isinstance(stream, RecordStream):
+            print(f"\nData streamed: ~{stream.bytes_read / (1024 * 1024):.2f} MB")
+        print("(Detailed schema needs the full tree and is skipped in --stream mode.)")
+    else:
+        # Load FULL data
+        full_data, shards = load_full_data(args)
+        if full_data is None:
+            print("Failed to load data.")
+            return 1
+
+        data_size_mb = len(json.dumps(full_data)) / (1024 * 1024)
+        print(f"\nData loaded: ~{data_size_mb:.2f} MB\n")
+
+        # Extract complete aggregated schema
+        print("--- COMPLETE SCHEMA (aggregated across full database) ---\n")
+        if args.workers:
+            workers = None if args.workers < 0 else args.workers
+            complete_schema = extract_complete_schema_parallel(full_data, workers=workers, split=args.split, **options)
+        else:
+            complete_schema = extract_complete_schema(full_data, **options)
+        print_schema(complete_schema)
+        if args.store:
+            report_record_store(build_record_store(full_data, args.store), args.store, args.parquet)
+
+        # Detailed schema (full structure with all keys)
+        print("\n--- DETAILED SCHEMA (full structure) ---\n")
+        if args.dedup:
+            # Built straight from the events, so the full detailed schema never exists in memory
+            detailed_schema = dedup_detailed_schema(
+                iter_detailed_schema(full_data, "root", max_depth=args.max_depth, max_breadth=args.max_breadth),
+                keep_samples=not args.no_samples,
+            )
+            print(f"(Deduplicated: {len(detailed_schema['shapes'])} distinct shapes, "
+                  f"{len(detailed_schema['instances'])} nodes with instance data; not printed.)")
+        elif args.stream_detailed:
+            detailed_events = iter_detailed_schema(full_data, "root", max_depth=args.max_depth, max_breadth=args.max_breadth)
+            print(f"(Streamed to {output_file} node by node, not printed.)")
+        else:
+            detailed_schema = build_detailed_schema(full_data, "root", max_depth=args.max_depth, max_breadth=args.max_breadth)
+            print_schema(detailed_schema, max_children=15)
+
+    failed_paths = report_failures(shards)
+    if firebase_rest.CACHE:
+        firebase_rest.CACHE.save()
+        print(f"\nResponse cache ({args.cache}): {firebase_rest.CACHE.summary()}")
+    result = {"complete_schema": complete_schema}
+    if args.windowed:
+        result["window"] = window
+    if detailed_schema is not None:
+        result["detailed_schema"] = detailed_schema
+    if shards:
+        result["shards"] = shards
+        result["failed_paths"] = failed_paths
 
     if output_file:
-        with open(output_file, "w") as f:
-            json.dump(result, f, indent=2, default=str)
+        save_result(output_file, result, detailed_events)
         print(f"\nSchema saved to: {output_file}")
 
     print("\n" + "=" * 70)
-    print("Done.")
+    print("Done." if not failed_paths else f"Done, with {len(failed_paths)} failed paths.")
     print("=" * 70)
+    return 1 if failed_paths else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
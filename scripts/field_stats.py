@@ -0,0 +1,255 @@
+"""
+Constant-memory, mergeable per-field value statistics.
+
+FieldStats keeps, for one record field, the count per value type, numeric
+min / max / sum (for the mean) and a HyperLogLog sketch of the distinct
+values; QuantileSketch (KLL) answers approximate quantiles. Updates take
+whole columns (numpy arrays), so the per-record cost is a handful of
+vectorised operations; merging two FieldStats gives the stats
+of the union of their records, which is what lets shards, processes and
+delta-sync runs be combined.
+"""
+
+import base64
+import math
+import zlib
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+# 2**11 registers: ~2.3% standard error on distinct counts, 2 KB per sketch
+HLL_PRECISION = 11
+# KLL compactor size: ~1.7% rank error, about 3 * k values (5 KB) per sketch
+KLL_K = 200
+
+_U64 = np.uint64
+
+
+def hash64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finaliser over the bits of a float64 / int64 / uint64 array (stable across processes)."""
+    z = np.ascontiguousarray(values).view(_U64) + _U64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> _U64(30))) * _U64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> _U64(27))) * _U64(0x94D049BB133111EB)
+    return z ^ (z >> _U64(31))
+
+
+def hash_objects(values: Iterable[Any]) -> np.ndarray:
+    """64-bit hashes of non-numeric values via their repr (Python's hash() is salted per process)."""
+    codes = []
+    for value in values:
+        data = repr(value).encode()
+        codes.append((zlib.crc32(data) << 32) | zlib.adler32(data))
+    return hash64(np.array(codes, dtype=_U64))
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count sketch over 64-bit hashes."""
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        p = self.precision
+        index = (hashes >> _U64(64 - p)).astype(np.intp)
+        # Rank = position of the first 1 bit after the index bits, from the top 32 of them (exact in float64)
+        rest = ((hashes << _U64(p)) >> _U64(32)).astype(np.float64)
+        with np.errstate(divide="ignore"):
+            rank = np.where(rest > 0, 32 - np.floor(np.log2(rest)), 33).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog sketches of precision {self.precision} and {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.ldexp(1.0, -self.registers.astype(np.int64)).sum())
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_state(self) -> str:
+        return base64.b64encode(zlib.compress(self.registers.tobytes(), 6)).decode()
+
+    @classmethod
+    def from_state(cls, state: str, precision: int = HLL_PRECISION) -> "HyperLogLog":
+        registers = np.frombuffer(zlib.decompress(base64.b64decode(state)), dtype=np.uint8).copy()
+        return cls(precision, registers)
+
+
+def _encode_floats(values: np.ndarray) -> str:
+    return base64.b64encode(zlib.compress(values.astype(np.float64).tobytes(), 6)).decode()
+
+
+def _decode_floats(state: str) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(base64.b64decode(state)), dtype=np.float64).copy()
+
+
+class QuantileSketch:
+    """
+    KLL quantile sketch: level h holds values that each stand for 2**h inputs. When the sketch is over
+    budget, the lowest overfull level is sorted and every other value (random offset) is promoted to
+    the level above, so the rank error stays bounded however many sketches are merged.
+    """
+
+    def __init__(self, k: int = KLL_K):
+        self.k = k
+        self.n = 0
+        self.levels: list[np.ndarray] = [np.empty(0)]
+        self.compactions: list[int] = [0]
+
+    def _capacity(self, level: int) -> int:
+        # Lower levels get geometrically smaller (factor 2/3), the top level holds k values
+        return max(2, math.ceil(self.k * (2 / 3) ** (len(self.levels) - level - 1)))
+
+    def _compress(self) -> None:
+        # Only compact while the sketch as a whole is over budget, always the lowest overfull level
+        while sum(map(len, self.levels)) > sum(map(self._capacity, range(len(self.levels)))):
+            level = next(h for h, items in enumerate(self.levels) if len(items) > self._capacity(h))
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+                self.compactions.append(0)
+            items = np.sort(self.levels[level])
+            # Coin flip from a hash of (level, compaction number): unbiased, yet reproducible run to run
+            offset = int(hash64(np.array([(level << 32) | self.compactions[level]], dtype=_U64))[0] & _U64(1))
+            self.compactions[level] += 1
+            # An odd value out stays behind, alternately the smallest and the largest
+            if len(items) % 2:
+                kept, items = (items[:1], items[1:]) if offset else (items[-1:], items[:-1])
+            else:
+                kept = items[:0]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[offset::2]])
+            self.levels[level] = kept
+
+    def update(self, values: np.ndarray) -> None:
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge quantile sketches with k={self.k} and k={other.k}")
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+                self.compactions.append(0)
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def quantiles(self, fractions: Iterable[float]) -> list[Optional[float]]:
+        """Approximate values at the given ranks (0..1); None for an empty sketch."""
+        fractions = list(fractions)
+        if not self.n:
+            return [None] * len(fractions)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(items), 2 ** level, dtype=np.float64) for level, items in enumerate(self.levels)
+        ])
+        order = np.argsort(values, kind="stable")
+        values, cumulative = values[order], np.cumsum(weights[order])
+        ranks = np.searchsorted(cumulative, np.array(fractions) * cumulative[-1], side="left")
+        return values[np.minimum(ranks, len(values) - 1)].tolist()
+
+    def to_state(self) -> dict:
+        return {
+            "k": self.k, "n": self.n,
+            "levels": [_encode_floats(items) for items in self.levels], "compactions": self.compactions,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "QuantileSketch":
+        sketch = cls(state.get("k", KLL_K))
+        sketch.n = state.get("n", 0)
+        sketch.levels = [_decode_floats(items) for items in state.get("levels", [])] or [np.empty(0)]
+        sketch.compactions = list(state.get("compactions", [0] * len(sketch.levels)))
+        return sketch
+
+
+class FieldStats:
+    """Type counts, numeric min/max/mean and approximate distinct count for one field."""
+
+    def __init__(self):
+        self.types: dict[str, int] = {}
+        self.numeric_count = 0
+        self.sum = 0.0
+        self.min: Any = None
+        self.max: Any = None
+        self.distinct = HyperLogLog()
+
+    def add_type(self, type_name: str, count: int) -> None:
+        self.types[type_name] = self.types.get(type_name, 0) + count
+
+    def add_numeric(self, column: np.ndarray, low: Any, high: Any) -> None:
+        """One float64 column of int/float values; low/high are its exact min and max."""
+        self.numeric_count += len(column)
+        self.sum += float(column.sum())
+        if self.min is None or low < self.min:
+            self.min = low
+        if self.max is None or high > self.max:
+            self.max = high
+        # 0.0 and -0.0 are the same value
+        self.distinct.add_hashes(hash64(column + 0.0))
+
+    def add_values(self, values: list) -> None:
+        """Non-numeric values (strings, booleans, ...); nulls are only counted by type."""
+        values = [value for value in values if value is not None]
+        if values:
+            self.distinct.add_hashes(hash_objects(values))
+
+    def merge(self, other: "FieldStats") -> "FieldStats":
+        for type_name, count in other.types.items():
+            self.add_type(type_name, count)
+        self.numeric_count += other.numeric_count
+        self.sum += other.sum
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        self.distinct.merge(other.distinct)
+        return self
+
+    def summary(self) -> dict:
+        count = sum(self.types.values())
+        types = dict(sorted(self.types.items(), key=lambda item: -item[1]))
+        summary = {"count": count, "types": types, "nulls": types.get("null", 0), "distinct": self.distinct.estimate()}
+        if self.numeric_count:
+            summary.update(min=self.min, max=self.max, mean=self.sum / self.numeric_count)
+        return summary
+
+    def to_state(self) -> dict:
+        return {
+            "types": self.types, "numeric_count": self.numeric_count, "sum": self.sum,
+            "min": self.min, "max": self.max, "distinct": self.distinct.to_state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "FieldStats":
+        stats = cls()
+        stats.types = dict(state.get("types", {}))
+        stats.numeric_count = state.get("numeric_count", 0)
+        stats.sum = state.get("sum", 0.0)
+        stats.min, stats.max = state.get("min"), state.get("max")
+        if "distinct" in state:
+            stats.distinct = HyperLogLog.from_state(state["distinct"])
+        return stats
+
+
+def merge_field_stats(target: dict[str, FieldStats], source: dict[str, FieldStats]) -> dict[str, FieldStats]:
+    """Merge {field: FieldStats} maps (source is left untouched)."""
+    for field, stats in source.items():
+        if field in target:
+            target[field].merge(stats)
+        else:
+            target[field] = FieldStats().merge(stats)
+    return target
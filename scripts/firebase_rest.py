@@ -0,0 +1,550 @@
+"""
+Firebase Realtime Database REST helpers used by the schema tooling.
+
+Besides the plain `fetch()` (one GET per path), this module can download the
+tree shard by shard: shallow listings discover Device_X / BME_XX / Hp_XXX and
+each heater-profile subtree is then fetched on a bounded worker pool, whole
+or in orderBy="$key" pages (see iter_pages).
+
+Failed requests are retried with jittered exponential backoff (see RetryPolicy),
+finished shards can be checkpointed to disk so an interrupted download
+resumes where it stopped (see ShardCheckpoint), and responses can be kept in
+an on-disk cache that is revalidated with ETags (see ResponseCache).
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Override with the FIREBASE_URL environment variable (or --url) to point at e.g. local_rtdb_server.py
+FIREBASE_URL = os.environ.get("FIREBASE_URL", "https://knose-e1959-default-rtdb.firebaseio.com").rstrip("/")
+
+# Number of path levels above the timestamp keys: Device_X / BME_XX / Hp_XXX
+SHARD_DEPTH = 3
+
+
+_INT32_KEY = re.compile(r"^-?(0|[1-9][0-9]{0,9})$")
+
+
+def key_sort_key(key: str) -> tuple:
+    """Sort key reproducing RTDB's orderBy="$key": 32-bit integer keys first, numerically, then strings."""
+    if _INT32_KEY.match(key) and key != "-0" and -2**31 <= int(key) < 2**31:
+        return (0, int(key), "")
+    return (1, 0, key)
+
+
+def key_range_query(
+    start_at: Optional[str] = None,
+    end_at: Optional[str] = None,
+    limit_to_first: Optional[int] = None,
+    limit_to_last: Optional[int] = None,
+) -> dict:
+    """Build orderBy="$key" query parameters for fetch(); bounds are inclusive, as in RTDB."""
+    query = {"orderBy": json.dumps("$key")}
+    if start_at is not None:
+        query["startAt"] = json.dumps(start_at)
+    if end_at is not None:
+        query["endAt"] = json.dumps(end_at)
+    if limit_to_first is not None:
+        query["limitToFirst"] = str(limit_to_first)
+    if limit_to_last is not None:
+        query["limitToLast"] = str(limit_to_last)
+    return query
+
+
+def new_session(pool_size: int = 32) -> requests.Session:
+    """Session whose keep-alive connection pool can serve `pool_size` concurrent requests to the database."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Shared by every fetch() call, so repeated requests reuse TCP+TLS connections instead of handshaking again
+SESSION = new_session()
+
+
+@dataclass
+class RetryPolicy:
+    """How often and how long fetch() waits before giving up on a path."""
+
+    retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to sleep before retry number `attempt` (0-based): full jitter over an exponential cap."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+# Used by fetch() when no policy is passed; main() replaces it from the command line
+RETRY = RetryPolicy()
+
+# Client errors other than these will not change on a retry
+RETRYABLE_STATUS = {408, 429}
+
+
+def is_retryable(error: requests.RequestException) -> bool:
+    """Connection drops, timeouts, truncated bodies, 5xx and throttling are worth another attempt."""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status >= 500 or status in RETRYABLE_STATUS
+    return True
+
+
+class ResponseCache:
+    """
+    On-disk cache of fetch() responses, revalidated with ETags: a cached path is requested with
+    X-Firebase-ETag and If-None-Match, and a 304 (or an unchanged ETag) is answered from disk.
+
+    Bodies are stored content-addressed under <dir>/objects/<sha256>.json, so identical responses
+    share one file; <dir>/index.json maps "path?query" to {etag, object, size, used}. When the
+    objects exceed max_bytes, the least recently used entries are evicted. Only plain GETs are
+    cached: RTDB computes ETags for locations, not for shallow or query results.
+    """
+
+    INDEX_VERSION = 1
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.entries: dict[str, dict] = {}
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evicted": 0, "bytes_from_cache": 0}
+        self._lock = threading.Lock()
+        self._clock = 0
+        # object digest -> number of entries referring to it, and the total size of distinct objects
+        self._refs: dict[str, int] = {}
+        self._total = 0
+        try:
+            with open(self.index_file) as f:
+                index = json.load(f)
+            if index.get("version") == self.INDEX_VERSION:
+                # Entries whose body has gone missing are simply misses
+                self.entries = {key: entry for key, entry in index.get("entries", {}).items()
+                                if os.path.exists(self._object_file(entry["object"]))}
+                self._clock = max((entry["used"] for entry in self.entries.values()), default=0)
+        except (OSError, ValueError, KeyError):
+            pass
+        for entry in self.entries.values():
+            self._add_ref(entry)
+        # A smaller max_bytes than last time applies straight away
+        self._evict()
+
+    @staticmethod
+    def key(path: str, params: Optional[dict] = None) -> str:
+        query = "&".join(f"{name}={value}" for name, value in sorted((params or {}).items()))
+        return f"{path}?{query}"
+
+    def _object_file(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "objects", digest + ".json")
+
+    def _add_ref(self, entry: dict) -> None:
+        refs = self._refs.get(entry["object"], 0)
+        if not refs:
+            self._total += entry["size"]
+        self._refs[entry["object"]] = refs + 1
+
+    def _drop(self, key: str) -> None:
+        self._release(self.entries.pop(key))
+
+    def _release(self, entry: dict) -> None:
+        """Forget one reference to an entry's body, deleting it once no entry shares it (lock held)."""
+        self._refs[entry["object"]] -= 1
+        if self._refs[entry["object"]]:
+            return
+        del self._refs[entry["object"]]
+        self._total -= entry["size"]
+        try:
+            os.remove(self._object_file(entry["object"]))
+        except OSError:
+            pass
+
+    def lookup(self, key: str) -> Optional[dict]:
+        with self._lock:
+            return self.entries.get(key)
+
+    def hit(self, key: str, entry: dict) -> Any:
+        """The cached value of a revalidated entry, or None if its body can no longer be read."""
+        try:
+            with open(self._object_file(entry["object"]), "rb") as f:
+                value = json.loads(f.read())
+        except (OSError, ValueError):
+            with self._lock:
+                if key in self.entries:
+                    self._drop(key)
+            return None
+        with self._lock:
+            self._clock += 1
+            entry["used"] = self._clock
+            self.stats["hits"] += 1
+            self.stats["bytes_from_cache"] += entry["size"]
+        return value
+
+    def store(self, key: str, etag: str, body: bytes, stale: bool) -> None:
+        digest = hashlib.sha256(body).hexdigest()
+        object_file = self._object_file(digest)
+        # Under the lock, so a concurrent eviction cannot delete a body that is being shared
+        with self._lock:
+            if digest not in self._refs:
+                os.makedirs(os.path.dirname(object_file), exist_ok=True)
+                tmp_file = object_file + ".tmp"
+                with open(tmp_file, "wb") as f:
+                    f.write(body)
+                os.replace(tmp_file, object_file)
+            old_entry = self.entries.get(key)
+            self._clock += 1
+            self.entries[key] = {"etag": etag, "object": digest, "size": len(body), "used": self._clock}
+            self._add_ref(self.entries[key])
+            if old_entry:
+                self._release(old_entry)
+            self.stats["stale" if stale else "misses"] += 1
+            self._evict(keep=key)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Drop least recently used entries (except `keep`) until the bodies fit in max_bytes (lock held)."""
+        if self._total <= self.max_bytes:
+            return
+        for key in sorted(self.entries, key=lambda k: self.entries[k]["used"]):
+            if self._total <= self.max_bytes:
+                break
+            if key != keep:
+                self._drop(key)
+                self.stats["evicted"] += 1
+
+    def save(self) -> None:
+        """Write index.json atomically (bodies are already on disk)."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._lock:
+            index = {"version": self.INDEX_VERSION, "entries": self.entries}
+            tmp_file = self.index_file + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_file, self.index_file)
+
+    def summary(self) -> str:
+        stats = self.stats
+        return (f"{stats['hits']} hits, {stats['misses']} misses, {stats['stale']} changed, {stats['evicted']} evicted, "
+                f"{stats['bytes_from_cache'] / (1024 * 1024):.2f} MB served from cache")
+
+
+# Used by fetch() when set; main() creates it for --cache
+CACHE: Optional[ResponseCache] = None
+
+
+def fetch(
+    path: str = "",
+    shallow: bool = False,
+    timeout: int = 120,
+    query: Optional[dict] = None,
+    session: Optional[requests.Session] = None,
+    retry: Optional[RetryPolicy] = None,
+    missing: Any = None,
+) -> Any:
+    """
+    Fetch data from Firebase REST API. `query` holds extra REST parameters, e.g. from key_range_query().
+    Transient errors are retried according to `retry` (default: the module-wide RETRY);
+    returns None once the retries are used up. Plain GETs go through the module-wide CACHE if set.
+    A location with no data (JSON null, e.g. an empty key range) gives `missing`, so callers that pass
+    something other than None can tell it apart from a failure.
+    """
+    url = f"{FIREBASE_URL}/{path}.json"
+    params = dict(query or {})
+    if shallow:
+        params["shallow"] = "true"
+    policy = retry or RETRY
+    cache = CACHE if not params else None
+    cache_key = cache.key(f"{FIREBASE_URL}/{path}", params) if cache else None
+    attempt = 0
+    while True:
+        entry = cache.lookup(cache_key) if cache else None
+        headers = {"X-Firebase-ETag": "true"} if cache else {}
+        if entry:
+            headers["If-None-Match"] = entry["etag"]
+        try:
+            resp = (session or SESSION).get(url, params=params or None, timeout=timeout, headers=headers or None)
+            resp.raise_for_status()
+            etag = resp.headers.get("ETag")
+            if entry and (resp.status_code == 304 or etag == entry["etag"]):
+                value = cache.hit(cache_key, entry)
+                if value is not None:
+                    return value
+                continue  # cached body unreadable: the entry is gone, ask again unconditionally
+            if cache and etag:
+                cache.store(cache_key, etag, resp.content, stale=entry is not None)
+            value = resp.json()
+            return missing if value is None else value
+        except requests.RequestException as e:
+            if attempt >= policy.retries or not is_retryable(e):
+                print(f"Error fetching {path}: {e}")
+                return None
+            delay = policy.delay(attempt)
+            attempt += 1
+            print(f"Error fetching {path}: {e} (retry {attempt}/{policy.retries} in {delay:.1f}s)")
+            time.sleep(delay)
+
+
+def open_stream(
+    path: str = "",
+    timeout: int = 180,
+    session: Optional[requests.Session] = None,
+    retry: Optional[RetryPolicy] = None,
+) -> requests.Response:
+    """
+    Start a streamed GET of a path (body not read yet; close the response when done). Getting the
+    response is retried like fetch(); raises the last requests exception once the retries are used up.
+    An error while the body is read is not retried, as the consumer has already seen part of it.
+    """
+    url = f"{FIREBASE_URL}/{path}.json"
+    policy = retry or RETRY
+    attempt = 0
+    while True:
+        resp = None
+        try:
+            resp = (session or SESSION).get(url, timeout=timeout, stream=True)
+            resp.raise_for_status()
+            return resp
+        except requests.RequestException as e:
+            if resp is not None:
+                resp.close()
+            if attempt >= policy.retries or not is_retryable(e):
+                raise
+            delay = policy.delay(attempt)
+            attempt += 1
+            print(f"Error fetching {path}: {e} (retry {attempt}/{policy.retries} in {delay:.1f}s)")
+            time.sleep(delay)
+
+
+def iter_pages(
+    path: str,
+    page_size: int,
+    timeout: int = 120,
+    start_after: Optional[str] = None,
+    start_at: Optional[str] = None,
+    end_at: Optional[str] = None,
+) -> Iterator[Any]:
+    """
+    Walk a node in key-range pages of at most `page_size` children ({key: value} dicts, in $key order),
+    starting after `start_after` if given, and restricted to keys from `start_at` to `end_at` (inclusive)
+    if given. Each page is one fetch(), retried on its own; a page that still fails raises ConnectionError.
+    A node that is not an object is yielded once, as it is.
+    """
+    last_key = start_after
+    while True:
+        if last_key is None:
+            query = key_range_query(start_at=start_at, end_at=end_at, limit_to_first=page_size)
+        else:
+            # startAt is inclusive: ask for one extra child, the last key already seen
+            query = key_range_query(start_at=last_key, end_at=end_at, limit_to_first=page_size + 1)
+        page = fetch(path, timeout=timeout, query=query, missing={})
+        if page is None:
+            raise ConnectionError(f"Could not fetch {path} after key {last_key!r}")
+        if not isinstance(page, dict):
+            if last_key is None:
+                yield page
+            return
+        page.pop(last_key, None)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_key = max(page, key=key_sort_key)
+
+
+def fetch_paged(
+    path: str,
+    page_size: int,
+    timeout: int = 120,
+    start_after: Optional[str] = None,
+    start_at: Optional[str] = None,
+    end_at: Optional[str] = None,
+) -> Any:
+    """A node assembled from iter_pages() (same key bounds); None if a page failed."""
+    value: Any = {}
+    try:
+        for page in iter_pages(path, page_size, timeout, start_after, start_at, end_at):
+            if not isinstance(page, dict):
+                return page
+            value.update(page)
+    except ConnectionError as e:
+        print(f"Error fetching {path}: {e}")
+        return None
+    return value
+
+
+class ShardCheckpoint:
+    """
+    Finished shard downloads kept on disk as <dir>/Device_X/BME_XX/Hp_XXX.json, so a sharded
+    download that is interrupted (crash, Ctrl-C, lost link) does not fetch those shards again.
+    Delete the directory to force a fresh download.
+    """
+
+    def __init__(self, checkpoint_dir: str):
+        self.checkpoint_dir = checkpoint_dir
+
+    def _file(self, path: str) -> str:
+        return os.path.join(self.checkpoint_dir, *path.split("/")) + ".json"
+
+    def load(self, path: str) -> Any:
+        """The saved value of a shard, or None if it has not been completed (or the file is unreadable)."""
+        try:
+            with open(self._file(path)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, path: str, value: Any) -> None:
+        """Write atomically, so a crash mid-write never leaves a truncated shard that looks complete."""
+        checkpoint_file = self._file(path)
+        os.makedirs(os.path.dirname(checkpoint_file), exist_ok=True)
+        tmp_file = checkpoint_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp_file, checkpoint_file)
+
+
+def shard_entry(path: str, value: Any, seconds: float, cached: bool = False) -> dict:
+    """Per-shard report entry; value is None if the shard could not be fetched."""
+    return {
+        "path": path,
+        "ok": value is not None,
+        "seconds": round(seconds, 3),
+        "records": len(value) if isinstance(value, dict) else 0,
+        "cached": cached,
+    }
+
+
+def print_shard_progress(done: int, total: int, shard: dict) -> None:
+    """Default progress callback for fetch_sharded: one line per finished shard."""
+    status = f"{shard['records']} records" if shard["ok"] else "FAILED"
+    if shard.get("cached"):
+        status += ", from checkpoint"
+    print(f"  [{done}/{total}] {shard['path']}  {shard['seconds']:.2f}s  ({status})")
+
+
+def run_parallel(paths: Iterable[str], fn: Callable[[str], Any], max_workers: int):
+    """Run fn(path) on a bounded thread pool, yielding (path, result, seconds) as they finish."""
+    def timed(path: str):
+        start = time.perf_counter()
+        result = fn(path)
+        return result, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(timed, path): path for path in paths}
+        for future in as_completed(futures):
+            result, seconds = future.result()
+            yield futures[future], result, seconds
+
+
+def set_path(tree: dict, path: str, value: Any) -> None:
+    """Place value at a '/'-separated path inside a nested dict, creating parents."""
+    parts = path.split("/")
+    node = tree
+    for part in parts[:-1]:
+        node = node.setdefault(part, {})
+    node[parts[-1]] = value
+
+
+def list_shards(tree: dict, timeout: int = 60, max_workers: int = 8) -> tuple[Optional[list[str]], list[str]]:
+    """
+    Discover every Device_X/BME_XX/Hp_XXX path with shallow GETs, one level at a time.
+    Nodes that turn out to be primitives instead of objects are stored in `tree` directly,
+    so the merged result keeps the same shape as a root GET would.
+    Returns (shard_paths, failed_listings); shard_paths is None if the root listing failed.
+    """
+    root = fetch("", shallow=True, timeout=timeout)
+    if root is None:
+        return None, []
+    if not isinstance(root, dict):
+        return [], []
+
+    level = sorted(root.keys())
+    failed = []
+    for _ in range(SHARD_DEPTH - 1):
+        next_level = []
+        for path, listing, _seconds in run_parallel(level, lambda p: fetch(p, shallow=True, timeout=timeout), max_workers):
+            if isinstance(listing, dict):
+                next_level.extend(f"{path}/{key}" for key in listing)
+            elif listing is None:
+                failed.append(path)
+            else:
+                set_path(tree, path, listing)
+        level = sorted(next_level)
+    return level, sorted(failed)
+
+
+def fetch_sharded(
+    max_workers: int = 8,
+    timeout: int = 180,
+    progress: Optional[Callable[[int, int, dict], None]] = print_shard_progress,
+    checkpoint: Optional[ShardCheckpoint] = None,
+    page_size: Optional[int] = None,
+    start_at: Optional[str] = None,
+    end_at: Optional[str] = None,
+) -> tuple[Optional[dict], list[dict]]:
+    """
+    Download the whole database as independent heater-profile shards instead of one root GET.
+
+    Shallow listings find Device_X, then BME_XX, then Hp_XXX; each Hp subtree is then fetched
+    in parallel by at most `max_workers` threads. Results are merged into the same nested dict a
+    root GET returns, so it can be passed to extract_complete_schema unchanged.
+
+    Returns (data, shards) where shards holds one {path, ok, seconds, records, cached} entry per Hp
+    path (plus a failed entry for any intermediate listing that could not be fetched).
+    data is None only if the root listing itself failed; failed shards are simply missing from it.
+    With a `checkpoint`, shards it already holds are not downloaded again and new ones are added to it.
+    With a `page_size`, each shard is fetched in key-range pages of that many records (see iter_pages).
+    With `start_at` / `end_at`, each shard holds only the records whose keys fall in that inclusive
+    range (a window with no records gives an empty shard, not a failed one).
+    """
+    tree: dict = {}
+    paths, failed_listings = list_shards(tree, timeout=min(timeout, 60), max_workers=max_workers)
+    if paths is None:
+        return None, []
+
+    shards = [shard_entry(path, None, 0.0) for path in failed_listings]
+    to_fetch = []
+    for path in paths:
+        value = checkpoint.load(path) if checkpoint else None
+        if value is None:
+            to_fetch.append(path)
+            continue
+        set_path(tree, path, value)
+        shards.append(shard_entry(path, value, 0.0, cached=True))
+        if progress:
+            progress(len(shards) - len(failed_listings), len(paths), shards[-1])
+
+    windowed = start_at is not None or end_at is not None
+
+    def fetch_shard(path: str) -> Any:
+        if page_size:
+            return fetch_paged(path, page_size, timeout=timeout, start_at=start_at, end_at=end_at)
+        if windowed:
+            return fetch(path, timeout=timeout, query=key_range_query(start_at=start_at, end_at=end_at), missing={})
+        # A node deleted since it was listed is empty, not a failed shard
+        return fetch(path, timeout=timeout, missing={})
+
+    for path, value, seconds in run_parallel(to_fetch, fetch_shard, max_workers):
+        shard = shard_entry(path, value, seconds)
+        if value is not None:
+            set_path(tree, path, value)
+            if checkpoint:
+                checkpoint.save(path, value)
+        shards.append(shard)
+        if progress:
+            progress(len(shards) - len(failed_listings), len(paths), shard)
+
+    shards.sort(key=lambda s: s["path"])
+    return tree, shards
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Synthetic K-nose database generator for benchmarks.
+
+Produces the Device_X / BME_XX / Hp_XXX / timestamp / record tree with both
+record formats, real timestamp keys and heater cycles that follow the
+heater-profile step tables: one record per step, at the step's offset into
+the cycle. Sensors drop the odd sample and occasionally go quiet for hours,
+as in the live data. Output is written as a JSON stream, so 10^8 records need
+no more memory than one chunk.
+
+Usage: python scripts/generate_dataset.py --records 1000000 --output synthetic.json
+       python scripts/generate_dataset.py --devices 50 --sensors 16 --records 100000000 --output - | gzip > big.json.gz
+"""
+
+import argparse
+import json
+import sys
+from dataclasses import dataclass
+from typing import Iterator, TextIO
+
+import numpy as np
+
+from heater_profiles import HEATER_PROFILES, RECORD_DURATION_MS
+from partial_schema import FORMAT_A_FIELDS, FORMAT_B_FIELDS
+from rtdb_stream import Event
+from timestamps import NS_PER_SECOND
+
+# JSON templates for one record; floats keep five decimals like the firmware does
+_FORMAT_A_TEMPLATE = '{"gas_adc":%d,"humidity":%.5f,"temperature":%.5f,"voltage":%.5f}'
+_FORMAT_B_TEMPLATE = ('{"Duration":%d,"GasADC":%d,"GasRes":%d,"Heater_Temp":%d,"Hum":%.5f,"Press":%.5f,'
+                      '"Seq":%d,"Status":%d,"Step":%d,"Temp":%.5f,"Volt":%.5f}')
+
+# Records generated per heater profile at a time
+_CHUNK_RECORDS = 50_000
+_STATUS_OK = 176  # 0xB0: new data, gas valid, heater stable
+_GAS_RES_MAX = 102_400_000
+_ADC_REFERENCE_OHMS = 1.2e6
+
+
+@dataclass
+class DatasetConfig:
+    devices: int = 3
+    sensors: int = 16
+    records: int = 11_000
+    hps_per_sensor: int = 1
+    format_a_fraction: float = 0.5
+    start: str = "2026-02-01T10:00:00"
+    drop_rate: float = 0.01
+    gap_rate: float = 0.001
+    seed: int = 0
+
+    def layout(self) -> list[tuple[str, str, str, bool, int]]:
+        """(device, sensor, hp, is_format_a, records) for every heater profile, records spread evenly."""
+        profile_ids = list(HEATER_PROFILES)
+        format_a_devices = round(self.devices * self.format_a_fraction)
+        paths = []
+        for d in range(self.devices):
+            for s in range(self.sensors):
+                for h in range(self.hps_per_sensor):
+                    profile = profile_ids[(s * self.hps_per_sensor + h) % len(profile_ids)]
+                    paths.append((f"Device_{d + 1}", f"BME_{s + 1:02d}", f"Hp_{profile}", d < format_a_devices))
+        base, extra = divmod(self.records, max(1, len(paths)))
+        return [(*path, base + (i < extra)) for i, path in enumerate(paths)]
+
+
+def timestamp_keys(ns: np.ndarray) -> list[str]:
+    """Epoch nanoseconds -> YYYY-MM-DD_HH-MM-SS_nanoseconds keys (the inverse of timestamp_key_to_ns)."""
+    seconds = np.datetime_as_string(ns.astype("datetime64[ns]"), unit="s")
+    fractions = (ns % NS_PER_SECOND).tolist()
+    return [f"{s[:10]}_{s[11:13]}-{s[14:16]}-{s[17:19]}_{f:09d}" for s, f in zip(seconds.tolist(), fractions)]
+
+
+def _hp_chunks(
+    config: DatasetConfig, index: int, hp_id: str, is_format_a: bool, count: int,
+) -> Iterator[tuple[list[str], list[tuple]]]:
+    """Yield (timestamp keys, record value tuples) in time order until `count` records are produced."""
+    # One generator per heater profile, so its data does not depend on the rest of the layout
+    rng = np.random.default_rng([config.seed, index])
+    profile_id = hp_id[len("Hp_"):]
+    profile = HEATER_PROFILES[profile_id]
+    cycle = profile["total_duration"]
+    # An entry at total_duration coincides with the next cycle's start and is never sampled
+    steps = [entry for entry in profile["steps"] if entry[0] < cycle]
+    offsets_ns = np.array([entry[0] * NS_PER_SECOND for entry in steps], dtype=np.int64)
+    step_numbers = np.array([entry[1] for entry in steps], dtype=np.int64)
+    heater_temps = np.array([entry[2] for entry in steps], dtype=np.int64)
+    duration_ms = RECORD_DURATION_MS.get(profile_id, 1000)
+
+    # Ambient conditions drift slowly per sensor: (current value, step stddev, lower, upper)
+    ambient = {
+        "hum": [rng.uniform(40, 65), 0.05, 5.0, 95.0],
+        "temp": [rng.uniform(22, 30), 0.01, -10.0, 60.0],
+        "press": [rng.uniform(950, 1013), 0.02, 900.0, 1100.0],
+        "volt": [rng.uniform(2.2, 2.6), 0.001, 1.5, 3.3],
+    }
+    cycle_start = int(np.datetime64(config.start, "ns").astype(np.int64)) + int(rng.uniform(0, 60) * NS_PER_SECOND)
+    seq = 0
+    remaining = count
+    while remaining > 0:
+        cycles = -(-min(remaining, _CHUNK_RECORDS) // len(steps)) + 1
+        # Cycle length plus a little scheduling slack; rare multi-hour gaps before a cycle
+        lengths = ((cycle + rng.uniform(0.0, 0.05, cycles)) * NS_PER_SECOND).astype(np.int64)
+        gaps = np.where(rng.random(cycles) < config.gap_rate, rng.uniform(3600, 6 * 3600, cycles) * NS_PER_SECOND, 0)
+        starts = cycle_start + np.cumsum(lengths) - lengths + np.cumsum(gaps.astype(np.int64))
+        cycle_start = int(starts[-1] + lengths[-1])
+
+        jitter = (rng.uniform(0, 0.01, (cycles, len(steps))) * NS_PER_SECOND).astype(np.int64)
+        ns = (starts[:, None] + offsets_ns[None, :] + jitter).ravel() // 1000 * 1000  # the firmware stamps microseconds
+        keep = np.flatnonzero(rng.random(len(ns)) >= config.drop_rate)[:remaining]
+        ns, step, heater = ns[keep], np.tile(step_numbers, cycles)[keep], np.tile(heater_temps, cycles)[keep]
+        n = len(ns)
+        if n == 0:
+            continue
+
+        walks = {}
+        for name, state in ambient.items():
+            value, stddev, low, high = state
+            walks[name] = np.round(np.clip(value + np.cumsum(rng.normal(0, stddev, n)), low, high), 5)
+            state[0] = float(walks[name][-1])
+        # Gas resistance falls steeply with heater temperature; the ADC reads a divider against it
+        gas_res = np.minimum(5e7 * np.exp(-heater / 35.0) * rng.lognormal(0, 0.3, n) + 5e3, _GAS_RES_MAX)
+        gas_adc = np.rint(4095 * gas_res / (gas_res + _ADC_REFERENCE_OHMS)).astype(np.int64).tolist()
+        hum, temp, press, volt = (walks[name].tolist() for name in ("hum", "temp", "press", "volt"))
+
+        if is_format_a:
+            rows = list(zip(gas_adc, hum, temp, volt))
+        else:
+            rows = list(zip(
+                [duration_ms] * n, gas_adc, np.rint(gas_res).astype(np.int64).tolist(), heater.tolist(),
+                hum, press, range(seq, seq + n), [_STATUS_OK] * n, step.tolist(), temp, volt,
+            ))
+        seq += n
+        remaining -= n
+        yield timestamp_keys(ns), rows
+
+
+def _nonempty_layout(config: DatasetConfig) -> list[tuple[int, str, str, str, bool, int]]:
+    """layout() with a stable per-profile index, minus profiles that get no records (RTDB stores no empty nodes)."""
+    return [(i, *entry) for i, entry in enumerate(config.layout()) if entry[-1] > 0]
+
+
+def iter_json_chunks(config: DatasetConfig) -> Iterator[str]:
+    """The whole tree as pieces of compact JSON text, in the same shape as a root GET."""
+    open_device = open_sensor = None
+    yield "{"
+    for index, device_id, sensor_id, hp_id, is_format_a, count in _nonempty_layout(config):
+        if device_id != open_device:
+            if open_device is not None:
+                yield "}},"
+            yield f'"{device_id}":{{"{sensor_id}":{{'
+            open_device, open_sensor = device_id, sensor_id
+        elif sensor_id != open_sensor:
+            yield f'}},"{sensor_id}":{{'
+            open_sensor = sensor_id
+        else:
+            yield ","
+        template = '"%s":' + (_FORMAT_A_TEMPLATE if is_format_a else _FORMAT_B_TEMPLATE)
+        yield f'"{hp_id}":{{'
+        first = True
+        for keys, rows in _hp_chunks(config, index, hp_id, is_format_a, count):
+            yield ("" if first else ",") + ",".join([template % ((key,) + row) for key, row in zip(keys, rows)])
+            first = False
+        yield "}"
+    if open_device is not None:
+        yield "}}"
+    yield "}"
+
+
+def iter_events(config: DatasetConfig) -> Iterator[Event]:
+    """The same data as (device, sensor, hp, timestamp, record) events, for in-process benchmarks."""
+    for index, device_id, sensor_id, hp_id, is_format_a, count in _nonempty_layout(config):
+        fields = FORMAT_A_FIELDS if is_format_a else FORMAT_B_FIELDS
+        for keys, rows in _hp_chunks(config, index, hp_id, is_format_a, count):
+            for key, row in zip(keys, rows):
+                yield device_id, sensor_id, hp_id, key, dict(zip(fields, row))
+
+
+def generate_tree(config: DatasetConfig) -> dict:
+    """Small datasets as an in-memory tree (parsed from the JSON text, so floats match a file round trip)."""
+    return json.loads("".join(iter_json_chunks(config)))
+
+
+def write_json(config: DatasetConfig, out: TextIO) -> int:
+    """Stream the tree as JSON into `out`; returns the number of characters written."""
+    written = 0
+    for chunk in iter_json_chunks(config):
+        out.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic K-nose Realtime Database snapshot.")
+    parser.add_argument("--output", "-o", required=True, help="JSON file to write, or - for stdout")
+    parser.add_argument("--devices", type=int, default=3)
+    parser.add_argument("--sensors", type=int, default=16, help="BME sensors per device")
+    parser.add_argument("--hps-per-sensor", type=int, default=1, help="Heater profiles recorded by each sensor")
+    parser.add_argument("--records", type=int, default=11_000, help="Total records, spread evenly over the heater profiles")
+    parser.add_argument("--format-a-fraction", type=float, default=0.5,
+                        help="Share of devices sending Format A (gas_adc/humidity/temperature/voltage) records")
+    parser.add_argument("--start", default="2026-02-01T10:00:00", help="Timestamp of the first cycle (UTC wall clock)")
+    parser.add_argument("--drop-rate", type=float, default=0.01, help="Probability that a sample is missing")
+    parser.add_argument("--gap-rate", type=float, default=0.001, help="Probability of a 1-6 hour gap before a cycle")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = DatasetConfig(
+        devices=args.devices, sensors=args.sensors, records=args.records, hps_per_sensor=args.hps_per_sensor,
+        format_a_fraction=args.format_a_fraction, start=args.start, drop_rate=args.drop_rate,
+        gap_rate=args.gap_rate, seed=args.seed,
+    )
+    if args.output == "-":
+        write_json(config, sys.stdout)
+        return
+    with open(args.output, "w") as f:
+        written = write_json(config, f)
+    print(f"Wrote {config.records} records ({written / (1024 * 1024):.1f} MB) to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Heater-cycle segmentation of time-sorted records, as the dashboard's CSVViewer rebuilds it.
+
+CSVViewer walks the rows of a device one at a time with a tracker per
+sensor + Hp: the step restarts at 1 on the first observation, when the sensor
+switches to another Hp, or after a gap of more than STEP_RESET_GAP_SECONDS,
+and otherwise advances 1 -> 2 -> ... -> 10 -> 1. Here the same rules are
+applied to whole columns with sorts, diffs and cumulative sums:
+
+  - a run is a stretch of records of one sensor + Hp without such a reset;
+  - within a run, a new cycle starts where the recorded Step does not increase
+    (10 -> 1, or a repeated step after a dropped record);
+  - runs with no recorded Step (Format A records) count records instead,
+    through the profile's sampled steps (the HEATER_PROFILES entries before
+    total_duration; MAX_STEPS steps for an unknown profile).
+
+Each record gets a cycle id (consecutive in time within a sensor + Hp), its
+step, the time elapsed since its cycle's first record and the heater
+temperature HEATER_PROFILES expects for that step.
+
+Usage: python scripts/heater_cycles.py store_dir [--device Device_1] [--concurrent-hps]
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+from heater_profiles import HEATER_PROFILES, extract_profile_id
+from record_store import RecordStore
+from timestamps import NS_PER_SECOND
+
+# Gap (seconds) after which the dashboard restarts the step count at 1
+STEP_RESET_GAP_SECONDS = 3600
+
+# Steps counted per cycle when the profile is unknown
+MAX_STEPS = 10
+
+
+@dataclass
+class CycleSegments:
+    """Per-record segmentation, aligned with the input rows."""
+    cycle_id: np.ndarray  # int64, 0-based, consecutive in time within a sensor + Hp
+    step: np.ndarray  # int16 step number, 0 where a run has recorded steps but this record has none
+    elapsed_ns: np.ndarray  # int64 nanoseconds since the first record of the cycle
+    heater_temp: np.ndarray  # float64 expected heater temperature (°C), NaN if the profile or step is unknown
+    counted: np.ndarray  # bool, True where the step was counted rather than recorded
+
+
+def _profile_tables(hp_ids: Sequence[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (sampled step count per Hp, Hp x position -> step number, Hp x step number -> heater temperature)
+    for the heater profiles of `hp_ids`.
+    """
+    profiles = [HEATER_PROFILES.get(extract_profile_id(hp_id)) for hp_id in hp_ids]
+    sampled = [
+        [step for time, step, _temp in p["steps"] if time < p["total_duration"]] if p else list(range(1, MAX_STEPS + 1))
+        for p in profiles
+    ]
+    counts = np.array([len(steps) for steps in sampled] or [0], dtype=np.int64)
+    sequence = np.zeros((len(sampled), max(counts.max(), 1)), dtype=np.int16)
+    for i, steps in enumerate(sampled):
+        sequence[i, :len(steps)] = steps
+    max_step = max((step for p in profiles if p for _time, step, _temp in p["steps"]), default=MAX_STEPS)
+    temps = np.full((len(profiles), max_step + 1), np.nan)
+    for i, p in enumerate(profiles):
+        for _time, step, temp in p["steps"] if p else ():
+            temps[i, step] = temp
+    return counts, sequence, temps
+
+
+def segment_cycles(
+    timestamp_ns: np.ndarray,
+    sensor: np.ndarray,
+    hp: np.ndarray,
+    hp_ids: Sequence[str],
+    step: Optional[np.ndarray] = None,
+    hp_switch_resets: bool = True,
+) -> CycleSegments:
+    """
+    Segment the records of one device: `sensor` and `hp` are integer codes per record (`hp` indexes
+    `hp_ids`), `step` the recorded Step, where values <= 0 count as absent (as the dashboard's Step > 0).
+    Rows may come in any order; ties in time keep their input order. Pass hp_switch_resets=False for
+    sensors that run several heater profiles side by side, where every interleaved record is a switch.
+    """
+    timestamp_ns = np.asarray(timestamp_ns, dtype=np.int64)
+    sensor, hp = np.asarray(sensor), np.asarray(hp)
+    n = len(timestamp_ns)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return CycleSegments(empty, np.zeros(0, dtype=np.int16), empty.copy(), np.zeros(0), np.zeros(0, dtype=bool))
+
+    # A sensor that switches Hp restarts the count, even if the new Hp ran before
+    switched = np.zeros(n, dtype=bool)
+    if hp_switch_resets:
+        by_sensor = np.lexsort((timestamp_ns, sensor))
+        after, before = by_sensor[1:], by_sensor[:-1]
+        switched[after] = (sensor[after] == sensor[before]) & (hp[after] != hp[before])
+
+    # Everything below works on records grouped by sensor + Hp, in time order
+    order = np.lexsort((timestamp_ns, hp, sensor))
+    ts, s_hp = timestamp_ns[order], hp[order]
+    s_sensor = sensor[order]
+    reset = np.ones(n, dtype=bool)
+    reset[1:] = (
+        (s_sensor[1:] != s_sensor[:-1]) | (s_hp[1:] != s_hp[:-1])
+        | (np.diff(ts) > STEP_RESET_GAP_SECONDS * NS_PER_SECOND)
+    )
+    reset |= switched[order]
+    positions = np.arange(n)
+    run_starts = np.flatnonzero(reset)
+    run_start = np.maximum.accumulate(np.where(reset, positions, 0))
+
+    if step is None:
+        recorded = np.zeros(n, dtype=bool)
+        s_step = np.zeros(n, dtype=np.int64)
+    else:
+        s_step = np.asarray(step)[order].astype(np.int64)
+        recorded = s_step > 0
+    counted = (np.add.reduceat(recorded, run_starts) == 0)[np.cumsum(reset) - 1]
+
+    # Recorded steps: a new cycle where the step does not exceed the previous recorded step of the run
+    last = np.maximum.accumulate(np.where(recorded, positions, -1))
+    previous = np.concatenate(([-1], last[:-1]))
+    wrapped = recorded & (previous >= run_start) & (s_step <= s_step[np.maximum(previous, 0)])
+
+    # Counted steps: the run's records go through the profile's sampled steps in turn
+    counts, sequence, temps = _profile_tables(hp_ids)
+    per_cycle = counts[s_hp]
+    offset = (positions - run_start) % np.maximum(per_cycle, 1)
+    boundary = reset | wrapped | (counted & (offset == 0))
+
+    cycle = np.cumsum(boundary) - 1
+    elapsed = ts - ts[np.flatnonzero(boundary)][cycle]
+    steps = np.where(counted, sequence[s_hp, offset], np.where(recorded, s_step, 0))
+    known = (steps > 0) & (steps < temps.shape[1])
+    heater_temp = np.where(known, temps[s_hp, np.where(known, steps, 0)], np.nan)
+
+    result = CycleSegments(
+        cycle_id=np.empty(n, dtype=np.int64),
+        step=np.empty(n, dtype=np.int16),
+        elapsed_ns=np.empty(n, dtype=np.int64),
+        heater_temp=np.empty(n),
+        counted=np.empty(n, dtype=bool),
+    )
+    result.cycle_id[order] = cycle
+    result.step[order] = steps
+    result.elapsed_ns[order] = elapsed
+    result.heater_temp[order] = heater_temp
+    result.counted[order] = counted
+    return result
+
+
+def segment_store_device(store: RecordStore, device_id: str, hp_switch_resets: bool = True) -> dict[str, CycleSegments]:
+    """Segment every Hp partition of a device together; one CycleSegments per Hp, aligned with its partition rows."""
+    hp_ids = [hp_id for device, hp_id in store.partitions() if device == device_id]
+    parts = [store.partition(device_id, hp_id, ("timestamp_ns", "sensor", "Step")) for hp_id in hp_ids]
+    sizes = [len(part["timestamp_ns"]) for part in parts]
+    segments = segment_cycles(
+        np.concatenate([part["timestamp_ns"] for part in parts] or [np.zeros(0, dtype=np.int64)]),
+        np.concatenate([part["sensor"] for part in parts] or [np.zeros(0, dtype=np.int16)]),
+        np.repeat(np.arange(len(hp_ids)), sizes),
+        hp_ids,
+        np.concatenate([part["Step"] for part in parts] or [np.zeros(0, dtype=np.int16)]),
+        hp_switch_resets,
+    )
+    bounds = np.cumsum(sizes)[:-1]
+    split = {name: np.split(getattr(segments, name), bounds) for name in CycleSegments.__dataclass_fields__}
+    return {hp_id: CycleSegments(**{name: split[name][i] for name in split}) for i, hp_id in enumerate(hp_ids)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Segment the records of a K-nose record store into heater cycles.")
+    parser.add_argument("store", help="Record store directory (extract_firebase_schema.py --store)")
+    parser.add_argument("--device", action="append", help="Only this device (repeatable)")
+    parser.add_argument("--concurrent-hps", action="store_true",
+                        help="Sensors run their heater profiles side by side: switching Hp does not restart a cycle")
+    args = parser.parse_args()
+    try:
+        store = RecordStore(args.store)
+    except (OSError, ValueError) as e:
+        print(f"Failed to open record store: {e}", file=sys.stderr)
+        return 1
+
+    devices = args.device or list(dict.fromkeys(device for device, _hp in store.partitions()))
+    print(f"{'Device/BME/Hp':<28} {'records':>10} {'cycles':>8} {'median span':>13} {'profile':>8}  steps")
+    for device_id in devices:
+        for hp_id, segments in segment_store_device(store, device_id, not args.concurrent_hps).items():
+            sensors = store.column(device_id, hp_id, "sensor")
+            profile = HEATER_PROFILES.get(extract_profile_id(hp_id))
+            for code in np.unique(sensors):
+                rows = sensors == code
+                cycle_ids, lengths = np.unique(segments.cycle_id[rows], return_counts=True)
+                # A cycle's span is the elapsed time of its last record
+                ends = np.cumsum(lengths) - 1
+                durations = segments.elapsed_ns[rows][np.argsort(segments.cycle_id[rows], kind="stable")][ends]
+                counted = int(segments.counted[rows].sum())
+                print(
+                    f"{device_id + '/' + str(store.sensor_ids(code)) + '/' + hp_id:<28} {int(rows.sum()):>10} "
+                    f"{len(cycle_ids):>8} {np.median(durations) / NS_PER_SECOND:>12.2f}s "
+                    f"{str(profile['total_duration']) + 's' if profile else '-':>8}  "
+                    f"{'counted' if counted == rows.sum() else 'recorded' if not counted else 'mixed'}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
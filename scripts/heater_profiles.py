@@ -0,0 +1,134 @@
+"""
+Heater-profile definitions, as in verify-steps-timestamps.js (HEATER_PROFILES).
+
+Each profile lists (time, step, temp): the step starting `time` seconds into a
+heater cycle of `total_duration` seconds, and its heater temperature in °C.
+"""
+
+import re
+
+HEATER_PROFILES = {
+    "301": {
+        "total_duration": 18,
+        "steps": [
+            (0, 1, 100), (6, 2, 100), (7, 3, 200), (9, 4, 200), (11, 5, 200), (12, 6, 200), (13, 7, 320),
+            (15, 8, 320), (17, 9, 320), (18, 10, 320),
+        ],
+    },
+    "321": {
+        "total_duration": 18,
+        "steps": [
+            (0, 1, 100), (6, 2, 100), (6.5, 3, 320), (6.8, 4, 320), (7.2, 5, 200), (10, 6, 200),
+            (13, 7, 200), (14, 8, 320), (16, 9, 320), (17.5, 10, 320), (18, 11, 320),
+        ],
+    },
+    "322": {
+        "total_duration": 26,
+        "steps": [
+            (0, 1, 100), (9, 2, 100), (9.5, 3, 320), (9.8, 4, 320), (10.2, 5, 200), (14, 6, 200),
+            (18, 7, 200), (19, 8, 320), (22, 9, 320), (25, 10, 320), (26, 11, 320),
+        ],
+    },
+    "323": {
+        "total_duration": 18,
+        "steps": [
+            (0, 1, 70), (6, 2, 70), (6.3, 3, 350), (6.6, 4, 350), (7, 5, 210), (10, 6, 210), (13, 7, 210),
+            (14, 8, 350), (16, 9, 350), (17.5, 10, 350), (18, 11, 350),
+        ],
+    },
+    "324": {
+        "total_duration": 26,
+        "steps": [
+            (0, 1, 70), (9, 2, 70), (9.3, 3, 350), (9.7, 4, 350), (10.1, 5, 210), (14, 6, 210),
+            (18, 7, 210), (19, 8, 350), (22, 9, 350), (25, 10, 350), (26, 11, 350),
+        ],
+    },
+    "331": {
+        "total_duration": 75,
+        "steps": [
+            (0, 1, 50), (10, 2, 50), (20, 3, 50), (20.5, 4, 350), (40, 5, 350), (50, 6, 140), (60, 7, 140),
+            (60.5, 8, 350), (75, 9, 350),
+        ],
+    },
+    "332": {
+        "total_duration": 110,
+        "steps": [
+            (0, 1, 50), (15, 2, 50), (30, 3, 50), (30.5, 4, 350), (60, 5, 350), (70, 6, 140), (85, 7, 140),
+            (85.5, 8, 350), (110, 9, 350),
+        ],
+    },
+    "354": {
+        "total_duration": 10,
+        "steps": [
+            (0, 1, 320), (1, 2, 320), (1.5, 3, 100), (3, 4, 100), (6.5, 5, 100), (7, 6, 200), (8, 7, 200),
+            (9, 8, 320), (9.5, 9, 320), (10, 10, 320),
+        ],
+    },
+    "411": {
+        "total_duration": 23,
+        "steps": [
+            (0, 1, 100), (6, 2, 100), (6.3, 3, 320), (6.8, 4, 170), (13, 5, 170), (13.3, 6, 320),
+            (14, 7, 240), (18, 8, 240), (19, 9, 320), (21, 10, 320), (23, 11, 320),
+        ],
+    },
+    "412": {
+        "total_duration": 36,
+        "steps": [
+            (0, 1, 100), (9, 2, 100), (9.3, 3, 320), (9.8, 4, 170), (18, 5, 170), (18.3, 6, 320),
+            (19, 7, 240), (23, 8, 240), (27, 9, 240), (28, 10, 320), (32, 11, 320), (36, 12, 320),
+        ],
+    },
+    "413": {
+        "total_duration": 23,
+        "steps": [
+            (0, 1, 70), (6, 2, 70), (6.3, 3, 350), (6.8, 4, 160), (13, 5, 160), (13.3, 6, 350),
+            (14, 7, 255), (18, 8, 255), (19, 9, 350), (21, 10, 350), (23, 11, 350),
+        ],
+    },
+    "414": {
+        "total_duration": 36,
+        "steps": [
+            (0, 1, 70), (9, 2, 70), (9.3, 3, 350), (9.7, 4, 160), (18, 5, 160), (18.5, 6, 350),
+            (19, 7, 255), (23, 8, 255), (28, 9, 255), (29, 10, 350), (32, 11, 350), (36, 12, 350),
+        ],
+    },
+    "501": {
+        "total_duration": 26,
+        "steps": [
+            (0, 1, 210), (4, 2, 210), (4.5, 3, 260), (7, 4, 260), (7.5, 5, 320), (10, 6, 320), (14, 7, 260),
+            (18, 8, 210), (21, 9, 150), (24, 10, 100), (26, 11, 150),
+        ],
+    },
+    "502": {
+        "total_duration": 35,
+        "steps": [
+            (0, 1, 210), (5, 2, 210), (5.5, 3, 260), (9, 4, 260), (9.5, 5, 320), (13, 6, 320), (17, 7, 260),
+            (22, 8, 210), (27, 9, 150), (31, 10, 100), (35, 11, 150),
+        ],
+    },
+    "503": {
+        "total_duration": 26,
+        "steps": [
+            (0, 1, 210), (4, 2, 210), (4.5, 3, 280), (7, 4, 280), (7.5, 5, 350), (10, 6, 350), (13, 7, 280),
+            (17, 8, 210), (21, 9, 140), (24, 10, 70), (26, 11, 140),
+        ],
+    },
+    "504": {
+        "total_duration": 35,
+        "steps": [
+            (0, 1, 210), (5, 2, 210), (5.5, 3, 280), (9, 4, 280), (9.5, 5, 350), (13, 6, 350), (17, 7, 280),
+            (21, 8, 210), (25, 9, 140), (30, 10, 70), (35, 11, 140),
+        ],
+    },
+}
+
+# Duration field (ms) that Format B records of each profile carry, as observed in the database
+RECORD_DURATION_MS = {
+    "301": 280, "321": 6020, "322": 8960, "323": 6020, "324": 8960, "331": 9800, "332": 14000, "354": 700,
+    "411": 6020, "412": 8960, "413": 6020, "414": 8960, "501": 3360, "502": 4480, "503": 3360, "504": 4480,
+}
+
+
+def extract_profile_id(hp_id: str) -> str:
+    """Hp_301 / HP_301 / hp301 -> '301' (extractProfileId in the dashboard)."""
+    return re.sub(r"^[Hh][Pp]_?", "", hp_id).strip()
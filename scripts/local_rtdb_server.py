@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Firebase Realtime Database REST API, serving a JSON snapshot.
+
+Supports what the schema tooling uses: GET <path>.json, shallow=true,
+orderBy="$key" with startAt / endAt / limitToFirst / limitToLast, and ETags
+(X-Firebase-ETag: true, answered with 304 when If-None-Match still matches). Latency,
+bandwidth and injected 503s are configurable, so fetch strategies can be
+load-tested reproducibly. The snapshot is re-read when the file changes,
+which is enough to exercise --sync.
+
+Usage: python scripts/local_rtdb_server.py snapshot.json [--port 8765] [--latency 0.05] [--bandwidth 2000000]
+       FIREBASE_URL=http://127.0.0.1:8765 python scripts/extract_firebase_schema.py --sharded
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+from firebase_rest import key_sort_key
+
+# Bytes written per socket write when throttling bandwidth
+_CHUNK_SIZE = 64 * 1024
+
+
+class QueryError(ValueError):
+    """A query RTDB would reject with 400 Bad Request."""
+
+
+class Snapshot:
+    """The served tree: a fixed object, or a JSON file reloaded whenever its mtime changes."""
+
+    def __init__(self, data: Any = None, path: Optional[str] = None):
+        self.path = path
+        self.data = data
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        if self.path is None:
+            return self.data
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime != self._mtime:
+                with open(self.path) as f:
+                    self.data = json.load(f)
+                self._mtime = mtime
+            return self.data
+
+
+def resolve(data: Any, path: str) -> Any:
+    """Node at a '/'-separated path, None (JSON null) if it does not exist."""
+    node = data
+    for part in (p for p in path.split("/") if p):
+        if not isinstance(node, dict):
+            return None
+        node = node.get(part)
+    return node
+
+
+def apply_query(node: Any, params: dict[str, str]) -> Any:
+    """Apply shallow / orderBy="$key" range parameters the way the REST API does."""
+    range_names = ("startAt", "endAt", "limitToFirst", "limitToLast")
+    has_range = any(name in params for name in range_names)
+    if params.get("shallow") == "true":
+        if has_range or "orderBy" in params:
+            raise QueryError("Mixing 'shallow' and querying parameters is not supported")
+        return {key: True for key in node} if isinstance(node, dict) else node
+    if "orderBy" not in params:
+        if has_range:
+            raise QueryError("orderBy must be defined when other query parameters are defined")
+        return node
+
+    try:
+        order_by = json.loads(params["orderBy"])
+        bounds = {name: json.loads(params[name]) for name in ("startAt", "endAt") if name in params}
+        limits = {name: int(params[name]) for name in ("limitToFirst", "limitToLast") if name in params}
+    except ValueError:
+        raise QueryError("Invalid query parameter: values must be JSON, limits integers")
+    if order_by != "$key":
+        raise QueryError('Only orderBy="$key" is supported by the local server')
+    if len(limits) > 1:
+        raise QueryError("Cannot specify both limitToFirst and limitToLast")
+    if any(not isinstance(value, str) for value in bounds.values()):
+        raise QueryError("startAt / endAt must be strings when ordering by key")
+    if not isinstance(node, dict):
+        return node
+
+    keys = sorted(node, key=key_sort_key)
+    if "startAt" in bounds:
+        start = key_sort_key(bounds["startAt"])
+        keys = [k for k in keys if key_sort_key(k) >= start]
+    if "endAt" in bounds:
+        end = key_sort_key(bounds["endAt"])
+        keys = [k for k in keys if key_sort_key(k) <= end]
+    if "limitToFirst" in limits:
+        keys = keys[:limits["limitToFirst"]]
+    elif "limitToLast" in limits:
+        keys = keys[-limits["limitToLast"]:] if limits["limitToLast"] > 0 else []
+    # Like RTDB, a query that matches no children gives null rather than {}
+    return {key: node[key] for key in keys} or None
+
+
+class RTDBRequestHandler(BaseHTTPRequestHandler):
+    """Read-only REST endpoint; the server object carries the snapshot and the throttling settings."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients behave as against the real database
+    # Headers and body go out in separate writes: with Nagle on, each keep-alive response waits for a delayed ACK
+    disable_nagle_algorithm = True
+    server: "LocalRTDBServer"
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if not url.path.endswith(".json"):
+            self.send_json(404, {"error": "Only <path>.json is served"})
+            return
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+        if server.error_rate and random.random() < server.error_rate:
+            self.send_json(503, {"error": "Injected failure"})
+            return
+        try:
+            node = apply_query(resolve(server.snapshot.get(), unquote(url.path[:-len(".json")])), params)
+        except QueryError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        self.send_json(200, node, etag=self.headers.get("X-Firebase-ETag") == "true")
+
+    def send_json(self, status: int, value: Any, etag: bool = False) -> None:
+        body = json.dumps(value, separators=(",", ":")).encode()
+        headers = {}
+        if etag:
+            # Like RTDB: base64 of the SHA-1 of the value
+            headers["ETag"] = base64.b64encode(hashlib.sha1(body).digest()).decode()
+            if self.headers.get("If-None-Match") == headers["ETag"]:
+                status, body = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, header_value in headers.items():
+            self.send_header(name, header_value)
+        self.end_headers()
+        bandwidth = self.server.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        start = time.perf_counter()
+        for offset in range(0, len(body), _CHUNK_SIZE):
+            self.wfile.write(body[offset:offset + _CHUNK_SIZE])
+            ahead = (offset + _CHUNK_SIZE) / bandwidth - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class LocalRTDBServer(ThreadingHTTPServer):
+    """
+    latency: seconds added before every response (plus uniform(0, jitter));
+    bandwidth: bytes per second per response, 0 for unlimited;
+    error_rate: fraction of requests answered with 503, to exercise retries.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        snapshot: Snapshot,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        bandwidth: float = 0,
+        error_rate: float = 0.0,
+        verbose: bool = False,
+    ):
+        super().__init__((host, port), RTDBRequestHandler)
+        self.snapshot = snapshot
+        self.latency, self.jitter = latency, jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.verbose = verbose
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def serve_in_background(data: Any = None, path: Optional[str] = None, port: int = 0, **settings) -> LocalRTDBServer:
+    """Start a server on a daemon thread (port 0 picks a free port); use .url, and .shutdown() when done."""
+    server = LocalRTDBServer(Snapshot(data, path), port=port, **settings)
+    threading.Thread(target=server.serve_forever, name="local-rtdb", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a JSON snapshot with Firebase RTDB REST semantics.")
+    parser.add_argument("snapshot", help="JSON file holding the body of a root GET (reloaded when it changes)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, uniform in [0, JITTER] seconds")
+    parser.add_argument("--bandwidth", type=float, default=0,
+                        help="Response throughput limit in bytes/second per connection (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, help="Seed for jitter and injected errors")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    snapshot = Snapshot(path=args.snapshot)
+    snapshot.get()
+    server = LocalRTDBServer(
+        snapshot, args.host, args.port,
+        latency=args.latency, jitter=args.jitter, bandwidth=args.bandwidth,
+        error_rate=args.error_rate, verbose=args.verbose,
+    )
+    print(f"Serving {args.snapshot} at {server.url} (FIREBASE_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
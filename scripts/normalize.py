@@ -0,0 +1,275 @@
+"""
+Bulk record normalisation, mirroring the dashboard's normalizeReading (deviceService.ts).
+
+normalizeReading maps both record formats onto the 11 Format B fields one dict
+at a time: GasADC ?? gas_adc, Hum ?? humidity, Temp ?? temperature and
+Volt ?? voltage, numbers kept, anything else through Number(v) || 0, and
+Status kept as a number or turned into a string with String(). Here a whole
+batch of raw record dicts becomes one typed array per field plus a validity
+mask, without building a dict per record: records are grouped by their keys
+and each field of a group is pulled out with itemgetter and converted by numpy
+in one pass.
+
+Where normalizeReading substitutes 0 (or "" for Status) for a missing or
+unconvertible value, the value is 0 / "" here too and its validity is False.
+Number("Infinity") is a valid number, as in JavaScript. Integer fields are
+truncated to integers; values that do not fit (infinities included) are invalid.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from decimal import Decimal
+from itertools import repeat
+from operator import itemgetter
+from typing import Any, Iterable, Optional, Sequence
+
+import numpy as np
+
+from partial_schema import FORMAT_B_FIELDS
+
+# Normalised field -> Format A field used when the Format B one is absent or null
+FORMAT_A_ALIASES = {"GasADC": "gas_adc", "Hum": "humidity", "Temp": "temperature", "Volt": "voltage"}
+
+# Output dtype per normalised field (Status is an object array of numbers and strings)
+NORMALIZED_DTYPES = {
+    "Duration": "int32",
+    "GasADC": "int32",
+    "GasRes": "float64",
+    "Heater_Temp": "float64",
+    "Hum": "float64",
+    "Press": "float64",
+    "Seq": "int32",
+    "Status": "object",
+    "Step": "int16",
+    "Temp": "float64",
+    "Volt": "float64",
+}
+
+_NUMERIC_FIELDS = [f for f in FORMAT_B_FIELDS if NORMALIZED_DTYPES[f] != "object"] + list(FORMAT_A_ALIASES.values())
+_VALUE_FIELDS = [f for f in FORMAT_B_FIELDS if NORMALIZED_DTYPES[f] == "object"]
+
+
+# JavaScript StringNumericLiteral: a decimal (or Infinity) with an optional sign, or an unsigned 0x / 0o / 0b integer
+_JS_DECIMAL = re.compile(r"[+-]?(?:Infinity|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)", re.ASCII)
+_JS_NON_DECIMAL = re.compile(r"0(?:[xX][0-9a-fA-F]+|[oO][0-7]+|[bB][01]+)", re.ASCII)
+
+
+def _float(number: float) -> float:
+    """float(), with integers beyond the float range becoming infinite as in JavaScript."""
+    try:
+        return float(number)
+    except OverflowError:
+        return math.inf if number > 0 else -math.inf
+
+
+def to_number(value: Any) -> Optional[float]:
+    """JavaScript Number(value) for one non-null value; None where it gives NaN."""
+    if isinstance(value, (bool, int, float)):
+        return _float(value)
+    if isinstance(value, list):
+        # Arrays convert through their String() form: [5] -> "5", [] -> "" -> 0, [1, 2] -> "1,2" -> NaN
+        value = _js_string(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return 0.0
+        if _JS_NON_DECIMAL.fullmatch(text):
+            return _float(int(text, 0))
+        if _JS_DECIMAL.fullmatch(text):
+            return float(text)
+    return None
+
+
+def _js_number_string(number: float) -> str:
+    """JavaScript Number::toString: shortest round-trip digits, exponent form below 1e-6 and from 1e21."""
+    number = _float(number)
+    if math.isnan(number):
+        return "NaN"
+    if math.isinf(number):
+        return "Infinity" if number > 0 else "-Infinity"
+    if number == 0:
+        return "0"
+    _sign, digit_tuple, exponent = Decimal(repr(abs(number))).normalize().as_tuple()
+    digits = "".join(map(str, digit_tuple))
+    # The decimal point sits after `point` digits
+    point = exponent + len(digits)
+    if len(digits) <= point <= 21:
+        text = digits + "0" * (point - len(digits))
+    elif 0 < point <= 21:
+        text = f"{digits[:point]}.{digits[point:]}"
+    elif -6 < point <= 0:
+        text = "0." + "0" * -point + digits
+    else:
+        mantissa = f"{digits[0]}.{digits[1:]}" if len(digits) > 1 else digits
+        text = f"{mantissa}e{'+' if point > 0 else '-'}{abs(point - 1)}"
+    return "-" + text if number < 0 else text
+
+
+def _js_string(value: Any) -> str:
+    """JavaScript String(value) for a JSON value."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return _js_number_string(value)
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        # Array.prototype.join: null elements become empty strings
+        return ",".join("" if item is None else _js_string(item) for item in value)
+    return "[object Object]"
+
+
+def _as_float(value: Any) -> float:
+    """Slow-path conversion: NaN for null (absent) and for a value Number() cannot convert."""
+    if value is None:
+        return np.nan
+    number = to_number(value)
+    return np.nan if number is None else number
+
+
+@dataclass
+class ColumnBatch:
+    """Columns pulled out of a batch of raw records by extract_batch()."""
+    # field -> (float64 values, present, valid): present = there and not null, valid = converts to a number
+    numeric: dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]]
+    # field -> object array of the raw values, None where absent
+    values: dict[str, np.ndarray]
+    # record key tuple (None for records that are not objects) -> number of records
+    key_sets: dict[Optional[tuple], int]
+
+
+def _subset(records: Sequence[Any], index: np.ndarray) -> Sequence[Any]:
+    # A group of every record always lists them in order
+    if len(index) == len(records):
+        return records
+    return [records[index[0]]] if len(index) == 1 else itemgetter(*index.tolist())(records)
+
+
+def _numeric_column(subset: Sequence[Any], field: str) -> tuple[np.ndarray, np.ndarray]:
+    """(float64 column with NaN for null and unconvertible values, present mask); KeyError if a record lacks it."""
+    raw = list(map(itemgetter(field), subset))
+    # Numbers, booleans and nulls (NaN) convert in one pass; strings need Number(), not float() ("1_0", "nan")
+    if str not in set(map(type, raw)):
+        try:
+            column = np.fromiter(raw, dtype=np.float64, count=len(raw))
+            return column, ~np.isnan(column)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    column = np.fromiter(map(_as_float, raw), dtype=np.float64, count=len(raw))
+    return column, np.fromiter((value is not None for value in raw), dtype=bool, count=len(raw))
+
+
+def _record_groups(records: Sequence[Any]) -> list[tuple[np.ndarray, bool]]:
+    """
+    Candidate groups of row indices: records with the same number of keys, to be confirmed while the
+    fields are extracted (checked=False), or exact key-tuple groups when there are non-object records.
+    """
+    if all(map(isinstance, records, repeat(dict))):
+        lengths = np.fromiter(map(len, records), dtype=np.intp, count=len(records))
+        order = np.argsort(lengths, kind="stable")
+        bounds = np.flatnonzero(np.diff(lengths[order])) + 1
+        return [(index, False) for index in np.split(order, bounds)]
+    groups: dict[Optional[tuple], list[int]] = {}
+    for i, record in enumerate(records):
+        groups.setdefault(tuple(record) if isinstance(record, dict) else None, []).append(i)
+    return [(np.array(rows, dtype=np.intp), True) for rows in groups.values()]
+
+
+def _exact_groups(subset: Sequence[Any], index: np.ndarray) -> list[tuple[np.ndarray, bool]]:
+    groups: dict[tuple, list[int]] = {}
+    for record, i in zip(subset, index.tolist()):
+        groups.setdefault(tuple(record), []).append(i)
+    return [(np.array(rows, dtype=np.intp), True) for rows in groups.values()]
+
+
+def extract_batch(records: Sequence[Any], numeric_fields: Iterable[str], value_fields: Iterable[str] = ()) -> ColumnBatch:
+    """
+    Numeric columns (Number() semantics: booleans and numeric strings count) and raw value columns of a
+    batch of records, extracted field by field over groups of records with the same keys.
+    Values are 0 where not valid.
+    """
+    numeric_fields, value_fields = list(numeric_fields), list(value_fields)
+    n = len(records)
+    batch = ColumnBatch(
+        numeric={field: (np.zeros(n), np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)) for field in numeric_fields},
+        values={field: np.full(n, None, dtype=object) for field in value_fields},
+        key_sets={},
+    )
+    known = set(numeric_fields) | set(value_fields)
+    pending = _record_groups(records) if n else []
+    while pending:
+        index, checked = pending.pop()
+        subset = _subset(records, index)
+        first = subset[0]
+        signature = tuple(first) if isinstance(first, dict) else None
+        if signature is None:
+            batch.key_sets[None] = batch.key_sets.get(None, 0) + len(index)
+            continue
+        if not checked and not known.issuperset(signature):
+            # Unknown keys: a length match says nothing about the key set, so group exactly
+            pending.extend(_exact_groups(subset, index))
+            continue
+        try:
+            for field in numeric_fields:
+                if field in signature:
+                    column, present = _numeric_column(subset, field)
+                    values, is_present, is_valid = batch.numeric[field]
+                    # Null and unconvertible values are NaN; infinities are numbers to Number()
+                    valid = ~np.isnan(column)
+                    values[index] = np.where(valid, column, 0.0)
+                    is_present[index] = present
+                    is_valid[index] = valid
+            for field in value_fields:
+                if field in signature:
+                    # fromiter keeps list / dict values as single objects
+                    batch.values[field][index] = np.fromiter(map(itemgetter(field), subset), dtype=object, count=len(subset))
+        except KeyError:
+            # Same length, different keys: every record of the group holds all keys only if none is missing
+            pending.extend(_exact_groups(subset, index))
+            continue
+        batch.key_sets[signature] = batch.key_sets.get(signature, 0) + len(index)
+    return batch
+
+
+def _status_value(value: Any) -> Any:
+    """Status as normalizeReading keeps it: numbers as they are, anything else through String()."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return _js_string(value)
+
+
+def normalize_records(records: Sequence[Any]) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """{field: (values, valid)} for the 11 normalised fields of a batch of raw records (see module doc)."""
+    batch = extract_batch(records, _NUMERIC_FIELDS, _VALUE_FIELDS)
+    raw = batch.numeric
+    result = {}
+    for field in FORMAT_B_FIELDS:
+        dtype = NORMALIZED_DTYPES[field]
+        if dtype == "object":
+            statuses = batch.values[field]
+            valid = np.not_equal(statuses, None)
+            values = np.full(len(records), "", dtype=object)
+            present = statuses[valid]
+            if set(map(type, present)) <= {int, float, str}:
+                values[valid] = present
+            else:
+                values[valid] = [_status_value(value) for value in present]
+            result[field] = (values, valid)
+            continue
+        values, present, valid = raw[field]
+        alias = FORMAT_A_ALIASES.get(field)
+        if alias:
+            # `??` only falls back on null / absent, not on values that fail to convert
+            fallback = ~present
+            alias_values, _alias_present, alias_valid = raw[alias]
+            values = np.where(fallback, alias_values, values)
+            valid = np.where(fallback, alias_valid, valid)
+        if dtype != "float64":
+            info = np.iinfo(dtype)
+            valid = valid & (values >= info.min) & (values <= info.max)
+            values = np.where(valid, np.trunc(values), 0).astype(dtype)
+        result[field] = (values, valid)
+    return result
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Export a record store (record_store.py) as partitioned Parquet files, written in pure Python.
+
+One row per record: the 11 normalised fields (Format A records fill GasADC,
+Hum, Temp and Volt from gas_adc, humidity, temperature and voltage, as the
+dashboard's normalizeReading does) plus device, sensor, hp and timestamp_ns.
+Files are partitioned by device, UTC date and heater profile:
+
+    out/_manifest.json      (the leading underscore keeps dataset readers from taking it for data)
+    out/Device_1/2026-02-01/Hp_301.parquet
+    ...
+
+Each file holds time-sorted row groups of at most `row_group_size` rows. String
+columns (device, sensor, hp, Status) are dictionary-encoded, and every column
+chunk carries min / max / null-count statistics, so readers such as pyarrow,
+DuckDB or Spark can skip row groups (and whole files, via the manifest or the
+path) that a filter excludes. Missing values are nulls rather than the
+dashboard's zeros.
+
+Status is a string column: records carry numeric codes and text in the same
+field and a Parquet column has a single type, so numbers are written in their
+JSON form (176 becomes "176"); cast them back when a numeric code is needed.
+
+Usage: python scripts/parquet_export.py store_dir parquet_dir
+       python scripts/parquet_export.py store_dir parquet_dir --row-group-size 1000000 --compression none
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import zlib
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+
+from normalize import FORMAT_A_ALIASES
+from partial_schema import FORMAT_B_FIELDS
+from record_store import FIELD_DTYPES, MISSING_INT, RecordStore
+from timestamps import NS_PER_SECOND
+
+EXPORT_VERSION = 1
+DEFAULT_ROW_GROUP_SIZE = 1 << 17
+# Fast gzip: the columns are written once and read many times, but exports of long histories must not crawl
+GZIP_LEVEL = 1
+CREATED_BY = "knose parquet_export version 1"
+
+_NS_PER_DAY = 86400 * NS_PER_SECOND
+
+# Thrift compact protocol field types
+_BOOL_TRUE, _BOOL_FALSE, _BYTE, _I16, _I32, _I64, _BINARY, _LIST, _STRUCT = 1, 2, 3, 4, 5, 6, 8, 9, 12
+# Parquet enums (parquet.thrift)
+_PHYSICAL_TYPES = {"INT32": 1, "INT64": 2, "FLOAT": 4, "BYTE_ARRAY": 6}
+_REQUIRED, _OPTIONAL = 0, 1
+_PLAIN, _PLAIN_DICTIONARY, _RLE = 0, 2, 3
+_DATA_PAGE, _DICTIONARY_PAGE = 0, 2
+_CODECS = {"none": 0, "gzip": 2}
+_CONVERTED_UTF8, _CONVERTED_INT_16 = 0, 16
+_PLAIN_DTYPES = {"INT32": "<i4", "INT64": "<i8", "FLOAT": "<f4"}
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _thrift_value(ftype: int, value: Any) -> bytes:
+    if ftype == _BYTE:
+        return struct.pack("<b", value)
+    if ftype in (_I16, _I32, _I64):
+        return _varint(_zigzag(value))
+    if ftype == _BINARY:
+        data = value.encode() if isinstance(value, str) else value
+        return _varint(len(data)) + data
+    if ftype == _STRUCT:
+        return _thrift_struct(value)
+    if ftype == _LIST:
+        elem_type, items = value
+        header = bytes([(len(items) << 4) | elem_type]) if len(items) < 15 else bytes([0xF0 | elem_type]) + _varint(len(items))
+        return header + b"".join(_thrift_value(elem_type, item) for item in items)
+    raise ValueError(f"Unsupported thrift type {ftype}")
+
+
+def _thrift_struct(fields: list[tuple[int, int, Any]]) -> bytes:
+    """Compact-protocol struct from (field id, type, value) triples in id order; None values are left out."""
+    out = bytearray()
+    last_id = 0
+    for field_id, ftype, value in fields:
+        if value is None:
+            continue
+        if ftype == _BOOL_TRUE:
+            ftype = _BOOL_TRUE if value else _BOOL_FALSE
+        delta = field_id - last_id
+        out += bytes([(delta << 4) | ftype]) if 0 < delta <= 15 else bytes([ftype]) + _varint(_zigzag(field_id))
+        if ftype not in (_BOOL_TRUE, _BOOL_FALSE):
+            out += _thrift_value(ftype, value)
+        last_id = field_id
+    out.append(0)
+    return bytes(out)
+
+
+def _bit_width(max_value: int) -> int:
+    return max(1, int(max_value).bit_length())
+
+
+def _hybrid(values: np.ndarray, width: int) -> bytes:
+    """RLE / bit-packing hybrid encoding: one RLE run if all values are equal, else one bit-packed run."""
+    if not len(values):
+        return b""
+    if (values == values[0]).all():
+        return _varint(len(values) << 1) + int(values[0]).to_bytes((width + 7) // 8, "little")
+    groups = -(-len(values) // 8)
+    padded = np.zeros(groups * 8, dtype=np.uint32)
+    padded[:len(values)] = values
+    bits = ((padded[:, None] >> np.arange(width, dtype=np.uint32)) & 1).astype(np.uint8)
+    return _varint((groups << 1) | 1) + np.packbits(bits.ravel(), bitorder="little").tobytes()
+
+
+def _plain_byte_arrays(values: list[bytes]) -> bytes:
+    return b"".join(struct.pack("<I", len(value)) + value for value in values)
+
+
+@dataclass
+class ParquetColumn:
+    name: str
+    physical: str  # INT32, INT64, FLOAT or BYTE_ARRAY (always dictionary-encoded strings here)
+    optional: bool = True
+    int16: bool = False
+    timestamp_ns: bool = False
+
+    def schema_element(self) -> list[tuple[int, int, Any]]:
+        logical = None
+        converted = None
+        if self.physical == "BYTE_ARRAY":
+            converted, logical = _CONVERTED_UTF8, [(1, _STRUCT, [])]
+        elif self.int16:
+            converted, logical = _CONVERTED_INT_16, [(10, _STRUCT, [(1, _BYTE, 16), (2, _BOOL_TRUE, True)])]
+        elif self.timestamp_ns:
+            # Keys are wall-clock times without a zone, so not adjusted to UTC
+            logical = [(8, _STRUCT, [(1, _BOOL_TRUE, False), (2, _STRUCT, [(3, _STRUCT, [])])])]
+        return [
+            (1, _I32, _PHYSICAL_TYPES[self.physical]),
+            (3, _I32, _OPTIONAL if self.optional else _REQUIRED),
+            (4, _BINARY, self.name),
+            (6, _I32, converted),
+            (10, _STRUCT, logical),
+        ]
+
+
+class ParquetWriter:
+    """
+    Minimal Parquet file writer: flat schema, one v1 data page per column chunk, PLAIN numeric
+    columns and dictionary-encoded string columns, all with chunk statistics.
+    """
+
+    def __init__(self, path: str, columns: list[ParquetColumn], compression: str = "gzip"):
+        self.path = path
+        self.columns = columns
+        self.codec = _CODECS[compression]
+        self.row_groups: list[list[tuple[int, int, Any]]] = []
+        self.num_rows = 0
+        self._file = open(path, "wb")
+        self._file.write(b"PAR1")
+
+    def _compress(self, body: bytes) -> bytes:
+        if self.codec == _CODECS["gzip"]:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            return compressor.compress(body) + compressor.flush()
+        return body
+
+    def _write_page(self, page_type: int, body: bytes, header_fields: list[tuple[int, int, Any]]) -> tuple[int, int, int]:
+        """Write one page; returns (offset, uncompressed size, compressed size), headers included."""
+        compressed = self._compress(body)
+        header = _thrift_struct([
+            (1, _I32, page_type), (2, _I32, len(body)), (3, _I32, len(compressed)), *header_fields,
+        ])
+        offset = self._file.tell()
+        self._file.write(header)
+        self._file.write(compressed)
+        return offset, len(header) + len(body), len(header) + len(compressed)
+
+    def _write_chunk(
+        self, column: ParquetColumn, values: Any, valid: Optional[np.ndarray], rows: int,
+    ) -> tuple[list, int, int, int]:
+        """
+        One column chunk; values is a numpy array, or (codes, dictionary) for strings.
+        Returns (ColumnChunk fields, uncompressed size, compressed size, offset of its first page).
+        """
+        body = bytearray()
+        if valid is None:
+            valid = np.ones(rows, dtype=bool)
+        null_count = int(rows - np.count_nonzero(valid))
+        if column.optional:
+            levels = _hybrid(valid.astype(np.uint32), 1)
+            body += struct.pack("<I", len(levels)) + levels
+        elif null_count:
+            raise ValueError(f"Required column {column.name} has {null_count} nulls")
+
+        dictionary_offset = None
+        uncompressed = compressed = 0
+        minimum = maximum = None
+        if column.physical == "BYTE_ARRAY":
+            codes, dictionary = values
+            used, indices = np.unique(codes[valid], return_inverse=True)
+            entries = [dictionary[i].encode() for i in used.tolist()]
+            dictionary_offset, uncompressed, compressed = self._write_page(
+                _DICTIONARY_PAGE, _plain_byte_arrays(entries),
+                [(7, _STRUCT, [(1, _I32, len(entries)), (2, _I32, _PLAIN_DICTIONARY)])],
+            )
+            width = _bit_width(len(entries) - 1)
+            body += bytes([width]) + _hybrid(indices.astype(np.uint32), width)
+            encoding = _PLAIN_DICTIONARY
+            if entries:
+                minimum, maximum = min(entries), max(entries)
+        else:
+            present = np.asarray(values)[valid].astype(_PLAIN_DTYPES[column.physical])
+            body += present.tobytes()
+            encoding = _PLAIN
+            if len(present):
+                minimum, maximum = present.min().tobytes(), present.max().tobytes()
+
+        data_offset, page_uncompressed, page_compressed = self._write_page(
+            _DATA_PAGE, bytes(body),
+            [(5, _STRUCT, [(1, _I32, rows), (2, _I32, encoding), (3, _I32, _RLE), (4, _I32, _RLE)])],
+        )
+        uncompressed += page_uncompressed
+        compressed += page_compressed
+        statistics = [(3, _I64, null_count), (5, _BINARY, maximum), (6, _BINARY, minimum)]
+        metadata = [
+            (1, _I32, _PHYSICAL_TYPES[column.physical]),
+            (2, _LIST, (_I32, [encoding, _RLE])),
+            (3, _LIST, (_BINARY, [column.name])),
+            (4, _I32, self.codec),
+            (5, _I64, rows),
+            (6, _I64, uncompressed),
+            (7, _I64, compressed),
+            (9, _I64, data_offset),
+            (11, _I64, dictionary_offset),
+            (12, _STRUCT, statistics),
+        ]
+        first_offset = dictionary_offset if dictionary_offset is not None else data_offset
+        return [(2, _I64, first_offset), (3, _STRUCT, metadata)], uncompressed, compressed, first_offset
+
+    def write_row_group(self, data: dict[str, tuple[Any, Optional[np.ndarray]]], rows: int) -> None:
+        """data maps every column name to (values, validity mask or None for all valid)."""
+        chunks = []
+        total_uncompressed = total_compressed = 0
+        first_offset = None
+        for column in self.columns:
+            values, valid = data[column.name]
+            chunk, uncompressed, compressed, offset = self._write_chunk(column, values, valid, rows)
+            chunks.append(chunk)
+            total_uncompressed += uncompressed
+            total_compressed += compressed
+            first_offset = offset if first_offset is None else first_offset
+        # ordinal is an optional i16: left out once the file has more row groups than it can number
+        ordinal = len(self.row_groups) if len(self.row_groups) < 1 << 15 else None
+        self.row_groups.append([
+            (1, _LIST, (_STRUCT, chunks)), (2, _I64, total_uncompressed), (3, _I64, rows),
+            (5, _I64, first_offset), (6, _I64, total_compressed), (7, _I16, ordinal),
+        ])
+        self.num_rows += rows
+
+    def close(self) -> None:
+        schema = [[(4, _BINARY, "schema"), (5, _I32, len(self.columns))]]
+        schema += [column.schema_element() for column in self.columns]
+        footer = _thrift_struct([
+            (1, _I32, 1),
+            (2, _LIST, (_STRUCT, schema)),
+            (3, _I64, self.num_rows),
+            (4, _LIST, (_STRUCT, self.row_groups)),
+            (6, _BINARY, CREATED_BY),
+            # TypeDefinedOrder for every column, so readers trust min_value / max_value
+            (7, _LIST, (_STRUCT, [[(1, _STRUCT, [])] for _ in self.columns])),
+        ])
+        self._file.write(footer + struct.pack("<I", len(footer)) + b"PAR1")
+        self._file.close()
+
+
+def _field_column(field: str) -> ParquetColumn:
+    dtype = FIELD_DTYPES[field]
+    if dtype == "category":
+        return ParquetColumn(field, "BYTE_ARRAY")
+    if dtype.startswith("float"):
+        return ParquetColumn(field, "FLOAT")
+    return ParquetColumn(field, "INT32", int16=dtype == "int16")
+
+
+EXPORT_COLUMNS = [
+    ParquetColumn("device", "BYTE_ARRAY", optional=False),
+    ParquetColumn("sensor", "BYTE_ARRAY", optional=False),
+    ParquetColumn("hp", "BYTE_ARRAY", optional=False),
+    ParquetColumn("timestamp_ns", "INT64", optional=False, timestamp_ns=True),
+] + [_field_column(field) for field in FORMAT_B_FIELDS]
+
+
+def _valid(values: np.ndarray, dtype: str) -> np.ndarray:
+    if dtype == "category":
+        return values >= 0
+    if dtype.startswith("float"):
+        return ~np.isnan(values)
+    return values != MISSING_INT[dtype]
+
+
+def normalized_columns(columns: dict[str, np.ndarray]) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """{field: (values, validity)} for the normalised fields of store columns, Format A filling the gaps."""
+    result = {}
+    for field in FORMAT_B_FIELDS:
+        dtype = FIELD_DTYPES[field]
+        values = np.asarray(columns[field])
+        valid = _valid(values, dtype)
+        alias = FORMAT_A_ALIASES.get(field)
+        if alias and not valid.all():
+            fallback = np.asarray(columns[alias])
+            fill = ~valid & _valid(fallback, FIELD_DTYPES[alias])
+            values = np.where(fill, fallback.astype(values.dtype), values)
+            valid = valid | fill
+        result[field] = (values, valid)
+    return result
+
+
+def _category_strings(values: list) -> list[str]:
+    return [value if isinstance(value, str) else json.dumps(value) for value in values]
+
+
+def export_parquet(
+    store: RecordStore,
+    out_dir: str,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    compression: str = "gzip",
+) -> dict:
+    """Write every store partition as <out_dir>/<device>/<UTC date>/<hp>.parquet; returns the manifest."""
+    sensors = store.manifest["sensors"]
+    statuses = _category_strings(store.manifest["categories"].get("Status", []))
+    manifest = {
+        "version": EXPORT_VERSION,
+        "columns": {column.name: column.physical for column in EXPORT_COLUMNS},
+        "row_group_size": row_group_size,
+        "compression": compression,
+        "files": {},
+    }
+    for device_id, hp_id in store.partitions():
+        part = store.partition(device_id, hp_id)
+        timestamps = part["timestamp_ns"]
+        days = timestamps // _NS_PER_DAY
+        bounds = [0, *(np.flatnonzero(np.diff(days)) + 1).tolist(), len(timestamps)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            date = str(np.datetime64(int(days[start]), "D"))
+            relative = os.path.join(device_id, date, f"{hp_id}.parquet")
+            path = os.path.join(out_dir, relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writer = ParquetWriter(path, EXPORT_COLUMNS, compression)
+            for low in range(start, end, row_group_size):
+                high = min(low + row_group_size, end)
+                rows = high - low
+                chunk = {name: values[low:high] for name, values in part.items()}
+                data: dict[str, tuple[Any, Optional[np.ndarray]]] = {
+                    "device": ((np.zeros(rows, dtype=np.int64), [device_id]), None),
+                    "sensor": ((np.asarray(chunk["sensor"]), sensors), None),
+                    "hp": ((np.zeros(rows, dtype=np.int64), [hp_id]), None),
+                    "timestamp_ns": (chunk["timestamp_ns"], None),
+                }
+                for field, (values, valid) in normalized_columns(chunk).items():
+                    data[field] = ((values, statuses) if field == "Status" else values, valid)
+                writer.write_row_group(data, rows)
+            writer.close()
+            manifest["files"][relative.replace(os.sep, "/")] = {
+                "rows": end - start,
+                "min_ns": int(timestamps[start]),
+                "max_ns": int(timestamps[end - 1]),
+                "row_groups": len(writer.row_groups),
+            }
+
+    tmp_file = os.path.join(out_dir, "_manifest.json.tmp")
+    os.makedirs(out_dir, exist_ok=True)
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, os.path.join(out_dir, "_manifest.json"))
+    return manifest
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export a K-nose record store as partitioned Parquet files.")
+    parser.add_argument("store", help="Record store directory (extract_firebase_schema.py --store)")
+    parser.add_argument("output", help="Directory for the Parquet files and their manifest")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help="Rows per row group, the unit readers skip using the chunk statistics")
+    parser.add_argument("--compression", choices=sorted(_CODECS), default="gzip")
+    args = parser.parse_args()
+    if args.row_group_size < 1:
+        parser.error("--row-group-size must be positive")
+    try:
+        store = RecordStore(args.store)
+    except (OSError, ValueError) as e:
+        print(f"Failed to open record store: {e}", file=sys.stderr)
+        return 1
+    manifest = export_parquet(store, args.output, args.row_group_size, args.compression)
+    rows = sum(f["rows"] for f in manifest["files"].values())
+    print(f"Wrote {rows} records in {len(manifest['files'])} Parquet files to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,404 @@
+"""
+Mergeable partial schema of the Device_X / BME_XX / HP_XXX / timestamp / record tree.
+
+A PartialSchema holds everything the complete schema is rendered from: key
+sets per level, record counts, per-field type counts and timestamp ranges;
+with value_stats also numeric min/max, per-heater-profile field statistics and
+per-Device/BME/Hp quantile sketches of the main sensor fields, and with
+map_formats the record format used by each path. Partials from different shards, runs or processes combine
+with merge() in time proportional to the size of the schema, not the data,
+and serialise to compact JSON (to_state) or zlib-compressed bytes (dumps).
+"""
+
+import json
+import zlib
+from typing import Any, Optional
+
+from field_stats import FieldStats, QuantileSketch, merge_field_stats
+from timestamps import format_ns
+
+# Malformed timestamp keys quoted in the schema output
+MAX_MALFORMED_EXAMPLES = 10
+
+FORMAT_A_FIELDS = ["gas_adc", "humidity", "temperature", "voltage"]
+FORMAT_B_FIELDS = ["Duration", "GasADC", "GasRes", "Heater_Temp", "Hum", "Press", "Seq", "Status", "Step", "Temp", "Volt"]
+RECORD_FORMATS = {tuple(sorted(FORMAT_A_FIELDS)): "A", tuple(sorted(FORMAT_B_FIELDS)): "B"}
+# Record key tuple (in record order) -> "A" / "B" / "other"; records repeat a handful of key orders
+_FORMAT_BY_KEYS: dict[tuple, str] = {}
+
+# Fields with a quantile sketch per Device/BME/Hp path, and the quantiles reported for them
+QUANTILE_FIELDS = ("GasRes", "Heater_Temp", "Temp", "Hum", "Press")
+QUANTILES = {"p1": 0.01, "p50": 0.5, "p99": 0.99}
+
+# Bumped with every change to the to_state() layout: 2 added hp_field_stats, 3 path_quantiles, 4 path_formats.
+# Older states lack statistics for the records they cover, so from_state() rejects them.
+PARTIAL_SCHEMA_VERSION = 4
+
+
+def classify_format(keys: tuple) -> str:
+    """Record format of a record key tuple: "A", "B", or "other" for any other key set."""
+    label = _FORMAT_BY_KEYS.get(keys)
+    if label is None:
+        label = _FORMAT_BY_KEYS[keys] = RECORD_FORMATS.get(tuple(sorted(keys)), "other")
+    return label
+
+
+_TYPE_NAMES = {type(None): "null", bool: "boolean", int: "integer", float: "float", str: "string", dict: "object", list: "array"}
+_TYPES_BY_NAME = {name: value_type for value_type, name in _TYPE_NAMES.items()}
+
+
+class PartialSchema:
+    """Schema accumulator state with an associative merge()."""
+
+    def __init__(self, value_stats: bool = False, map_formats: bool = False):
+        # Optional per-value work: field ranges, field stats and quantiles / per-path format ranges
+        self.value_stats = value_stats
+        self.map_formats = map_formats
+        self.devices: set[str] = set()
+        self.sensors: set[str] = set()
+        self.hps: set[str] = set()
+        self.timestamp_pattern = None
+        self.total_records = 0
+        # (record keys, value types) -> number of records with exactly that signature
+        self.signatures: dict[tuple, int] = {}
+        # sorted record keys -> first record seen with that key set
+        self.format_samples: dict[tuple, dict] = {}
+        # field -> [min, max] over its integer and float values
+        self.field_ranges: dict[str, list] = {}
+        # Hp id -> [first epoch ns, last epoch ns, records with a valid timestamp key]
+        self.hp_time_ranges: dict[str, list[int]] = {}
+        # Hp id -> field -> type counts, min/max/mean and distinct count over that profile's records
+        self.hp_field_stats: dict[str, dict[str, FieldStats]] = {}
+        # "Device_X/BME_XX/Hp_XXX" -> field -> quantile sketch of its numeric values
+        self.path_quantiles: dict[str, dict[str, QuantileSketch]] = {}
+        # "Device_X/BME_XX/Hp_XXX" -> format -> [first epoch ns, last epoch ns, records] (times None if unknown)
+        self.path_formats: dict[str, dict[str, list]] = {}
+        self.malformed_keys = 0
+        self.malformed_examples: list[str] = []
+
+    def add_field_range(self, field: str, low: Any, high: Any) -> None:
+        field_range = self.field_ranges.get(field)
+        if field_range is None:
+            self.field_ranges[field] = [low, high]
+        else:
+            if low < field_range[0]:
+                field_range[0] = low
+            if high > field_range[1]:
+                field_range[1] = high
+
+    def add_time_range(self, hp_id: str, first: int, last: int, count: int) -> None:
+        time_range = self.hp_time_ranges.get(hp_id)
+        if time_range is None:
+            self.hp_time_ranges[hp_id] = [first, last, count]
+        else:
+            time_range[0] = min(time_range[0], first)
+            time_range[1] = max(time_range[1], last)
+            time_range[2] += count
+
+    def add_group_stats(self, hp_id: str, signature: tuple, records: list[dict]) -> dict[str, FieldStats]:
+        """
+        Type counts and non-numeric distinct values for records sharing one signature; returns the Hp's
+        stats so the caller can add the numeric columns it has already extracted.
+        """
+        stats = self.hp_field_stats.setdefault(hp_id, {})
+        for key, value_type in zip(*signature):
+            field_stats = stats.get(key)
+            if field_stats is None:
+                field_stats = stats[key] = FieldStats()
+            field_stats.add_type(_TYPE_NAMES.get(value_type, "unknown"), len(records))
+            if value_type is not int and value_type is not float and value_type is not type(None):
+                field_stats.add_values([record[key] for record in records])
+        return stats
+
+    def add_quantile_values(self, path: str, field: str, values: Any) -> None:
+        sketches = self.path_quantiles.setdefault(path, {})
+        sketch = sketches.get(field)
+        if sketch is None:
+            sketch = sketches[field] = QuantileSketch()
+        sketch.update(values)
+
+    def add_path_format(self, path: str, label: str, first: Optional[int], last: Optional[int], count: int) -> None:
+        formats = self.path_formats.setdefault(path, {})
+        entry = formats.get(label)
+        if entry is None:
+            formats[label] = [first, last, count]
+            return
+        if first is not None:
+            entry[0] = first if entry[0] is None else min(entry[0], first)
+            entry[1] = last if entry[1] is None else max(entry[1], last)
+        entry[2] += count
+
+    def add_malformed(self, count: int, examples: list[str]) -> None:
+        self.malformed_keys += count
+        room = MAX_MALFORMED_EXAMPLES - len(self.malformed_examples)
+        self.malformed_examples.extend(examples[:max(0, room)])
+
+    def merge(self, other: "PartialSchema") -> "PartialSchema":
+        """
+        Fold another partial schema into this one. Associative: merging partials of consecutive
+        subtrees in order gives the same state as one visitor walking them in that order, except
+        that the quantile sketches agree only within their rank error and field means up to float
+        rounding.
+        """
+        # Statistics one side did not collect would cover only part of the records
+        self.value_stats = self.value_stats and other.value_stats
+        self.map_formats = self.map_formats and other.map_formats
+        self.devices |= other.devices
+        self.sensors |= other.sensors
+        self.hps |= other.hps
+        self.timestamp_pattern = self.timestamp_pattern or other.timestamp_pattern
+        self.total_records += other.total_records
+        for signature, count in other.signatures.items():
+            self.signatures[signature] = self.signatures.get(signature, 0) + count
+        for key_set, record in other.format_samples.items():
+            self.format_samples.setdefault(key_set, record)
+        for field, (low, high) in other.field_ranges.items():
+            self.add_field_range(field, low, high)
+        for hp_id, (first, last, count) in other.hp_time_ranges.items():
+            self.add_time_range(hp_id, first, last, count)
+        for hp_id, stats in other.hp_field_stats.items():
+            merge_field_stats(self.hp_field_stats.setdefault(hp_id, {}), stats)
+        for path, sketches in other.path_quantiles.items():
+            own = self.path_quantiles.setdefault(path, {})
+            for field, sketch in sketches.items():
+                own.setdefault(field, QuantileSketch(sketch.k)).merge(sketch)
+        for path, formats in other.path_formats.items():
+            for label, (first, last, count) in formats.items():
+                self.add_path_format(path, label, first, last, count)
+        self.add_malformed(other.malformed_keys, other.malformed_examples)
+        return self
+
+    def to_state(self) -> dict:
+        """JSON-serialisable state, so a later run (or another process) can resume with from_state()."""
+        return {
+            "version": PARTIAL_SCHEMA_VERSION,
+            "options": {"value_stats": self.value_stats, "map_formats": self.map_formats},
+            "devices": sorted(self.devices),
+            "sensors": sorted(self.sensors),
+            "hps": sorted(self.hps),
+            "timestamp_pattern": self.timestamp_pattern,
+            "total_records": self.total_records,
+            "signatures": [
+                [list(keys), [_TYPE_NAMES.get(t, "unknown") for t in types], count]
+                for (keys, types), count in self.signatures.items()
+            ],
+            "format_samples": list(self.format_samples.values()),
+            "field_ranges": self.field_ranges,
+            "hp_time_ranges": self.hp_time_ranges,
+            "hp_field_stats": {
+                hp_id: {field: field_stats.to_state() for field, field_stats in stats.items()}
+                for hp_id, stats in self.hp_field_stats.items()
+            },
+            "path_quantiles": {
+                path: {field: sketch.to_state() for field, sketch in sketches.items()}
+                for path, sketches in self.path_quantiles.items()
+            },
+            "path_formats": self.path_formats,
+            "malformed_keys": self.malformed_keys,
+            "malformed_examples": self.malformed_examples,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "PartialSchema":
+        """
+        Resume from to_state(); raises ValueError for a state of another version, whose statistics
+        would silently cover only the records added after resuming (rebuild it from the records instead).
+        """
+        if state.get("version") != PARTIAL_SCHEMA_VERSION:
+            raise ValueError(
+                f"Unsupported partial schema version: {state.get('version')} (expected {PARTIAL_SCHEMA_VERSION})"
+            )
+        # Version 4 states written before the options existed collected everything
+        partial = cls(**state.get("options", {"value_stats": True, "map_formats": True}))
+        partial.devices.update(state.get("devices", []))
+        partial.sensors.update(state.get("sensors", []))
+        partial.hps.update(state.get("hps", []))
+        partial.timestamp_pattern = state.get("timestamp_pattern")
+        partial.total_records = state.get("total_records", 0)
+        for keys, type_names, count in state.get("signatures", []):
+            types = tuple(_TYPES_BY_NAME.get(name, object) for name in type_names)
+            signature = (tuple(keys), types)
+            partial.signatures[signature] = partial.signatures.get(signature, 0) + count
+        for record in state.get("format_samples", []):
+            partial.format_samples.setdefault(tuple(sorted(record)), record)
+        partial.field_ranges = {field: list(r) for field, r in state.get("field_ranges", {}).items()}
+        partial.hp_time_ranges = {hp_id: list(r) for hp_id, r in state.get("hp_time_ranges", {}).items()}
+        partial.hp_field_stats = {
+            hp_id: {field: FieldStats.from_state(field_state) for field, field_state in stats.items()}
+            for hp_id, stats in state.get("hp_field_stats", {}).items()
+        }
+        partial.path_quantiles = {
+            path: {field: QuantileSketch.from_state(sketch) for field, sketch in sketches.items()}
+            for path, sketches in state.get("path_quantiles", {}).items()
+        }
+        partial.path_formats = {
+            path: {label: list(entry) for label, entry in formats.items()}
+            for path, formats in state.get("path_formats", {}).items()
+        }
+        partial.malformed_keys = state.get("malformed_keys", 0)
+        partial.malformed_examples = list(state.get("malformed_examples", []))
+        return partial
+
+    def dumps(self) -> bytes:
+        """Compact binary form: zlib-compressed minified JSON of to_state()."""
+        return zlib.compress(json.dumps(self.to_state(), separators=(",", ":")).encode(), 6)
+
+    @classmethod
+    def loads(cls, blob: bytes) -> "PartialSchema":
+        return cls.from_state(json.loads(zlib.decompress(blob)))
+
+    def field_types(self) -> dict:
+        """
+        Per-field type histogram over every record, with the dominant type, a sample value and null count;
+        with value_stats also the numeric range and mean, and the approximate number of distinct values.
+        """
+        histograms: dict[str, dict[str, int]] = {}
+        for (keys, types), count in self.signatures.items():
+            for key, value_type in zip(keys, types):
+                type_name = _TYPE_NAMES.get(value_type, "unknown")
+                counts = histograms.setdefault(key, {})
+                counts[type_name] = counts.get(type_name, 0) + count
+
+        samples: dict[str, Any] = {}
+        for record in self.format_samples.values():
+            for key, value in record.items():
+                samples.setdefault(key, value)
+
+        totals: dict[str, FieldStats] = {}
+        field_ranges = self.field_ranges if self.value_stats else {}
+        for stats in self.hp_field_stats.values() if self.value_stats else ():
+            merge_field_stats(totals, stats)
+
+        field_types = {}
+        for key in sorted(histograms):
+            counts = dict(sorted(histograms[key].items(), key=lambda item: -item[1]))
+            entry = {
+                "type": next(iter(counts)), "types": counts, "sample": samples.get(key),
+                "nullable": "null" in counts, "nulls": counts.get("null", 0),
+            }
+            if key in field_ranges:
+                entry["min"], entry["max"] = field_ranges[key]
+            if key in totals:
+                summary = totals[key].summary()
+                if "mean" in summary:
+                    entry["mean"] = summary["mean"]
+                entry["distinct"] = summary["distinct"]
+            field_types[key] = entry
+        return field_types
+
+    def record_formats(self) -> list[dict]:
+        """One entry per distinct record key set, most common first, flagged "A" / "B" if it is a known format."""
+        counts: dict[tuple, int] = {}
+        for (keys, _types), count in self.signatures.items():
+            key_set = tuple(sorted(keys))
+            counts[key_set] = counts.get(key_set, 0) + count
+        return [
+            {
+                "keys": list(key_set),
+                "count": count,
+                "format": RECORD_FORMATS.get(key_set),
+                "sample": self.format_samples.get(key_set, {}),
+            }
+            for key_set, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        ]
+
+    def quantiles(self) -> dict:
+        """Approximate p1/p50/p99 of the QUANTILE_FIELDS per Device/BME/Hp path."""
+        report = {}
+        for path, sketches in sorted(self.path_quantiles.items()):
+            report[path] = {}
+            for field in sorted(sketches):
+                sketch = sketches[field]
+                values = sketch.quantiles(QUANTILES.values())
+                report[path][field] = {"count": sketch.n, **dict(zip(QUANTILES, values))}
+        return report
+
+    def format_map(self) -> dict:
+        """
+        Which record format each Device/BME/Hp path uses, and when, plus the paths per format: a loader can
+        pick a typed decoder per path ("mixed" paths still need per-record key checks).
+        """
+        paths = {}
+        by_format: dict[str, list[str]] = {}
+        for path, formats in sorted(self.path_formats.items()):
+            entries = []
+            # In time order; formats whose timestamps were all malformed last
+            ordered = sorted(formats.items(), key=lambda item: (item[1][0] is None, item[1][0] or 0))
+            for label, (first, last, count) in ordered:
+                entries.append({
+                    "format": label, "records": count,
+                    "first": format_ns(first) if first is not None else None,
+                    "last": format_ns(last) if last is not None else None,
+                })
+            paths[path] = {"format": entries[0]["format"] if len(entries) == 1 else "mixed", "ranges": entries}
+            by_format.setdefault(paths[path]["format"], []).append(path)
+        return {"paths": paths, "by_format": dict(sorted(by_format.items()))}
+
+    def schema(self) -> dict:
+        schema = {
+            "structure": "Device_X / BME_XX / HP_XXX / timestamp / { record }",
+            "levels": {},
+            "record_fields": None,
+            "stats": {"total_devices": 0, "total_sensors": 0, "total_hps": 0, "total_records": 0},
+        }
+        if not self.devices:
+            return schema
+
+        record_fields = {key for keys, _types in self.signatures for key in keys}
+
+        schema["levels"]["root"] = {
+            "keys": sorted(self.devices),
+            "count": len(self.devices),
+            "type": "object",
+            "description": "Device IDs (Device_1, Device_2, ...)",
+        }
+        schema["levels"]["device"] = {
+            "keys": sorted(self.sensors),
+            "count": len(self.sensors),
+            "type": "object",
+            "description": "Sensor IDs (BME_01 to BME_16)",
+        }
+        schema["levels"]["sensor"] = {
+            "keys": sorted(self.hps),
+            "count": len(self.hps),
+            "type": "object",
+            "description": "Heater Profile IDs (Hp_301, Hp_322, ...)",
+            "time_ranges": {
+                hp_id: {"first": format_ns(first), "last": format_ns(last), "records": count}
+                for hp_id, (first, last, count) in sorted(self.hp_time_ranges.items())
+            },
+        }
+        schema["levels"]["hp"] = {
+            "key_pattern": self.timestamp_pattern or "string",
+            "type": "object",
+            "description": "Timestamp keys (YYYY-MM-DD_HH-MM-SS_nanoseconds)",
+            "malformed_keys": {"count": self.malformed_keys, "examples": self.malformed_examples},
+        }
+        if self.hp_time_ranges:
+            schema["levels"]["hp"]["time_range"] = {
+                "first": format_ns(min(r[0] for r in self.hp_time_ranges.values())),
+                "last": format_ns(max(r[1] for r in self.hp_time_ranges.values())),
+            }
+        schema["record_fields"] = {
+            "keys": sorted(record_fields),
+            "count": len(record_fields),
+            "description": "Fields in each reading record",
+            "field_types": self.field_types(),
+            "formats": self.record_formats(),
+        }
+        if self.value_stats:
+            schema["record_fields"]["by_hp"] = {
+                hp_id: {field: stats[field].summary() for field in sorted(stats)}
+                for hp_id, stats in sorted(self.hp_field_stats.items())
+            }
+            schema["record_fields"]["quantiles"] = self.quantiles()
+        if self.map_formats:
+            schema["record_fields"]["format_map"] = self.format_map()
+
+        schema["stats"]["total_devices"] = len(self.devices)
+        schema["stats"]["total_sensors"] = len(self.sensors)
+        schema["stats"]["total_hps"] = len(self.hps)
+        schema["stats"]["total_records"] = self.total_records
+
+        return schema
+
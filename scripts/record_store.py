@@ -0,0 +1,242 @@
+"""
+Local columnar record store built from the Device_X / BME_XX / HP_XXX / timestamp / record tree.
+
+Records are partitioned by device and heater profile. Each partition directory
+holds one contiguous .npy array per field, sorted by timestamp, so later tools
+can memory-map a long history without parsing JSON:
+
+    store/manifest.json
+    store/Device_1/Hp_301/timestamp_ns.npy   int64 epoch nanoseconds
+    store/Device_1/Hp_301/sensor.npy         int32 code into manifest["sensors"]
+    store/Device_1/Hp_301/GasRes.npy         float32
+    ...
+
+Values are converted in bulk as the dashboard's Number() would (normalize.py):
+numeric strings and booleans count as numbers. Missing values are NaN in float
+columns, the dtype's minimum in integer columns (see MISSING_INT) and -1 in
+categorical columns.
+"""
+
+import json
+import os
+from array import array
+from typing import Any, Iterable, Iterator, Optional
+
+import numpy as np
+
+from normalize import extract_batch
+from rtdb_stream import Event, iter_tree_records
+from timestamps import INVALID_NS, parse_timestamp_keys
+
+# 2: values converted as Number() does (numeric strings and booleans are numbers); 1 stored them as missing
+STORE_VERSION = 2
+# Same layout, so both can be read; manifest["version"] tells them apart
+READABLE_STORE_VERSIONS = (1, 2)
+
+# Column dtypes for both record formats (B: Duration ... Volt, A: gas_adc ... voltage)
+FIELD_DTYPES = {
+    "Duration": "int32",
+    "GasADC": "int32",
+    "GasRes": "float32",
+    "Heater_Temp": "float32",
+    "Hum": "float32",
+    "Press": "float32",
+    "Seq": "int32",
+    "Status": "category",
+    "Step": "int16",
+    "Temp": "float32",
+    "Volt": "float32",
+    "gas_adc": "int32",
+    "humidity": "float32",
+    "temperature": "float32",
+    "voltage": "float32",
+}
+
+MISSING_INT = {dtype: int(np.iinfo(dtype).min) for dtype in ("int16", "int32", "int64")}
+_INT_MAX = {dtype: int(np.iinfo(dtype).max) for dtype in MISSING_INT}
+
+# Rows buffered per partition before their keys and fields are converted in bulk
+_ROW_BATCH = 65536
+
+# array.array typecodes matching the numpy dtypes above; categories (and sensors) are stored as int32
+# codes, as a free-form Status can take more distinct values than int16 holds
+_TYPECODES = {"int16": "h", "int32": "i", "int64": "q", "float32": "f", "category": "i"}
+_CATEGORY_DTYPE = "int32"
+_NUMERIC_FIELDS = [field for field, dtype in FIELD_DTYPES.items() if dtype != "category"]
+
+
+def _int_column(values: np.ndarray, valid: np.ndarray, dtype: str) -> np.ndarray:
+    """Truncate to integers; invalid and out-of-range values become the missing marker."""
+    fits = valid & (values > MISSING_INT[dtype]) & (values <= _INT_MAX[dtype])
+    return np.where(fits, np.trunc(values), MISSING_INT[dtype]).astype(dtype)
+
+
+class RecordStoreWriter:
+    """Accumulates events per (device, hp) partition and writes the .npy columns on close()."""
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self.sensors: dict[str, int] = {}
+        self.categories: dict[str, dict[Any, int]] = {f: {} for f, t in FIELD_DTYPES.items() if t == "category"}
+        self.partitions: dict[tuple[str, str], dict[str, array]] = {}
+        self.skipped = {"bad_timestamp": 0, "bad_timestamp_examples": [], "not_a_record": 0, "unknown_fields": {}}
+        # (device, hp) -> (timestamp keys, records) appended but not yet converted to columns
+        self._pending: dict[tuple[str, str], tuple[list[str], list[dict]]] = {}
+
+    def _partition(self, device_id: str, hp_id: str) -> tuple[list[str], list[dict]]:
+        pending = self._pending.get((device_id, hp_id))
+        if pending is None:
+            columns = {"timestamp_ns": array("q"), "sensor": array(_TYPECODES["category"])}
+            for field, dtype in FIELD_DTYPES.items():
+                columns[field] = array(_TYPECODES[dtype])
+            self.partitions[(device_id, hp_id)] = columns
+            pending = self._pending[(device_id, hp_id)] = ([], [])
+        return pending
+
+    def _flush(self, partition: tuple[str, str]) -> None:
+        """
+        Convert the buffered rows of a partition to columns in bulk: keys to epoch ns (malformed ones
+        become INVALID_NS), record fields through normalize.extract_batch (Number() conversion).
+        """
+        keys, records = self._pending[partition]
+        if not keys:
+            return
+        columns = self.partitions[partition]
+        ns, malformed = parse_timestamp_keys(keys)
+        if len(malformed):
+            self.skipped["bad_timestamp"] += len(malformed)
+            examples = self.skipped["bad_timestamp_examples"]
+            examples.extend(keys[i] for i in malformed[:max(0, 10 - len(examples))])
+        columns["timestamp_ns"].frombytes(ns.tobytes())
+
+        batch = extract_batch(records, _NUMERIC_FIELDS, self.categories)
+        unknown = self.skipped["unknown_fields"]
+        for signature, count in batch.key_sets.items():
+            for key in signature or ():
+                if key not in FIELD_DTYPES:
+                    unknown[key] = unknown.get(key, 0) + count
+        for field, (values, _present, valid) in batch.numeric.items():
+            dtype = FIELD_DTYPES[field]
+            if dtype.startswith("float"):
+                column = np.where(valid, values, np.nan).astype(dtype)
+            else:
+                column = _int_column(values, valid, dtype)
+            columns[field].frombytes(column.tobytes())
+        for field, codes in self.categories.items():
+            values = batch.values[field].tolist()
+            if not set(map(type, values)) <= {int, float, str, type(None)}:
+                values = [json.dumps(v, sort_keys=True) if isinstance(v, (list, dict)) else v for v in values]
+            # New values get the next codes in order of first appearance
+            for value in dict.fromkeys(values):
+                if value is not None and value not in codes:
+                    codes[value] = len(codes)
+            lookup = {**codes, None: -1}
+            columns[field].extend(array(_TYPECODES["category"], map(lookup.__getitem__, values)))
+        keys.clear()
+        records.clear()
+
+    def add(self, events: Iterable[Event]) -> None:
+        for event in self.tap(events):
+            pass
+
+    def tap(self, events: Iterable[Event]) -> Iterator[Event]:
+        """Store every record event and pass it on, so the store can be filled alongside another consumer."""
+        sensors, skipped = self.sensors, self.skipped
+        # Events arrive grouped by Hp node, so the partition and sensor code only change with the node
+        device = sensor = hp = None
+        for event in events:
+            yield event
+            device_id, sensor_id, hp_id, ts_key, record = event
+            if ts_key is None:
+                continue
+            if not isinstance(record, dict):
+                skipped["not_a_record"] += 1
+                continue
+            if hp_id != hp or sensor_id != sensor or device_id != device:
+                device, sensor, hp = device_id, sensor_id, hp_id
+                keys, records = self._partition(device_id, hp_id)
+                append_sensor = self.partitions[(device_id, hp_id)]["sensor"].append
+                sensor_code = sensors.get(sensor_id)
+                if sensor_code is None:
+                    sensor_code = sensors[sensor_id] = len(sensors)
+            keys.append(ts_key)
+            records.append(record)
+            append_sensor(sensor_code)
+            if len(keys) >= _ROW_BATCH:
+                self._flush((device_id, hp_id))
+
+    def close(self) -> dict:
+        """Sort each partition by time, write its columns and the manifest; return the manifest.
+        Rows whose timestamp key is malformed are dropped here and counted in manifest["skipped"]."""
+        for partition in self.partitions:
+            self._flush(partition)
+        manifest = {
+            "version": STORE_VERSION,
+            "fields": {"timestamp_ns": "int64", "sensor": _CATEGORY_DTYPE,
+                       **{f: (_CATEGORY_DTYPE if t == "category" else t) for f, t in FIELD_DTYPES.items()}},
+            "conversion": "Number(): numeric strings and booleans are numbers",
+            "missing": {"float": "NaN", "int": {k: int(v) for k, v in MISSING_INT.items()}, "category": -1},
+            "sensors": list(self.sensors),
+            "categories": {field: list(codes) for field, codes in self.categories.items()},
+            "partitions": {},
+            "skipped": self.skipped,
+        }
+        for (device_id, hp_id), columns in sorted(self.partitions.items()):
+            part_dir = os.path.join(self.store_dir, device_id, hp_id)
+            timestamps = np.frombuffer(columns["timestamp_ns"], dtype=np.int64)
+            keep = np.flatnonzero(timestamps != INVALID_NS)
+            if not len(keep):
+                continue
+            os.makedirs(part_dir, exist_ok=True)
+            order = keep[np.argsort(timestamps[keep], kind="stable")]
+            timestamps = timestamps[order]
+            for name, values in columns.items():
+                dtype = manifest["fields"][name]
+                np.save(os.path.join(part_dir, f"{name}.npy"), np.frombuffer(values, dtype=dtype)[order])
+            manifest["partitions"][f"{device_id}/{hp_id}"] = {
+                "rows": int(len(timestamps)),
+                "min_ns": int(timestamps.min()),
+                "max_ns": int(timestamps.max()),
+            }
+        self.partitions.clear()
+        self._pending.clear()
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_file = os.path.join(self.store_dir, "manifest.json.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_file, os.path.join(self.store_dir, "manifest.json"))
+        return manifest
+
+
+def build_record_store(data: Any, store_dir: str) -> dict:
+    """Write the columnar store for an in-memory tree; returns the manifest."""
+    writer = RecordStoreWriter(store_dir)
+    writer.add(iter_tree_records(data))
+    return writer.close()
+
+
+class RecordStore:
+    """Read side: memory-maps partition columns on demand, nothing is parsed or copied."""
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") not in READABLE_STORE_VERSIONS:
+            raise ValueError(f"Unsupported record store version: {self.manifest.get('version')}")
+
+    def partitions(self) -> list[tuple[str, str]]:
+        return [tuple(key.split("/")) for key in self.manifest["partitions"]]
+
+    def column(self, device_id: str, hp_id: str, field: str) -> np.ndarray:
+        return np.load(os.path.join(self.store_dir, device_id, hp_id, f"{field}.npy"), mmap_mode="r")
+
+    def partition(self, device_id: str, hp_id: str, fields: Optional[Iterable[str]] = None) -> dict[str, np.ndarray]:
+        """Memory-mapped columns of one (device, hp) partition, all fields unless `fields` is given."""
+        names = list(fields) if fields is not None else list(self.manifest["fields"])
+        return {name: self.column(device_id, hp_id, name) for name in names}
+
+    def sensor_ids(self, codes: np.ndarray) -> np.ndarray:
+        """Translate sensor codes back to BME ids."""
+        return np.asarray(self.manifest["sensors"], dtype=object)[codes]
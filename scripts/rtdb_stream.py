@@ -0,0 +1,306 @@
+"""
+Incremental JSON parsing of Realtime Database payloads.
+
+The REST response (or a saved snapshot file) is read in chunks and turned into
+(device, sensor, hp, timestamp, record) events without ever materialising the
+whole tree: only the record currently being parsed is held in memory.
+
+Nodes above the record level that are not objects, or are empty objects, are
+reported as padded events so the consumer still sees their keys, e.g.
+("Device_3", None, None, None, None) or ("Device_1", "BME_02", "Hp_301", None, None).
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator, Optional, Union
+
+import firebase_rest
+from timestamps import timestamp_key_to_ns
+
+# Objects open above a record: root, Device_X, BME_XX, Hp_XXX
+RECORD_DEPTH = 4
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_LITERAL = re.compile(r"[^,}\]\s]+")
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+
+# Parser states
+_VALUE, _KEY_OR_END, _KEY, _COLON, _COMMA_OR_END, _DONE = range(6)
+
+Event = tuple[str, Optional[str], Optional[str], Optional[str], Any]
+
+
+class RecordStreamParser:
+    """Push parser: feed() text chunks, get back the record events completed so far."""
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._state = _VALUE
+        self._keys: list[str] = []  # key of each open object below the root
+        self._open = 0  # number of open objects, root included
+        self._members: list[int] = []  # member count of each open object
+
+    def feed(self, text: str, final: bool = False) -> list[Event]:
+        """Consume a chunk of text and return the events it completed."""
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        events: list[Event] = []
+        while self._step(events, final):
+            pass
+        return events
+
+    def close(self) -> list[Event]:
+        """Flush the remaining input; raise ValueError if the document is incomplete."""
+        events = self.feed("", final=True)
+        if self._state != _DONE or self._buf[self._pos:].strip():
+            raise ValueError("Truncated or malformed JSON stream")
+        return events
+
+    def _error(self, expected: str) -> ValueError:
+        found = self._buf[self._pos:self._pos + 20]
+        return ValueError(f"Malformed JSON stream: expected {expected}, found {found!r}")
+
+    def _padded(self) -> Optional[Event]:
+        """Event for the current node when it is a non-object (or empty object) above record level."""
+        keys = self._keys
+        if not keys:
+            return None
+        padded = list(keys) + [None] * (RECORD_DEPTH - len(keys))
+        return (padded[0], padded[1], padded[2], padded[3], None)
+
+    def _step(self, events: list[Event], final: bool) -> bool:
+        buf = self._buf
+        pos = _WHITESPACE.match(buf, self._pos).end()
+        self._pos = pos
+        if pos >= len(buf) or self._state == _DONE:
+            return False
+        ch = buf[pos]
+        state = self._state
+
+        if state == _VALUE:
+            if ch == "{" and self._open < RECORD_DEPTH:
+                self._open += 1
+                self._members.append(0)
+                self._pos = pos + 1
+                self._state = _KEY_OR_END
+                return True
+            end = _scan_value(buf, pos, final)
+            if end < 0:
+                return False
+            if self._open == RECORD_DEPTH:
+                k = self._keys
+                events.append((k[0], k[1], k[2], k[3], json.loads(buf[pos:end])))
+            elif self._open > 0:
+                event = self._padded()
+                if event:
+                    events.append(event)
+            self._pos = end
+            self._state = _COMMA_OR_END if self._open else _DONE
+            if self._open:
+                self._keys.pop()
+            return True
+
+        if state in (_KEY_OR_END, _KEY):
+            if ch == "}" and state == _KEY_OR_END:
+                return self._close_object(events)
+            if ch != '"':
+                raise self._error("object key")
+            match = _STRING.match(buf, pos)
+            if not match:
+                if final:
+                    raise self._error("complete key")
+                return False
+            raw = match.group()
+            self._keys.append(raw[1:-1] if "\\" not in raw else json.loads(raw))
+            self._members[-1] += 1
+            self._pos = match.end()
+            self._state = _COLON
+            return True
+
+        if state == _COLON:
+            if ch != ":":
+                raise self._error("':'")
+            self._pos = pos + 1
+            self._state = _VALUE
+            return True
+
+        # _COMMA_OR_END
+        if ch == ",":
+            self._pos = pos + 1
+            self._state = _KEY
+            return True
+        if ch == "}":
+            return self._close_object(events)
+        raise self._error("',' or '}'")
+
+    def _close_object(self, events: list[Event]) -> bool:
+        self._pos += 1
+        self._open -= 1
+        if self._members.pop() == 0:
+            event = self._padded()
+            if event:
+                events.append(event)
+        if self._open == 0:
+            self._state = _DONE
+        else:
+            self._keys.pop()
+            self._state = _COMMA_OR_END
+        return True
+
+
+def _scan_value(buf: str, pos: int, final: bool) -> int:
+    """Return the end index of the JSON value starting at pos, or -1 if more input is needed."""
+    ch = buf[pos]
+    if ch == '"':
+        match = _STRING.match(buf, pos)
+        return match.end() if match else -1
+    if ch in "{[":
+        depth = 0
+        i = pos
+        while True:
+            match = _STRUCTURAL.search(buf, i)
+            if not match:
+                return -1
+            i = match.start()
+            c = buf[i]
+            if c == '"':
+                string = _STRING.match(buf, i)
+                if not string:
+                    return -1
+                i = string.end()
+                continue
+            depth += 1 if c in "{[" else -1
+            i += 1
+            if depth == 0:
+                return i
+    match = _LITERAL.match(buf, pos)
+    if not match or (match.end() == len(buf) and not final):
+        return -1
+    return match.end()
+
+
+class RecordStream:
+    """Iterable of record events parsed incrementally from an iterable of byte or text chunks."""
+
+    def __init__(self, chunks: Iterable[Union[bytes, str]]):
+        self._chunks = chunks
+        self.bytes_read = 0
+
+    def __iter__(self) -> Iterator[Event]:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        parser = RecordStreamParser()
+        for chunk in self._chunks:
+            self.bytes_read += len(chunk)
+            text = decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            yield from parser.feed(text)
+        yield from parser.feed(decoder.decode(b"", final=True))
+        yield from parser.close()
+
+    @classmethod
+    def from_file(cls, path: str, chunk_size: int = 1 << 20) -> "RecordStream":
+        """Replay a saved snapshot (the body of a root GET) from disk."""
+        def chunks():
+            with open(path, "rb") as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+        return cls(chunks())
+
+    @classmethod
+    def from_firebase(cls, path: str = "", timeout: int = 180, chunk_size: int = 1 << 16) -> "RecordStream":
+        """
+        Stream a path of the live database; the HTTP body is never buffered in full. The request goes
+        through the shared session and retry policy (firebase_rest.open_stream).
+        """
+        def chunks():
+            with firebase_rest.open_stream(path, timeout=timeout) as resp:
+                yield from resp.iter_content(chunk_size=chunk_size)
+        return cls(chunks())
+
+
+def iter_paged_events(
+    page_size: Optional[int],
+    timeout: int = 180,
+    max_workers: int = 8,
+    start_at: Optional[str] = None,
+    end_at: Optional[str] = None,
+) -> Iterator[Event]:
+    """
+    The live database as events, downloaded shard by shard in key-range pages of `page_size` records
+    (firebase_rest.iter_pages), so memory stays bounded by one page however large a Hp node is.
+    Without a page size each Hp node is one request. `start_at` / `end_at` restrict every Hp node to
+    that inclusive key range on the server. Raises ConnectionError if a listing or a page cannot be fetched.
+    """
+    tree: dict = {}
+    paths, failed = firebase_rest.list_shards(tree, timeout=min(timeout, 60), max_workers=max_workers)
+    if paths is None or failed:
+        raise ConnectionError(f"Could not list {', '.join(failed) if failed else 'the database root'}")
+    yield from iter_tree_records(tree)
+    query = firebase_rest.key_range_query(start_at=start_at, end_at=end_at)
+    for path in paths:
+        device_id, sensor_id, hp_id = path.split("/")
+        if page_size:
+            pages = firebase_rest.iter_pages(path, page_size, timeout=timeout, start_at=start_at, end_at=end_at)
+        else:
+            page = firebase_rest.fetch(path, timeout=timeout, query=query, missing={})
+            if page is None:
+                raise ConnectionError(f"Could not fetch {path}")
+            pages = [page]
+        empty = True
+        for page in pages:
+            if not isinstance(page, dict):
+                break
+            empty = empty and not page
+            for ts_key, record in page.items():
+                yield (device_id, sensor_id, hp_id, ts_key, record)
+        if empty:
+            yield (device_id, sensor_id, hp_id, None, None)
+
+
+def window_events(events: Iterable[Event], since_ns: Optional[int], until_ns: Optional[int]) -> Iterator[Event]:
+    """
+    Only the records whose timestamp key lies in [since_ns, until_ns) (either bound may be None);
+    malformed keys are dropped. A Hp node left without records is reported as a padded event.
+    """
+    node = None
+    kept = True
+    for event in events:
+        if event[:3] != node:
+            if not kept:
+                yield (*node, None, None)
+            node, kept = event[:3], False
+        if event[3] is None:
+            kept = True
+            yield event
+            continue
+        ns = timestamp_key_to_ns(event[3])
+        if ns is not None and (since_ns is None or ns >= since_ns) and (until_ns is None or ns < until_ns):
+            kept = True
+            yield event
+    if not kept:
+        yield (*node, None, None)
+
+
+def iter_tree_records(data: Any) -> Iterator[Event]:
+    """Walk an in-memory tree and yield the same events RecordStream produces for it."""
+    if not isinstance(data, dict):
+        return
+    for device_id, device_data in data.items():
+        if not isinstance(device_data, dict) or not device_data:
+            yield (device_id, None, None, None, None)
+            continue
+        for sensor_id, sensor_data in device_data.items():
+            if not isinstance(sensor_data, dict) or not sensor_data:
+                yield (device_id, sensor_id, None, None, None)
+                continue
+            for hp_id, hp_data in sensor_data.items():
+                if not isinstance(hp_data, dict) or not hp_data:
+                    yield (device_id, sensor_id, hp_id, None, None)
+                    continue
+                for ts_key, record in hp_data.items():
+                    yield (device_id, sensor_id, hp_id, ts_key, record)
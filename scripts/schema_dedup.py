@@ -0,0 +1,138 @@
+"""
+Structural deduplication of the detailed schema.
+
+Most Device/BME/Hp blocks of the detailed schema have the same shape: the same
+keys, types and record layout, differing only in paths, counts and samples.
+Each node is split into its shape (everything structural, with child shapes
+referenced by ID) and its instance data (_key_count, samples). Shapes are
+content-addressed, so identical subtrees are stored once, and two schemas
+can be compared subtree by subtree by comparing IDs:
+
+    {
+      "_dedup": 1,
+      "root": "<shape id>",
+      "root_path": "root",
+      "shapes": {"<shape id>": {"_type": "object", "_keys": [...], "_children": {"BME_01": "<shape id>", ...}}, ...},
+      "instances": {"root/Device_1/BME_01/Hp_301": {"_key_count": 105, "_sample_keys": [...]}, ...}
+    }
+
+_path is rebuilt from the position in the tree, and _key_count is kept only
+where it differs from len(_keys). expand_detailed_schema() reverses the
+transformation (the result equals build_detailed_schema() as a dict).
+"""
+
+import hashlib
+import json
+from typing import Any, Iterable
+
+DEDUP_VERSION = 1
+
+# Fields that differ between nodes of the same shape
+INSTANCE_FIELDS = ("_key_count", "_sample_keys", "_sample_values", "_sample")
+SAMPLE_FIELDS = ("_sample_keys", "_sample_values", "_sample")
+
+
+def shape_id(shape: dict) -> str:
+    """Content address of a shape (child shapes are already IDs, so this hashes the whole subtree)."""
+    canonical = json.dumps(shape, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=8).hexdigest()
+
+
+class _Deduper:
+    def __init__(self, keep_samples: bool):
+        self.keep_samples = keep_samples
+        self.shapes: dict[str, dict] = {}
+        self.instances: dict[str, dict] = {}
+
+    def split(self, node: dict) -> dict:
+        """Record the instance fields of `node` under its path; return the rest (its shape)."""
+        shape = {}
+        instance = {}
+        for key, value in node.items():
+            if key == "_path":
+                continue
+            if key in INSTANCE_FIELDS:
+                if key == "_key_count" and value == len(node.get("_keys", ())):
+                    continue
+                if key in SAMPLE_FIELDS and not self.keep_samples:
+                    continue
+                instance[key] = value
+            else:
+                shape[key] = value
+        if instance and "_path" in node:
+            self.instances[node["_path"]] = instance
+        return shape
+
+    def add(self, shape: dict) -> str:
+        sid = shape_id(shape)
+        self.shapes.setdefault(sid, shape)
+        return sid
+
+
+def dedup_detailed_schema(events: Iterable[tuple], keep_samples: bool = True) -> dict:
+    """
+    Deduplicated detailed schema from the events of iter_detailed_schema(), without building the
+    full schema first. With keep_samples=False the sample keys and values are dropped as well; record
+    schemas, whose path goes through the first sample key, then expand under ".../?" paths.
+    """
+    deduper = _Deduper(keep_samples)
+    # Per open node: [header, container, {child slot: shape id}]
+    open_nodes: list[list] = [[None, None, {}]]
+    slots: list[Any] = []
+    root_path = None
+    for event in events:
+        if root_path is None and event[0] != "close":
+            root_path = event[2].get("_path", "")
+        if event[0] == "open":
+            open_nodes.append([event[2], event[3], {}])
+            slots.append(event[1])
+            continue
+        if event[0] == "close":
+            header, container, children = open_nodes.pop()
+            slot = slots.pop()
+            shape = deduper.split(header)
+            if container:
+                shape[container] = children
+            else:
+                shape.update(children)  # {"_record_schema": <shape id>}
+        else:
+            slot, shape = event[1], deduper.split(event[2])
+        open_nodes[-1][2][slot] = deduper.add(shape)
+
+    return {
+        "_dedup": DEDUP_VERSION,
+        "root": open_nodes[0][2].get(None),
+        "root_path": root_path,
+        "shapes": deduper.shapes,
+        "instances": deduper.instances,
+    }
+
+
+def expand_detailed_schema(deduped: dict) -> dict:
+    """Rebuild the full detailed schema (as a dict) from dedup_detailed_schema() output."""
+    if deduped.get("_dedup") != DEDUP_VERSION:
+        raise ValueError(f"Unsupported dedup format: {deduped.get('_dedup')}")
+    shapes, instances = deduped["shapes"], deduped["instances"]
+    result: dict = {}
+    # (shape id, path, parent dict, slot in parent)
+    stack = [(deduped["root"], deduped["root_path"], result, "root")]
+    while stack:
+        sid, path, parent, slot = stack.pop()
+        shape = shapes[sid]
+        node = {"_path": path}
+        node.update(instances.get(path, {}))
+        for key, value in shape.items():
+            if key == "_children":
+                node["_children"] = {}
+                for child_key, child_id in value.items():
+                    child_path = f"{path}/{child_key}" if path else child_key
+                    stack.append((child_id, child_path, node["_children"], child_key))
+            elif key == "_record_schema" and isinstance(value, str):
+                sample_keys = node.get("_sample_keys") or ["?"]
+                stack.append((value, f"{path}/{sample_keys[0]}", node, "_record_schema"))
+            else:
+                node[key] = value
+        if "_keys" in shape and "_key_count" not in node and "_field_types" not in shape:
+            node["_key_count"] = len(shape["_keys"])
+        parent[slot] = node
+    return result["root"]
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Schema drift detection: compare two schema outputs, or a saved schema against current data.
+
+Works on the aggregated schema objects, so two saved outputs are compared
+without downloading anything. Reports added / removed devices, sensors, heater
+profiles, record fields and record formats, field type changes and record
+count deltas. When both sides carry a detailed schema (plain or --dedup) the
+Device/BME/Hp paths are compared as well.
+
+A schema source is an extract_firebase_schema.py --output file, a bare
+complete schema, or a --sync directory (its stored schema state).
+
+Exit status, as with diff(1): 0 no drift, 1 drift, 2 a source could not be loaded.
+
+Usage: python scripts/schema_diff.py old_schema.json new_schema.json
+       python scripts/schema_diff.py old_schema.json --input snapshot.json   # against a saved snapshot
+       python scripts/schema_diff.py old_schema.json --live [--url URL]      # against the live database (streamed)
+       python scripts/schema_diff.py old_schema.json sync_dir --allow-new --json drift.json  # cron
+"""
+
+import argparse
+import json
+import os
+import sys
+import traceback
+from typing import Any, Iterable, Optional
+
+import requests
+
+import firebase_rest
+from partial_schema import PartialSchema
+
+EXIT_OK, EXIT_DRIFT, EXIT_ERROR = 0, 1, 2
+
+# complete_schema level -> name used in the report
+_LEVEL_NAMES = {"root": "devices", "device": "sensors", "sensor": "hps"}
+
+
+def load_schema_source(source: str) -> dict:
+    """{"complete_schema": ..., "detailed_schema": ... (if any)} from an output file, bare schema or sync dir."""
+    if os.path.isdir(source):
+        from delta_sync import DeltaSync
+        state = DeltaSync(source).schema_state
+        if state is None:
+            raise ValueError(f"{source} holds no schema state (run --sync first)")
+        return {"complete_schema": PartialSchema.from_state(state).schema()}
+    with open(source) as f:
+        result = json.load(f)
+    if isinstance(result, dict) and "complete_schema" in result:
+        return result
+    if isinstance(result, dict) and "levels" in result:
+        return {"complete_schema": result}
+    raise ValueError(f"{source} is neither a schema output nor a complete schema")
+
+
+def schema_from_data(input_file: Optional[str] = None) -> dict:
+    """Complete schema of a snapshot file, or of the live database if no file is given (streamed either way)."""
+    from extract_firebase_schema import extract_schema_from_events
+    from rtdb_stream import RecordStream
+    stream = RecordStream.from_file(input_file) if input_file else RecordStream.from_firebase("", timeout=180)
+    return {"complete_schema": extract_schema_from_events(stream)}
+
+
+def hp_paths(detailed: Any) -> Optional[set[str]]:
+    """Device/BME/Hp paths described by a detailed schema, None if there is none or it was truncated."""
+    if not isinstance(detailed, dict):
+        return None
+    shapes = detailed.get("shapes")
+    if detailed.get("_dedup"):
+        detailed = shapes[detailed["root"]]
+    paths = set()
+    # (node, path, depth)
+    stack = [(detailed, "", 0)]
+    while stack:
+        node, path, depth = stack.pop()
+        if isinstance(node, str):
+            node = shapes[node]
+        if "_truncated" in node or "_omitted_children" in node:
+            return None
+        if depth == 3:
+            paths.add(path)
+            continue
+        for key, child in node.get("_children", {}).items():
+            stack.append((child, f"{path}/{key}" if path else key, depth + 1))
+    return paths
+
+
+def _added_removed(old: Iterable, new: Iterable) -> tuple[list, list]:
+    old, new = set(old), set(new)
+    return sorted(new - old), sorted(old - new)
+
+
+def _count_delta(old: int, new: int) -> dict:
+    return {"old": old, "new": new, "delta": new - old}
+
+
+def _type_names(entry: dict) -> set[str]:
+    """Types seen for a field; schemas written before the per-type counts only carry {type, sample}."""
+    types = entry.get("types")
+    return set(types) if types is not None else {entry.get("type")}
+
+
+def diff_schemas(old: dict, new: dict) -> dict:
+    """
+    Differences between two schema results ({"complete_schema": ..., optional "detailed_schema"}).
+    "drift" lists the structural changes; "counts" the record count deltas, which are not drift by themselves.
+    """
+    old_schema, new_schema = old["complete_schema"], new["complete_schema"]
+    old_levels, new_levels = old_schema.get("levels", {}), new_schema.get("levels", {})
+    added: dict[str, list] = {}
+    removed: dict[str, list] = {}
+    for level, name in _LEVEL_NAMES.items():
+        added[name], removed[name] = _added_removed(
+            old_levels.get(level, {}).get("keys", []), new_levels.get(level, {}).get("keys", []),
+        )
+
+    old_paths, new_paths = hp_paths(old.get("detailed_schema")), hp_paths(new.get("detailed_schema"))
+    if old_paths is not None and new_paths is not None:
+        added["paths"], removed["paths"] = _added_removed(old_paths, new_paths)
+
+    old_fields = (old_schema.get("record_fields") or {}).get("field_types", {})
+    new_fields = (new_schema.get("record_fields") or {}).get("field_types", {})
+    added["fields"], removed["fields"] = _added_removed(old_fields, new_fields)
+
+    old_formats = {tuple(f["keys"]): f for f in (old_schema.get("record_fields") or {}).get("formats", [])}
+    new_formats = {tuple(f["keys"]): f for f in (new_schema.get("record_fields") or {}).get("formats", [])}
+    added["formats"] = [{"keys": list(keys), "format": new_formats[keys].get("format")}
+                        for keys in sorted(new_formats.keys() - old_formats.keys())]
+    removed["formats"] = [{"keys": list(keys), "format": old_formats[keys].get("format")}
+                          for keys in sorted(old_formats.keys() - new_formats.keys())]
+
+    type_changes = []
+    for field in sorted(old_fields.keys() & new_fields.keys()):
+        old_types, new_types = _type_names(old_fields[field]), _type_names(new_fields[field])
+        if old_fields[field].get("type") != new_fields[field].get("type") or old_types != new_types:
+            type_changes.append({
+                "field": field,
+                "old": {"type": old_fields[field].get("type"), "types": sorted(old_types, key=str)},
+                "new": {"type": new_fields[field].get("type"), "types": sorted(new_types, key=str)},
+            })
+
+    old_stats, new_stats = old_schema.get("stats", {}), new_schema.get("stats", {})
+    old_ranges = old_levels.get("sensor", {}).get("time_ranges", {})
+    new_ranges = new_levels.get("sensor", {}).get("time_ranges", {})
+    counts = {
+        "total_records": _count_delta(old_stats.get("total_records", 0), new_stats.get("total_records", 0)),
+        "hps": {
+            hp_id: _count_delta(old_ranges.get(hp_id, {}).get("records", 0), new_ranges.get(hp_id, {}).get("records", 0))
+            for hp_id in sorted(old_ranges.keys() | new_ranges.keys())
+            if old_ranges.get(hp_id, {}).get("records") != new_ranges.get(hp_id, {}).get("records")
+        },
+        "formats": {
+            ",".join(keys): _count_delta(old_formats.get(keys, {}).get("count", 0), new_formats.get(keys, {}).get("count", 0))
+            for keys in sorted(old_formats.keys() | new_formats.keys())
+            if old_formats.get(keys, {}).get("count") != new_formats.get(keys, {}).get("count")
+        },
+        "malformed_keys": _count_delta(
+            old_levels.get("hp", {}).get("malformed_keys", {}).get("count", 0),
+            new_levels.get("hp", {}).get("malformed_keys", {}).get("count", 0),
+        ),
+    }
+    return {
+        "drift": {
+            "added": {name: values for name, values in added.items() if values},
+            "removed": {name: values for name, values in removed.items() if values},
+            "type_changes": type_changes,
+        },
+        "counts": counts,
+    }
+
+
+def has_drift(diff: dict, allow_new: bool = False) -> bool:
+    """Any structural change; with allow_new, new devices / sensors / HPs / paths (fleet growth) are not drift."""
+    drift = diff["drift"]
+    added = {name: values for name, values in drift["added"].items()
+             if not (allow_new and name in ("devices", "sensors", "hps", "paths"))}
+    return bool(added or drift["removed"] or drift["type_changes"])
+
+
+def print_diff(diff: dict) -> None:
+    drift, counts = diff["drift"], diff["counts"]
+    for change, sign in (("added", "+"), ("removed", "-")):
+        for name, values in drift[change].items():
+            print(f"  {change} {name} ({len(values)}):")
+            for value in values[:20]:
+                if name == "formats":
+                    value = f"[{value['format'] or 'unknown'}] " + ", ".join(value["keys"])
+                print(f"    {sign} {value}")
+            if len(values) > 20:
+                print(f"    ... and {len(values) - 20} more")
+    for change in drift["type_changes"]:
+        old, new = change["old"], change["new"]
+        print(f"  type changed: {change['field']}: {old['type']} {old['types']} -> {new['type']} {new['types']}")
+    if not (drift["added"] or drift["removed"] or drift["type_changes"]):
+        print("  no structural changes")
+
+    total = counts["total_records"]
+    print(f"  records: {total['old']} -> {total['new']} ({total['delta']:+d})")
+    for hp_id, delta in counts["hps"].items():
+        print(f"    {hp_id}: {delta['old']} -> {delta['new']} ({delta['delta']:+d})")
+    malformed = counts["malformed_keys"]
+    if malformed["delta"]:
+        print(f"  malformed timestamp keys: {malformed['old']} -> {malformed['new']} ({malformed['delta']:+d})")
+
+
+def run() -> int:
+    parser = argparse.ArgumentParser(description="Compare two K-nose schemas, or a schema against current data.")
+    parser.add_argument("old", help="Baseline: schema output file, complete schema or --sync directory")
+    parser.add_argument("new", nargs="?", help="Schema to compare (same forms as OLD)")
+    parser.add_argument("--input", help="Compare against this snapshot (JSON body of a root GET) instead of NEW")
+    parser.add_argument("--live", action="store_true", help="Compare against the live database instead of NEW")
+    parser.add_argument("--url", help="Database URL for --live (default: FIREBASE_URL environment variable)")
+    parser.add_argument("--allow-new", action="store_true",
+                        help="New devices, sensors and heater profiles are not drift (only removals and field changes are)")
+    parser.add_argument("--json", metavar="FILE", help="Also write the diff as JSON to FILE (- for stdout)")
+    args = parser.parse_args()
+    if sum(bool(source) for source in (args.new, args.input, args.live)) != 1:
+        parser.error("give exactly one of NEW, --input or --live")
+    if args.url:
+        firebase_rest.FIREBASE_URL = args.url.rstrip("/")
+
+    try:
+        old = load_schema_source(args.old)
+        if args.new:
+            new = load_schema_source(args.new)
+        else:
+            print(f"Extracting current schema from {args.input or firebase_rest.FIREBASE_URL} ...", file=sys.stderr)
+            new = schema_from_data(args.input)
+    except (OSError, ValueError, requests.RequestException) as e:
+        print(f"Failed to load schema: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    diff = diff_schemas(old, new)
+    drifted = has_drift(diff, args.allow_new)
+    diff["drift_detected"] = drifted
+    if args.json == "-":
+        json.dump(diff, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"Schema diff: {args.old} -> {args.new or args.input or firebase_rest.FIREBASE_URL}")
+        print_diff(diff)
+        print("DRIFT DETECTED" if drifted else "No drift.")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(diff, f, indent=2)
+    return EXIT_DRIFT if drifted else EXIT_OK
+
+
+def main() -> int:
+    """run(), with any unexpected failure reported as EXIT_ERROR so that it never reads as drift."""
+    try:
+        return run()
+    except Exception:
+        traceback.print_exc()
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Shared fixtures: the scripts are flat modules, imported by name from the scripts directory."""
+
+import copy
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firebase_rest  # noqa: E402
+from local_rtdb_server import serve_in_background  # noqa: E402
+
+SNAPSHOT = {
+    "Device_1": {
+        "BME_01": {
+            "Hp_301": {
+                f"2026-02-01_10-00-{s:02d}_000000000": {"GasADC": 100 + s, "Step": s % 10 + 1, "Temp": 25.5}
+                for s in range(30)
+            },
+            "Hp_321": {"2026-02-01_11-00-00_000000000": {"GasADC": 7, "Step": 1}},
+        },
+        "BME_02": {"Hp_301": {"2026-02-01_10-00-00_500000000": {"gas_adc": 3, "humidity": 40.5}}},
+    },
+    "Device_2": {"BME_01": {"Hp_501": {"2026-02-02_08-30-00_000000000": {"Status": "OK", "Step": 4}}}},
+}
+
+
+@pytest.fixture
+def rtdb(monkeypatch):
+    """A local RTDB server for SNAPSHOT that fetch() talks to; set .error_rate to inject 503s."""
+    server = serve_in_background(SNAPSHOT)
+    monkeypatch.setattr(firebase_rest, "FIREBASE_URL", server.url)
+    monkeypatch.setattr(firebase_rest, "RETRY", firebase_rest.RetryPolicy(retries=8, base_delay=0.001, max_delay=0.01))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def delete_after_listing(server, monkeypatch, listing: str, path: str) -> None:
+    """Serve a copy of SNAPSHOT and delete `path` from it once `listing` has been fetched, like a concurrent write."""
+    served = copy.deepcopy(SNAPSHOT)
+    server.snapshot.data = served
+    *parents, key = path.split("/")
+    fetch = firebase_rest.fetch
+
+    def racing_fetch(fetched_path="", *args, **kwargs):
+        value = fetch(fetched_path, *args, **kwargs)
+        if fetched_path == listing:
+            node = served
+            for part in parents:
+                node = node[part]
+            node.pop(key, None)
+        return value
+
+    monkeypatch.setattr(firebase_rest, "fetch", racing_fetch)
@@ -0,0 +1,37 @@
+import asyncio
+
+from async_fetch import AsyncFetcher, fetch_sharded_async
+from conftest import SNAPSHOT, delete_after_listing
+from firebase_rest import ShardCheckpoint
+
+
+def test_resume_from_complete_checkpoint(rtdb, tmp_path):
+    checkpoint = ShardCheckpoint(str(tmp_path))
+    first, shards = fetch_sharded_async(max_in_flight=4, progress=None, checkpoint=checkpoint)
+    assert first == SNAPSHOT
+    assert all(shard["ok"] and not shard["cached"] for shard in shards)
+
+    # Every leaf is checkpointed now: the second run must not wait on an empty set of requests
+    second, shards = fetch_sharded_async(max_in_flight=4, progress=None, checkpoint=checkpoint)
+    assert second == SNAPSHOT
+    assert len(shards) == 4 and all(shard["cached"] for shard in shards)
+
+
+def test_fetch_many_runs_on_bounded_threads_with_a_session_each(rtdb):
+    paths = [f"Device_1/BME_01/Hp_301/2026-02-01_10-00-{s:02d}_000000000" for s in range(30)] * 10
+
+    async def run():
+        with AsyncFetcher(max_in_flight=300, max_threads=4) as fetcher:
+            results = [item async for item in fetcher.fetch_many(paths)]
+            return results, list(fetcher._sessions)
+
+    results, sessions = asyncio.run(run())
+    assert sorted(value["GasADC"] for _path, value, _seconds in results) == sorted([100 + s for s in range(30)] * 10)
+    assert 1 <= len(sessions) <= 4 and len(set(map(id, sessions))) == len(sessions)
+
+
+def test_shard_deleted_after_listing_is_empty_not_failed(rtdb, monkeypatch):
+    delete_after_listing(rtdb, monkeypatch, "Device_1/BME_02", "Device_1/BME_02/Hp_301")
+    data, shards = fetch_sharded_async(max_in_flight=4, progress=None)
+    assert data["Device_1"]["BME_02"]["Hp_301"] == {}
+    assert all(shard["ok"] for shard in shards)
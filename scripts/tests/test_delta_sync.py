@@ -0,0 +1,68 @@
+import copy
+import os
+
+import pytest
+
+import firebase_rest
+from conftest import SNAPSHOT
+from delta_sync import DeltaSync
+from local_rtdb_server import resolve
+
+# Integer-like keys sort numerically on the server ("5" before "10"), unlike plain strings
+INT_KEYED = {"5": {"GasADC": 5}, "10": {"GasADC": 10}}
+APPENDED = {
+    "Device_1/BME_01/Hp_301": {"2026-02-01_10-01-00_000000000": {"GasADC": 1}},
+    "Device_3/BME_01/Hp_1": {"11": {"GasADC": 11}, "a": {"GasADC": 0}},
+    "Device_4/BME_01/Hp_301": {"2026-02-03_00-00-00_0": {"Step": 1}},
+}
+
+
+def _record_events(events) -> set:
+    return {(f"{device}/{sensor}/{hp}", key) for device, sensor, hp, key, _record in events if key is not None}
+
+
+def _line_counts(sync: DeltaSync) -> dict:
+    counts = {}
+    for path in sync.shards:
+        with open(sync._records_file(path)) as f:
+            counts[path] = sum(1 for _ in f)
+    return counts
+
+
+@pytest.mark.parametrize("page_size", [None, 2])
+def test_second_pull_fetches_only_new_records(rtdb, tmp_path, monkeypatch, page_size):
+    snapshot = copy.deepcopy(SNAPSHOT)
+    snapshot["Device_3"] = {"BME_01": {"Hp_1": copy.deepcopy(INT_KEYED)}}
+    rtdb.snapshot.data = snapshot
+    sync = DeltaSync(str(tmp_path))
+    first = list(sync.pull(progress=None, page_size=page_size))
+    sync.save()
+    assert sync.load_local_copy() == snapshot
+    assert sync.shards["Device_3/BME_01/Hp_1"]["last_key"] == "10"
+    assert len(_record_events(first)) == sum(entry["records"] for entry in sync.shards.values())
+
+    changed = copy.deepcopy(snapshot)
+    for path, records in APPENDED.items():
+        firebase_rest.set_path(changed, path, {**(resolve(changed, path) or {}), **records})
+    rtdb.snapshot.data = changed
+    downloaded = []
+    fetch = firebase_rest.fetch
+
+    def recording_fetch(path="", *args, **kwargs):
+        value = fetch(path, *args, **kwargs)
+        if path.count("/") == 2 and isinstance(value, dict):
+            downloaded.extend((path, key) for key in value)
+        return value
+
+    monkeypatch.setattr(firebase_rest, "fetch", recording_fetch)
+    resumed = DeltaSync(str(tmp_path))
+    second = list(resumed.pull(progress=None, page_size=page_size))
+    resumed.save()
+
+    expected = {(path, key) for path, records in APPENDED.items() for key in records}
+    assert _record_events(second) == expected
+    # Only the start key of each known path is downloaded again (startAt is inclusive) when not paging
+    assert set(downloaded) - expected <= {(path, entry["last_key"]) for path, entry in sync.shards.items()}
+    assert resumed.load_local_copy() == changed
+    assert _line_counts(resumed) == {path: entry["records"] for path, entry in resumed.shards.items()}
+    assert os.path.exists(resumed._records_file("Device_4/BME_01/Hp_301"))
@@ -0,0 +1,258 @@
+import copy
+import io
+import json
+import multiprocessing
+import re
+import sys
+
+import pytest
+
+import extract_firebase_schema
+from extract_firebase_schema import (
+    SchemaVisitor, build_detailed_schema, extract_complete_schema, extract_complete_schema_parallel,
+    extract_schema_from_events, infer_type, iter_detailed_schema, restrict_to_window, write_detailed_schema,
+)
+from generate_dataset import DatasetConfig, generate_tree
+from rtdb_stream import iter_tree_records, window_events
+from timestamps import parse_time_bound
+
+
+def _reference_schema(data: dict) -> dict:
+    """What the original single-loop extract_complete_schema reported: levels, record keys, first-record types, stats."""
+    ts_regex = re.compile(r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}_\d+$")
+    devices, sensors, hps, fields = set(), set(), set(), set()
+    pattern, total, sample = None, 0, None
+    for device_id, device_data in data.items():
+        devices.add(device_id)
+        for sensor_id, sensor_data in device_data.items() if isinstance(device_data, dict) else ():
+            sensors.add(sensor_id)
+            for hp_id, hp_data in sensor_data.items() if isinstance(sensor_data, dict) else ():
+                hps.add(hp_id)
+                for ts_key, record in hp_data.items() if isinstance(hp_data, dict) else ():
+                    if ts_regex.match(ts_key):
+                        pattern = "YYYY-MM-DD_HH-MM-SS_nanoseconds"
+                    total += 1
+                    if isinstance(record, dict):
+                        fields.update(record)
+                        if sample is None and record:
+                            sample = {k: {"type": infer_type(v), "sample": v} for k, v in record.items()}
+    return {
+        "levels": {"root": sorted(devices), "device": sorted(sensors), "sensor": sorted(hps)},
+        "key_pattern": pattern or "string",
+        "record_fields": {"keys": sorted(fields), "count": len(fields)},
+        "field_types": sample or {},
+        "stats": {
+            "total_devices": len(devices), "total_sensors": len(sensors), "total_hps": len(hps), "total_records": total,
+        },
+    }
+
+
+def _reference_detailed_schema(data, path: str = "") -> dict:
+    """The original recursive build_detailed_schema."""
+    if not data:
+        return {"_type": "null", "_path": path}
+    if isinstance(data, dict):
+        keys = list(data.keys())
+        if keys and re.match(r"^\d{4}-\d{2}-\d{2}_", str(keys[0])):
+            sample_ts = keys[0]
+            sample_record = data[sample_ts]
+            record_schema = (
+                _reference_detailed_schema(sample_record, f"{path}/{sample_ts}")
+                if isinstance(sample_record, dict) else {"_type": infer_type(sample_record)}
+            )
+            return {
+                "_path": path, "_type": "object", "_key_pattern": "YYYY-MM-DD_HH-MM-SS_nanoseconds",
+                "_key_count": len(keys), "_sample_keys": keys[:3], "_record_schema": record_schema,
+            }
+        if keys and all(not isinstance(data[k], (dict, list)) for k in keys):
+            return {
+                "_path": path, "_type": "object", "_keys": sorted(keys),
+                "_field_types": {k: infer_type(data[k]) for k in keys}, "_sample_values": {k: data[k] for k in keys},
+            }
+        children = {key: _reference_detailed_schema(data[key], f"{path}/{key}" if path else key) for key in sorted(keys)}
+        return {"_path": path, "_type": "object", "_keys": sorted(keys), "_key_count": len(keys), "_children": children}
+    return {"_path": path, "_type": infer_type(data), "_sample": data}
+
+
+def _trees() -> list:
+    tree = generate_tree(DatasetConfig(devices=3, sensors=2, records=3000, seed=5))
+    messy = json.loads(json.dumps(tree))
+    hp = messy["Device_1"]["BME_01"]["Hp_301"]
+    keys = sorted(hp)
+    hp[keys[5]] = {**hp[keys[5]], "GasADC": "17", "Press": None}
+    hp[keys[6]] = {"Extra": [1, 2]}
+    hp[keys[7]] = "not a record"
+    hp["not-a-key"] = {"Temp": 1}
+    messy["Device_1"]["BME_02"]["Hp_999"] = {}
+    messy["Device_9"] = "offline"
+    # Keys that only look like timestamps (month 13) still set the key pattern, as the key regex did
+    shaped = {"Device_1": {"BME_01": {"Hp_301": {"2026-13-01_00-00-00_0": {"Temp": 1.5}, "x": {}}}}}
+    unshaped = {"Device_1": {"BME_01": {"Hp_301": {"first": {"Temp": 1.5}}, "Hp_302": 4}}}
+    return [tree, messy, shaped, unshaped]
+
+
+def _assert_matches_reference(schema: dict, tree: dict) -> None:
+    expected = _reference_schema(tree)
+    assert schema["stats"] == expected["stats"]
+    for level, keys in expected["levels"].items():
+        assert schema["levels"][level]["keys"] == keys
+        assert schema["levels"][level]["count"] == len(keys)
+    assert schema["levels"]["hp"]["key_pattern"] == expected["key_pattern"]
+    assert {k: schema["record_fields"][k] for k in ("keys", "count")} == expected["record_fields"]
+    # Types are counted over every record now; on these trees the first record's types are the dominant ones
+    field_types = schema["record_fields"]["field_types"]
+    for field, entry in expected["field_types"].items():
+        assert (field_types[field]["type"], field_types[field]["sample"]) == (entry["type"], entry["sample"])
+
+
+@pytest.mark.parametrize("tree", _trees())
+def test_schema_matches_the_original_walker(tree):
+    _assert_matches_reference(extract_complete_schema(tree), tree)
+    _assert_matches_reference(extract_schema_from_events(iter_tree_records(tree)), tree)
+    _assert_matches_reference(extract_complete_schema(tree, value_stats=True, map_formats=True), tree)
+
+
+def test_optional_statistics_are_only_reported_when_requested():
+    tree = _trees()[1]
+    default = extract_complete_schema(tree)["record_fields"]
+    assert not {"by_hp", "quantiles", "format_map"} & default.keys()
+    assert not any({"min", "mean", "distinct"} & entry.keys() for entry in default["field_types"].values())
+    full = extract_complete_schema(tree, value_stats=True, map_formats=True)["record_fields"]
+    assert full["by_hp"] and full["quantiles"] and full["format_map"]["paths"]
+    assert {"min", "max", "mean", "distinct"} <= full["field_types"]["Temp"].keys()
+    for key in ("keys", "count", "formats"):
+        assert full[key] == default[key]
+
+
+@pytest.mark.parametrize("batch", [1, 7, 1000])
+def test_key_batches_spanning_nodes_do_not_change_the_schema(monkeypatch, batch):
+    tree = _trees()[1]
+    whole = SchemaVisitor(value_stats=True, map_formats=True)
+    whole.visit_tree(tree)
+    monkeypatch.setattr(SchemaVisitor, "KEY_BATCH", batch)
+    batched = SchemaVisitor(value_stats=True, map_formats=True)
+    batched.visit_tree(tree)
+    assert batched.to_state() == whole.to_state()
+
+
+@pytest.mark.parametrize("split", ["device", "sensor"])
+@pytest.mark.parametrize("tree", _trees()[:2])
+def test_parallel_schema_matches_the_serial_one(tree, split):
+    options = {"value_stats": True, "map_formats": True}
+    assert extract_complete_schema_parallel(tree, workers=2, split=split) == extract_complete_schema(tree)
+    assert extract_complete_schema_parallel(tree, workers=2, split=split, **options) == extract_complete_schema(tree, **options)
+
+
+def test_parallel_schema_without_fork(monkeypatch):
+    # Without fork the subtrees are pickled to the workers instead of inherited
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    tree = _trees()[1]
+    assert extract_complete_schema_parallel(tree, workers=2, split="sensor") == extract_complete_schema(tree)
+
+
+def test_parallel_schema_of_one_device_and_of_no_tree():
+    tree = {"Device_1": _trees()[1]["Device_1"]}
+    assert extract_complete_schema_parallel(tree) == extract_complete_schema(tree)
+    assert extract_complete_schema_parallel(tree, split="sensor") == extract_complete_schema(tree)
+    for empty in ({}, None, "primitive"):
+        assert extract_complete_schema_parallel(empty) == extract_complete_schema(empty)
+
+
+def _detailed_trees() -> list:
+    nested = {
+        "Device_1": {
+            "BME_01": {
+                "Hp_301": {"2026-02-01_10-00-00_1": {"Temp": 1.5, "Extra": {"deep": [1, {"x": None}]}}},
+                "Hp_302": {"2026-02-01_10-00-00_1": "not a record", "2026-02-01_10-00-01_1": {}},
+                "Hp_303": {"first": {"Temp": 2}, "2026-02-01_10-00-00_1": {"Temp": 3}},
+                "Hp_304": [1, 2],
+                "Hp_305": 0,
+            },
+        },
+        "Device_2": "offline",
+        "Device_3": {"BME_01": {}},
+    }
+    return _trees() + [nested, {}, "primitive"]
+
+
+@pytest.mark.parametrize("tree", _detailed_trees())
+def test_detailed_schema_matches_the_original_recursion(tree):
+    expected = _reference_detailed_schema(tree, "root")
+    assert build_detailed_schema(tree, "root") == expected
+    out = io.StringIO()
+    write_detailed_schema(iter_detailed_schema(tree, "root"), out)
+    assert out.getvalue() == json.dumps(expected, default=str)
+
+
+def test_depth_and_breadth_limits():
+    tree = _detailed_trees()[-3]
+    shallow = build_detailed_schema(tree, "root", max_depth=1)
+    device = shallow["_children"]["Device_1"]
+    assert device == {
+        "_path": "root/Device_1", "_type": "object", "_keys": ["BME_01"], "_key_count": 1, "_truncated": "max_depth",
+    }
+    # Primitive and empty nodes need no expanding and are described in full
+    assert shallow["_children"]["Device_2"] == _reference_detailed_schema("offline", "root/Device_2")
+    assert shallow["_children"]["Device_3"]["_truncated"] == "max_depth"
+    assert "_truncated" not in build_detailed_schema(tree, "root", max_depth=2)["_children"]["Device_1"]
+
+    narrow = build_detailed_schema(tree, "root", max_breadth=2)
+    assert narrow["_keys"] == ["Device_1", "Device_2", "Device_3"] and narrow["_key_count"] == 3
+    assert list(narrow["_children"]) == ["Device_1", "Device_2"] and narrow["_omitted_children"] == 1
+    sensor = narrow["_children"]["Device_1"]["_children"]["BME_01"]
+    assert list(sensor["_children"]) == ["Hp_301", "Hp_302"] and sensor["_omitted_children"] == 3
+    assert "_omitted_children" not in narrow["_children"]["Device_1"]
+
+    for limits in ({"max_depth": 1}, {"max_breadth": 2}, {"max_depth": 3, "max_breadth": 1}):
+        out = io.StringIO()
+        write_detailed_schema(iter_detailed_schema(tree, "root", **limits), out)
+        assert json.loads(out.getvalue()) == build_detailed_schema(tree, "root", **limits)
+
+
+SINCE, UNTIL = "2026-02-01T10:00:05.5", "2026-02-01T10:00:07.25"
+WINDOW_TREE = {
+    "Device_1": {
+        "BME_01": {
+            "Hp_301": {
+                "2026-02-01_10-00-05_1": {"Temp": 1},  # 1 ns into the first second: before the window
+                "2026-02-01_10-00-05_500000000": {"Temp": 2},  # since is inclusive
+                "2026-02-01_10-00-06_7": {"Temp": 3},
+                "2026-02-01_10-00-07_25": {"Temp": 4},  # 25 ns, not 0.25 s
+                "2026-02-01_10-00-07_250000000": {"Temp": 5},  # until is exclusive
+                "2026-02-01_10-00-08_0": {"Temp": 6},
+                "not-a-key": {"Temp": 7},
+            },
+            "Hp_302": {"2026-02-01_10-00-07_900000000": {"Temp": 8}},
+        },
+        "BME_02": "offline",
+    },
+}
+IN_WINDOW = ["2026-02-01_10-00-05_500000000", "2026-02-01_10-00-06_7", "2026-02-01_10-00-07_25"]
+
+
+def _windowed_tree() -> dict:
+    expected = copy.deepcopy(WINDOW_TREE)
+    sensor = expected["Device_1"]["BME_01"]
+    sensor["Hp_301"] = {key: sensor["Hp_301"][key] for key in IN_WINDOW}
+    sensor["Hp_302"] = {}
+    return expected
+
+
+def test_window_post_filter_drops_keys_of_the_same_second():
+    since_ns, until_ns = parse_time_bound(SINCE), parse_time_bound(UNTIL)
+    expected = _windowed_tree()
+    assert restrict_to_window(copy.deepcopy(WINDOW_TREE), since_ns, until_ns) == expected
+    # The streamed filter reports the emptied Hp node as the tree walk does
+    assert list(window_events(iter_tree_records(WINDOW_TREE), since_ns, until_ns)) == list(iter_tree_records(expected))
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_since_and_until_against_the_server(rtdb, tmp_path, monkeypatch, stream):
+    rtdb.snapshot.data = WINDOW_TREE
+    output = tmp_path / "schema.json"
+    argv = ["extract_firebase_schema.py", "--since", SINCE, "--until", UNTIL, "--output", str(output)]
+    monkeypatch.setattr(sys, "argv", argv + (["--stream"] if stream else []))
+    assert extract_firebase_schema.main() == 0
+    result = json.loads(output.read_text())
+    assert result["complete_schema"] == extract_complete_schema(_windowed_tree())
+    assert result["window"]["since"] == "2026-02-01T10:00:05.500000000"
@@ -0,0 +1,55 @@
+import numpy as np
+
+from field_stats import FieldStats, HyperLogLog, hash64, merge_field_stats
+
+
+def _stats(values: np.ndarray, strings: list) -> FieldStats:
+    stats = FieldStats()
+    stats.add_type("float", len(values))
+    stats.add_type("string", len(strings))
+    stats.add_numeric(values, float(values.min()), float(values.max()))
+    stats.add_values(strings)
+    return stats
+
+
+def test_merge_gives_the_stats_of_the_union():
+    rng = np.random.default_rng(3)
+    a, b = rng.normal(10, 2, 40_000), rng.normal(-5, 1, 25_000)
+    merged = _stats(a, ["x", "y"]).merge(_stats(b, ["y", "z", None]))
+    whole = _stats(np.concatenate([a, b]), ["x", "y", "y", "z", None])
+
+    summary = merged.summary()
+    assert summary["types"] == {"float": 65_000, "string": 5}
+    assert summary["min"] == whole.min == min(a.min(), b.min())
+    assert summary["max"] == whole.max == max(a.max(), b.max())
+    assert np.isclose(summary["mean"], np.concatenate([a, b]).mean())
+    # HyperLogLog merges are exact: the registers of a union
+    np.testing.assert_array_equal(merged.distinct.registers, whole.distinct.registers)
+
+
+def test_distinct_count_error():
+    rng = np.random.default_rng(5)
+    for distinct in (10, 1_000, 100_000):
+        values = rng.choice(rng.normal(size=distinct), 3 * distinct)
+        sketch = HyperLogLog()
+        sketch.add_hashes(hash64(values))
+        # ~2.3% standard error at precision 11; allow four sigma
+        assert abs(sketch.estimate() - len(np.unique(values))) <= max(1, 0.092 * len(np.unique(values)))
+
+
+def test_signed_zero_is_one_value_and_state_round_trip():
+    stats = FieldStats()
+    stats.add_type("float", 2)
+    stats.add_numeric(np.array([0.0, -0.0]), -0.0, 0.0)
+    assert stats.summary()["distinct"] == 1
+    restored = FieldStats.from_state(stats.to_state())
+    assert restored.to_state() == stats.to_state()
+
+
+def test_merge_field_stats_leaves_the_source_untouched():
+    source = {"Temp": _stats(np.array([1.0, 2.0]), [])}
+    before = source["Temp"].to_state()
+    target = merge_field_stats({}, source)
+    target["Temp"].merge(_stats(np.array([3.0]), []))
+    assert source["Temp"].to_state() == before
+    assert target["Temp"].summary()["max"] == 3.0
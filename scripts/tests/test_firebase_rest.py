@@ -0,0 +1,148 @@
+import copy
+import os
+import random
+
+import pytest
+import requests
+
+import firebase_rest
+from conftest import SNAPSHOT, delete_after_listing
+from firebase_rest import ResponseCache, fetch, fetch_paged, iter_pages
+
+HP_PATH = "Device_1/BME_01/Hp_301"
+RECORDS = SNAPSHOT["Device_1"]["BME_01"]["Hp_301"]
+KEYS = sorted(RECORDS)
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 7, len(KEYS) - 1, len(KEYS), len(KEYS) + 1, 1000])
+def test_pages_match_a_plain_fetch_despite_503s(rtdb, page_size):
+    random.seed(page_size)
+    rtdb.error_rate = 0.3
+    pages = list(iter_pages(HP_PATH, page_size))
+    keys = [key for page in pages for key in page]
+    assert keys == KEYS
+    assert all(0 < len(page) <= page_size for page in pages)
+    assert fetch_paged(HP_PATH, page_size) == fetch(HP_PATH) == RECORDS
+
+
+@pytest.mark.parametrize("bounds", [
+    {"start_at": KEYS[5]},
+    {"end_at": KEYS[12]},
+    {"start_at": KEYS[3], "end_at": KEYS[20]},
+    {"start_after": KEYS[9]},
+    {"start_after": KEYS[9], "end_at": KEYS[10]},
+    {"start_at": "2027", "end_at": "2028"},
+    {"start_after": KEYS[-1]},
+])
+def test_key_bounds(rtdb, bounds):
+    random.seed(7)
+    rtdb.error_rate = 0.3
+    expected = {
+        key: value for key, value in RECORDS.items()
+        if key >= bounds.get("start_at", "") and key <= bounds.get("end_at", "~")
+        and key > bounds.get("start_after", "")
+    }
+    for page_size in (1, 4, 100):
+        assert fetch_paged(HP_PATH, page_size, **bounds) == expected
+
+
+def test_other_nodes(rtdb):
+    # A leaf comes back as it is, a missing node as an empty object
+    leaf = f"{HP_PATH}/{KEYS[0]}/GasADC"
+    assert fetch_paged(leaf, 3) == RECORDS[KEYS[0]]["GasADC"]
+    assert list(iter_pages("Device_9", 3)) == []
+    assert fetch_paged("Device_9", 3) == {}
+    assert fetch_paged("", 1) == SNAPSHOT
+
+
+def test_a_page_that_keeps_failing(rtdb, monkeypatch):
+    monkeypatch.setattr(firebase_rest, "RETRY", firebase_rest.RetryPolicy(retries=1, base_delay=0.001))
+    rtdb.error_rate = 1.0
+    with pytest.raises(ConnectionError):
+        next(iter_pages(HP_PATH, 5))
+    assert fetch_paged(HP_PATH, 5) is None
+
+
+def _recording_session() -> tuple[requests.Session, list[int]]:
+    session, statuses = requests.Session(), []
+    session.hooks["response"].append(lambda resp, *args, **kwargs: statuses.append(resp.status_code))
+    return session, statuses
+
+
+def test_cached_fetch_revalidates_with_etags(rtdb, tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path))
+    monkeypatch.setattr(firebase_rest, "CACHE", cache)
+    session, statuses = _recording_session()
+    assert fetch(HP_PATH, session=session) == RECORDS
+    assert fetch(HP_PATH, session=session) == RECORDS
+    assert statuses == [200, 304]
+    (key,) = cache.entries
+    first = dict(cache.entries[key])
+    assert cache.stats["misses"] == 1 and cache.stats["hits"] == 1 and cache.stats["bytes_from_cache"] == first["size"]
+
+    # A changed snapshot gives a new body and ETag, and the old body is deleted
+    changed = copy.deepcopy(SNAPSHOT)
+    changed["Device_1"]["BME_01"]["Hp_301"]["2026-02-01_10-01-00_000000000"] = {"GasADC": 1}
+    rtdb.snapshot.data = changed
+    assert fetch(HP_PATH, session=session) == changed["Device_1"]["BME_01"]["Hp_301"]
+    assert statuses[-1] == 200 and cache.stats["stale"] == 1
+    assert cache.entries[key]["etag"] != first["etag"] and cache.entries[key]["object"] != first["object"]
+    assert os.listdir(tmp_path / "objects") == [cache.entries[key]["object"] + ".json"]
+
+    # The index survives a restart; query results are never cached
+    cache.save()
+    monkeypatch.setattr(firebase_rest, "CACHE", ResponseCache(str(tmp_path)))
+    assert fetch(HP_PATH, session=session) == changed["Device_1"]["BME_01"]["Hp_301"]
+    assert statuses[-1] == 304 and firebase_rest.CACHE.stats["hits"] == 1
+    assert fetch(HP_PATH, shallow=True, session=session) == {key: True for key in changed["Device_1"]["BME_01"]["Hp_301"]}
+    assert list(firebase_rest.CACHE.entries) == [key]
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    def body(key: str) -> bytes:
+        return f'"{key * 8}"'.encode()  # 10 bytes
+
+    cache = ResponseCache(str(tmp_path), max_bytes=25)
+    for key in "abc":
+        cache.store(key, "etag", body(key), stale=False)
+    assert list(cache.entries) == ["b", "c"] and cache.stats["evicted"] == 1
+    assert cache.hit("b", cache.entries["b"]) == "b" * 8
+    # "b" was used after "c", so "c" goes
+    cache.store("d", "etag", body("d"), stale=False)
+    assert sorted(cache.entries) == ["b", "d"]
+    # A body shared by two keys is stored and counted once
+    cache.store("e", "etag", body("d"), stale=False)
+    assert sorted(cache.entries) == ["b", "d", "e"] and len(os.listdir(tmp_path / "objects")) == 2
+    # A body larger than the limit is still kept for the entry just stored
+    cache.store("f", "etag", b"0" * 100, stale=False)
+    assert list(cache.entries) == ["f"] and len(os.listdir(tmp_path / "objects")) == 1
+    cache.save()
+    assert list(ResponseCache(str(tmp_path), max_bytes=10).entries) == []
+
+
+def test_corrupt_cache_entries_are_ignored(rtdb, tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path))
+    monkeypatch.setattr(firebase_rest, "CACHE", cache)
+    session, statuses = _recording_session()
+    fetch(HP_PATH, session=session)
+    (entry,) = cache.entries.values()
+    (tmp_path / "objects" / (entry["object"] + ".json")).write_text("{not json")
+    # The 304 cannot be served from the damaged body, so the path is fetched again in full
+    assert fetch(HP_PATH, session=session) == RECORDS
+    assert statuses == [200, 304, 200]
+    assert fetch(HP_PATH, session=session) == RECORDS and statuses[-1] == 304
+
+    cache.save()
+    os.remove(tmp_path / "objects" / (entry["object"] + ".json"))
+    assert ResponseCache(str(tmp_path)).entries == {}
+    for index in ('{"version": 1, "entries": {"x": {}}}', '{"version": 1, "entr'):
+        (tmp_path / "index.json").write_text(index)
+        assert ResponseCache(str(tmp_path)).entries == {}
+
+
+@pytest.mark.parametrize("options", [{}, {"start_at": "2026"}, {"page_size": 2}])
+def test_shard_deleted_after_listing_is_empty_not_failed(rtdb, monkeypatch, options):
+    delete_after_listing(rtdb, monkeypatch, "Device_1/BME_02", "Device_1/BME_02/Hp_301")
+    data, shards = firebase_rest.fetch_sharded(progress=None, **options)
+    assert data["Device_1"]["BME_02"]["Hp_301"] == {}
+    assert all(shard["ok"] for shard in shards)
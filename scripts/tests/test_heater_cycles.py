@@ -0,0 +1,104 @@
+import numpy as np
+
+from heater_cycles import MAX_STEPS, STEP_RESET_GAP_SECONDS, segment_cycles
+from timestamps import NS_PER_SECOND
+
+HP_IDS = ["Hp_301", "Hp_321", "Hp_999"]
+
+
+def _seconds(*values) -> np.ndarray:
+    return np.array(values, dtype=np.int64) * NS_PER_SECOND
+
+
+def _one_run(step, seconds=None, hp=0):
+    n = len(step)
+    ts = _seconds(*(range(n) if seconds is None else seconds))
+    return segment_cycles(ts, np.zeros(n, dtype=np.int16), np.full(n, hp), HP_IDS, np.array(step, dtype=np.int16))
+
+
+def test_recorded_steps_wrap_into_new_cycles():
+    result = _one_run([1, 2, 3, 10, 1, 2, 2, 3, 5])
+    # 10 -> 1 wraps, a repeated 2 (dropped record) starts a cycle too
+    assert result.cycle_id.tolist() == [0, 0, 0, 0, 1, 1, 2, 2, 2]
+    assert result.step.tolist() == [1, 2, 3, 10, 1, 2, 2, 3, 5]
+    assert result.elapsed_ns.tolist() == (_seconds(0, 1, 2, 3, 0, 1, 0, 1, 2)).tolist()
+    assert not result.counted.any()
+    # Expected Hp_301 temperatures for steps 1, 3 and 10
+    assert result.heater_temp[[0, 2, 3]].tolist() == [100, 200, 320]
+
+
+def test_missing_steps_do_not_break_a_cycle():
+    result = _one_run([1, 0, 3, -1, 1])
+    assert result.cycle_id.tolist() == [0, 0, 0, 0, 1]
+    assert result.step.tolist() == [1, 0, 3, 0, 1]
+    assert np.isnan(result.heater_temp[[1, 3]]).all()
+
+
+def test_gap_resets_the_count():
+    gap = STEP_RESET_GAP_SECONDS
+    result = _one_run([1, 2, 3, 4, 5], seconds=[0, 1, 1 + gap, 2 + 2 * gap + 1, 3 + 2 * gap + 1])
+    # A gap of exactly STEP_RESET_GAP_SECONDS keeps the cycle going, a longer one starts a new one
+    assert result.cycle_id.tolist() == [0, 0, 0, 1, 1]
+    assert result.elapsed_ns[3] == 0
+
+
+def test_hp_switch_resets():
+    ts = _seconds(0, 1, 2, 3, 4, 5)
+    sensor = np.zeros(6, dtype=np.int16)
+    hp = np.array([0, 0, 1, 1, 0, 0])
+    step = np.array([1, 2, 3, 4, 3, 4], dtype=np.int16)
+    result = segment_cycles(ts, sensor, hp, HP_IDS, step)
+    # Back on Hp_301 the count restarts, although step 3 follows step 2 of the same Hp
+    assert result.cycle_id.tolist() == [0, 0, 2, 2, 1, 1]
+    assert result.elapsed_ns.tolist() == _seconds(0, 1, 0, 1, 0, 1).tolist()
+
+    side_by_side = segment_cycles(ts, sensor, hp, HP_IDS, step, hp_switch_resets=False)
+    assert side_by_side.cycle_id.tolist() == [0, 0, 1, 1, 0, 0]
+    assert side_by_side.elapsed_ns[4] == 4 * NS_PER_SECOND
+
+    # Another sensor on another Hp is no switch
+    other_sensor = segment_cycles(ts, np.array([0, 0, 1, 1, 0, 0]), hp, HP_IDS, step)
+    assert other_sensor.cycle_id.tolist() == side_by_side.cycle_id.tolist()
+
+
+def test_counted_steps_follow_the_sampled_profile_steps():
+    # Hp_301 samples steps 1-9 (step 10 starts at total_duration), so cycles are 9 records long
+    result = _one_run([0] * 19)
+    assert result.counted.all()
+    assert result.step.tolist() == list(range(1, 10)) * 2 + [1]
+    assert result.cycle_id.tolist() == [0] * 9 + [1] * 9 + [2]
+    assert result.heater_temp[:9].tolist() == [100, 100, 200, 200, 200, 200, 320, 320, 320]
+
+    # An unknown profile counts MAX_STEPS steps, with no expected temperature
+    unknown = _one_run([0] * (MAX_STEPS + 1), hp=2)
+    assert unknown.step.tolist() == list(range(1, MAX_STEPS + 1)) + [1]
+    assert unknown.cycle_id.tolist() == [0] * MAX_STEPS + [1]
+    assert np.isnan(unknown.heater_temp).all()
+
+
+def test_counted_and_recorded_runs_of_one_hp():
+    gap = STEP_RESET_GAP_SECONDS + 1
+    result = _one_run([0, 0, 0, 2, 3], seconds=[0, 1, 2, 2 + gap, 3 + gap])
+    assert result.counted.tolist() == [True, True, True, False, False]
+    assert result.step.tolist() == [1, 2, 3, 2, 3]
+    assert result.cycle_id.tolist() == [0, 0, 0, 1, 1]
+
+
+def test_rows_in_any_order():
+    rng = np.random.default_rng(5)
+    n = 500
+    ts = np.sort(rng.choice(4 * STEP_RESET_GAP_SECONDS, n, replace=False)) * NS_PER_SECOND
+    sensor = rng.integers(0, 3, n)
+    hp = rng.integers(0, len(HP_IDS), n)
+    step = rng.integers(0, 11, n).astype(np.int16)
+    ordered = segment_cycles(ts, sensor, hp, HP_IDS, step)
+    shuffle = rng.permutation(n)
+    shuffled = segment_cycles(ts[shuffle], sensor[shuffle], hp[shuffle], HP_IDS, step[shuffle])
+    for name in ("cycle_id", "step", "elapsed_ns", "counted"):
+        assert (getattr(shuffled, name) == getattr(ordered, name)[shuffle]).all(), name
+    assert np.array_equal(shuffled.heater_temp, ordered.heater_temp[shuffle], equal_nan=True)
+
+
+def test_empty_input():
+    result = segment_cycles(np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0), HP_IDS)
+    assert all(len(getattr(result, name)) == 0 for name in ("cycle_id", "step", "elapsed_ns", "heater_temp", "counted"))
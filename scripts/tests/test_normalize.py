@@ -0,0 +1,126 @@
+import math
+
+import numpy as np
+import pytest
+
+from normalize import NORMALIZED_DTYPES, _js_string, normalize_records, to_number
+from partial_schema import FORMAT_B_FIELDS
+
+FORMAT_A = {"gas_adc": 2880, "humidity": 43.2, "temperature": 24.5, "voltage": 3.3}
+FORMAT_B = {
+    "Duration": 6020, "GasADC": 27, "GasRes": 8035.5, "Heater_Temp": 320, "Hum": 41.0, "Press": 1013.2,
+    "Seq": 12, "Status": 0, "Step": 3, "Temp": 25.1, "Volt": 3.29,
+}
+
+# (record, field, expected value, expected validity), as normalizeReading would give them
+CASES = [
+    (FORMAT_A, "GasADC", 2880, True),
+    (FORMAT_A, "Volt", 3.3, True),
+    (FORMAT_A, "Step", 0, False),
+    (FORMAT_B, "Heater_Temp", 320.0, True),
+    # `??` falls back on null and absent values only
+    ({"GasADC": None, "gas_adc": 5}, "GasADC", 5, True),
+    ({"GasADC": "abc", "gas_adc": 5}, "GasADC", 0, False),
+    ({"GasADC": 0, "gas_adc": 5}, "GasADC", 0, True),
+    ({"Temp": None}, "Temp", 0.0, False),
+    # Number() conversions
+    ({"gas_adc": "12"}, "GasADC", 12, True),
+    ({"Temp": " 21.5 "}, "Temp", 21.5, True),
+    ({"Temp": "1e2"}, "Temp", 100.0, True),
+    ({"Temp": ""}, "Temp", 0.0, True),
+    ({"Temp": True}, "Temp", 1.0, True),
+    ({"Temp": False}, "Temp", 0.0, True),
+    ({"GasADC": "0x10"}, "GasADC", 16, True),
+    ({"Temp": "1_000"}, "Temp", 0.0, False),
+    ({"Temp": "21.5 C"}, "Temp", 0.0, False),
+    ({"Temp": {"value": 1}}, "Temp", 0.0, False),
+    ({"Hum": "NaN", "humidity": 40.0}, "Hum", 0.0, False),
+    ({"Temp": "Infinity"}, "Temp", math.inf, True),
+    ({"Temp": " -Infinity"}, "Temp", -math.inf, True),
+    ({"Temp": [21.5]}, "Temp", 21.5, True),
+    ({"Temp": [["2"]]}, "Temp", 2.0, True),
+    ({"Temp": []}, "Temp", 0.0, True),
+    ({"Temp": [1, 2]}, "Temp", 0.0, False),
+    ({"GasADC": "0x1_0"}, "GasADC", 0, False),
+    # Integer fields: truncated, invalid when out of range
+    ({"GasADC": 3.9}, "GasADC", 3, True),
+    ({"GasADC": -3.9}, "GasADC", -3, True),
+    ({"GasADC": "7.5"}, "GasADC", 7, True),
+    ({"Seq": 2**31 - 1}, "Seq", 2**31 - 1, True),
+    ({"Seq": 2**31}, "Seq", 0, False),
+    ({"Step": -32768}, "Step", -32768, True),
+    ({"Step": 40000}, "Step", 0, False),
+    ({"Duration": 1e300}, "Duration", 0, False),
+    ({"GasADC": "Infinity"}, "GasADC", 0, False),
+    ({"Seq": 10**400}, "Seq", 0, False),
+    # Status: numbers kept, anything else as a string, "" when missing
+    ({"Status": 3}, "Status", 3, True),
+    ({"Status": 2.5}, "Status", 2.5, True),
+    ({"Status": "ok"}, "Status", "ok", True),
+    ({"Status": True}, "Status", "true", True),
+    ({"Status": {"a": 1}}, "Status", "[object Object]", True),
+    ({"Status": [1, 2]}, "Status", "1,2", True),
+    ({"Status": [1.0, None, "a", [False]]}, "Status", "1,,a,false", True),
+    ({"Status": None}, "Status", "", False),
+    (FORMAT_A, "Status", "", False),
+    # Not a record at all
+    ("offline", "Temp", 0.0, False),
+    (None, "Status", "", False),
+]
+
+
+@pytest.mark.parametrize("record, field, expected, expected_valid", CASES)
+def test_normalize_reading_cases(record, field, expected, expected_valid):
+    values, valid = normalize_records([record])[field]
+    assert values[0] == expected
+    assert bool(valid[0]) is expected_valid
+
+
+def test_dtypes():
+    result = normalize_records([FORMAT_A, FORMAT_B])
+    assert list(result) == list(FORMAT_B_FIELDS)
+    for field, (values, valid) in result.items():
+        assert values.dtype == np.dtype(NORMALIZED_DTYPES[field]) and valid.dtype == bool
+
+
+def test_batch_matches_single_records():
+    # Every grouping path: shared key sets, same-length key sets that differ, unknown keys, non-objects
+    records = [record for record, *_ in CASES] * 3 + [
+        {**FORMAT_B, "Seq": str(i)} for i in range(20)
+    ] + [{"Extra": 1, "Temp": "2"}, {"Other": 1, "Temp": 3}, [1, 2], 5]
+    batch = normalize_records(records)
+    for i, record in enumerate(records):
+        single = normalize_records([record])
+        for field in FORMAT_B_FIELDS:
+            assert batch[field][0][i] == single[field][0][0], (i, field)
+            assert batch[field][1][i] == single[field][1][0], (i, field)
+
+
+def test_empty_batch():
+    result = normalize_records([])
+    assert all(len(values) == len(valid) == 0 for values, valid in result.values())
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("42", 42.0), ("  -0.5\n", -0.5), ("", 0.0), ("0b101", 5.0), ("0o17", 15.0), (".5", 0.5),
+    ("abc", None), ("1_0", None), ("0x", None), ("0x1_0", None), ("-0x10", None), ("5.", 5.0), ("+.5e1", 5.0),
+    ("Infinity", math.inf), ("+Infinity", math.inf), ("-Infinity", -math.inf), ("1e999", math.inf),
+    ("infinity", None), ("inf", None), ("nan", None), ("٣", None),
+])
+def test_to_number(text, expected):
+    assert to_number(text) == expected
+
+
+def test_to_number_non_strings():
+    assert to_number(True) == 1.0 and to_number(7) == 7.0 and to_number(-10**400) == -math.inf
+    # Arrays go through String(): one element converts, none is 0, more are NaN
+    assert to_number([1]) == 1.0 and to_number([[" 5 "]]) == 5.0 and to_number([None]) == 0.0 and to_number([]) == 0.0
+    assert to_number([1, 2]) is None and to_number([True]) is None and to_number({}) is None
+
+
+def test_js_string_of_numbers():
+    numbers = [1.0, -2.5, 0.1, -0.0, 1e21, 1.5e-7, 0.000001, 123456789012345680000, 12345678901234567890, 10**400]
+    assert _js_string(numbers) == (
+        "1,-2.5,0.1,0,1e+21,1.5e-7,0.000001,123456789012345680000,12345678901234567000,Infinity"
+    )
+    assert _js_string(None) == "null" and _js_string({"a": [1]}) == "[object Object]"
@@ -0,0 +1,170 @@
+import json
+import struct
+
+import pytest
+
+from parquet_export import (
+    _BYTE, _I16, _I32, _I64, _PHYSICAL_TYPES, EXPORT_COLUMNS, _thrift_struct, export_parquet,
+)
+from record_store import RecordStore, build_record_store
+from timestamps import timestamp_key_to_ns
+
+TREE = {
+    "Device_1": {
+        "BME_01": {
+            "Hp_301": {
+                "2026-02-01_10-00-00_000000000": {"GasADC": 5, "Temp": 20.5, "Status": 176, "Step": 1},
+                "2026-02-01_10-00-01_000000000": {"gas_adc": 3, "temperature": "21.5", "Status": "OK", "Step": 2},
+                "2026-02-01_10-00-02_000000000": {"GasADC": 9, "Step": 3},
+                "2026-02-02_00-00-00_000000000": {"GasADC": 1, "Temp": -4.0, "Status": "ERR"},
+            },
+        },
+        "BME_02": {"Hp_301": {"2026-02-01_10-00-03_000000000": {"GasADC": 2, "Temp": 19.0}}},
+    },
+}
+FIRST_DAY = "Device_1/2026-02-01/Hp_301.parquet"
+SECOND_DAY = "Device_1/2026-02-02/Hp_301.parquet"
+
+
+def test_compact_field_headers_carry_the_thrift_type():
+    # (field id delta << 4) | compact type id, then the zigzag varint / byte value
+    assert _thrift_struct([(7, _I16, 3)]) == bytes([0x74, 0x06, 0x00])
+    assert _thrift_struct([(1, _BYTE, 16), (2, _I32, -1), (3, _I64, 300)]) == bytes(
+        [0x13, 0x10, 0x15, 0x01, 0x16, 0xD8, 0x04, 0x00]
+    )
+
+
+def _varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return result, pos
+
+
+def _value(data: bytes, pos: int, ftype: int) -> tuple:
+    if ftype in (1, 2):
+        return ftype == 1, pos
+    if ftype == _BYTE:
+        return struct.unpack_from("<b", data, pos)[0], pos + 1
+    if ftype in (_I16, _I32, _I64):
+        n, pos = _varint(data, pos)
+        return (n >> 1) ^ -(n & 1), pos
+    if ftype == 8:
+        size, pos = _varint(data, pos)
+        return data[pos:pos + size], pos + size
+    if ftype == 9:
+        size, elem_type = data[pos] >> 4, data[pos] & 0x0F
+        pos += 1
+        if size == 15:
+            size, pos = _varint(data, pos)
+        items = []
+        for _ in range(size):
+            item, pos = _value(data, pos, elem_type)
+            items.append(item)
+        return items, pos
+    if ftype == 12:
+        return _struct(data, pos)
+    raise AssertionError(f"unexpected thrift type {ftype}")
+
+
+def _struct(data: bytes, pos: int) -> tuple[dict, int]:
+    """Thrift compact-protocol struct at pos as {field id: value}."""
+    fields, last_id = {}, 0
+    while data[pos]:
+        delta, ftype = data[pos] >> 4, data[pos] & 0x0F
+        pos += 1
+        if delta:
+            field_id = last_id + delta
+        else:
+            n, pos = _varint(data, pos)
+            field_id = (n >> 1) ^ -(n & 1)
+        fields[field_id], pos = _value(data, pos, ftype)
+        last_id = field_id
+    return fields, pos + 1
+
+
+def _file_metadata(path) -> tuple[bytes, dict]:
+    data = path.read_bytes()
+    assert data[:4] == data[-4:] == b"PAR1"
+    (length,) = struct.unpack("<I", data[-8:-4])
+    metadata, end = _struct(data, len(data) - 8 - length)
+    assert end == len(data) - 8
+    return data, metadata
+
+
+def _statistics(metadata: dict) -> list[dict]:
+    """{column: (null count, min, max)} of every row group."""
+    return [
+        {chunk[3][3][0].decode(): (chunk[3][12][3], chunk[3][12].get(6), chunk[3][12].get(5)) for chunk in group[1]}
+        for group in metadata[4]
+    ]
+
+
+def _f32(value: float) -> bytes:
+    return struct.pack("<f", value)
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_footer_round_trip(tmp_path, compression):
+    build_record_store(TREE, str(tmp_path / "store"))
+    manifest = export_parquet(RecordStore(str(tmp_path / "store")), str(tmp_path / "out"), 3, compression)
+    assert {name: entry["rows"] for name, entry in manifest["files"].items()} == {FIRST_DAY: 4, SECOND_DAY: 1}
+    assert json.loads((tmp_path / "out" / "_manifest.json").read_text()) == manifest
+
+    data, metadata = _file_metadata(tmp_path / "out" / FIRST_DAY)
+    assert metadata[3] == 4
+    assert [group[3] for group in metadata[4]] == [3, 1]
+    root, *columns = metadata[2]
+    assert (root[4], root[5]) == (b"schema", len(EXPORT_COLUMNS))
+    assert [(c[4].decode(), c[1], c[3]) for c in columns] == [
+        (column.name, _PHYSICAL_TYPES[column.physical], int(column.optional)) for column in EXPORT_COLUMNS
+    ]
+    by_name = {c[4].decode(): c for c in columns}
+    assert by_name["Status"][6] == 0  # UTF8
+    assert by_name["Step"][6] == 16  # INT_16
+    assert by_name["timestamp_ns"][10][8][2] == {3: {}}  # TIMESTAMP(NANOS)
+
+    for group in metadata[4]:
+        for chunk in group[1]:
+            # Each chunk's data page is where its metadata says, and holds every row of the group
+            page, _ = _struct(data, chunk[3][9])
+            assert page[1] == 0 and page[5][1] == group[3]
+            assert chunk[3][4] == (2 if compression == "gzip" else 0)
+
+    first, second = _statistics(metadata)
+    ns = [timestamp_key_to_ns(f"2026-02-01_10-00-0{s}_000000000") for s in range(4)]
+    assert first["timestamp_ns"] == (0, struct.pack("<q", ns[0]), struct.pack("<q", ns[2]))
+    assert first["sensor"] == (0, b"BME_01", b"BME_01")
+    assert first["GasADC"] == (0, struct.pack("<i", 3), struct.pack("<i", 9))
+    assert first["Temp"] == (1, _f32(20.5), _f32(21.5))
+    assert first["Step"] == (0, struct.pack("<i", 1), struct.pack("<i", 3))
+    assert first["Status"] == (1, b"176", b"OK")
+    assert first["Press"] == (3, None, None)
+    assert second["sensor"] == (0, b"BME_02", b"BME_02")
+    assert second["GasADC"] == (0, struct.pack("<i", 2), struct.pack("<i", 2))
+    assert second["Status"] == (1, None, None)
+
+    _, metadata = _file_metadata(tmp_path / "out" / SECOND_DAY)
+    (only,) = _statistics(metadata)
+    assert only["Temp"] == (0, _f32(-4.0), _f32(-4.0))
+    assert only["Status"] == (0, b"ERR", b"ERR")
+
+
+def test_pyarrow_reads_the_export(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    build_record_store(TREE, str(tmp_path / "store"))
+    export_parquet(RecordStore(str(tmp_path / "store")), str(tmp_path / "out"), 3)
+    table = pq.read_table(tmp_path / "out" / FIRST_DAY)
+    assert table.column("sensor").to_pylist() == ["BME_01", "BME_01", "BME_01", "BME_02"]
+    assert table.column("GasADC").to_pylist() == [5, 3, 9, 2]
+    assert table.column("Temp").to_pylist() == [20.5, 21.5, None, 19.0]
+    assert table.column("Status").to_pylist() == ["176", "OK", None, None]
+    assert table.column("Step").to_pylist() == [1, 2, 3, None]
+    assert str(table.schema.field("timestamp_ns").type) == "timestamp[ns]"
+    metadata = pq.ParquetFile(tmp_path / "out" / FIRST_DAY).metadata
+    statistics = metadata.row_group(0).column(table.schema.get_field_index("GasADC")).statistics
+    assert (statistics.min, statistics.max, statistics.null_count) == (3, 9, 0)
@@ -0,0 +1,121 @@
+import math
+
+import numpy as np
+import pytest
+
+from extract_firebase_schema import SchemaVisitor
+from generate_dataset import DatasetConfig, generate_tree
+from partial_schema import PARTIAL_SCHEMA_VERSION, QUANTILES, PartialSchema
+from test_quantile_sketch import MAX_RANK_ERROR
+
+
+def _tree() -> dict:
+    tree = generate_tree(DatasetConfig(devices=2, sensors=2, records=6000, seed=11))
+    hp = tree["Device_1"]["BME_01"]["Hp_301"]
+    # Messy records: strings, nulls, unknown key sets and a malformed key, spread over the time range
+    keys = sorted(hp)
+    hp[keys[10]] = {**hp[keys[10]], "GasADC": "17"}
+    hp[keys[2000 % len(keys)]] = {"GasADC": None, "Extra": [1, 2]}
+    hp["not-a-key"] = {"Temp": 1}
+    tree["Device_3"] = "offline"
+    return tree
+
+
+def _time_slices(tree: dict, parts: int) -> list[dict]:
+    """The tree cut into consecutive time slices, so every Hp path appears in several partials."""
+    slices = [{} for _ in range(parts)]
+    for device_id, device_data in tree.items():
+        if not isinstance(device_data, dict):
+            slices[0][device_id] = device_data
+            continue
+        for sensor_id, sensor_data in device_data.items():
+            for hp_id, records in sensor_data.items():
+                keys = sorted(records)
+                for i, part in enumerate(slices):
+                    chunk = keys[i * len(keys) // parts:(i + 1) * len(keys) // parts]
+                    part.setdefault(device_id, {}).setdefault(sensor_id, {})[hp_id] = {k: records[k] for k in chunk}
+    return slices
+
+
+def _visit(tree: dict) -> PartialSchema:
+    visitor = SchemaVisitor(value_stats=True, map_formats=True)
+    visitor.visit_tree(tree)
+    return visitor
+
+
+def _copy(partial: PartialSchema) -> PartialSchema:
+    return PartialSchema.from_state(partial.to_state())
+
+
+def _assert_same_schema(left, right, path=""):
+    """
+    Equal schemas, up to float rounding of sums (means); the approximate quantiles and the
+    first-seen samples depend on the visit order and are left out.
+    """
+    if isinstance(left, dict) and isinstance(right, dict):
+        assert left.keys() == right.keys(), path
+        for key in left:
+            if key not in ("quantiles", "sample"):
+                _assert_same_schema(left[key], right[key], f"{path}/{key}")
+    elif isinstance(left, list) and isinstance(right, list):
+        assert len(left) == len(right), path
+        for i, (a, b) in enumerate(zip(left, right)):
+            _assert_same_schema(a, b, f"{path}[{i}]")
+    elif isinstance(left, float) and isinstance(right, float):
+        assert math.isclose(left, right, rel_tol=1e-12), path
+    else:
+        assert left == right, path
+
+
+def _assert_quantiles_within_bound(schema: dict, tree: dict) -> None:
+    quantiles = schema["record_fields"]["quantiles"]
+    assert quantiles
+    for path, fields in quantiles.items():
+        device_id, sensor_id, hp_id = path.split("/")
+        records = tree[device_id][sensor_id][hp_id].values()
+        for field, values in fields.items():
+            data = np.sort([r[field] for r in records if isinstance(r.get(field), (int, float))])
+            for name, fraction in QUANTILES.items():
+                low = np.searchsorted(data, values[name], side="left") / len(data)
+                high = np.searchsorted(data, values[name], side="right") / len(data)
+                assert low - MAX_RANK_ERROR <= fraction <= high + MAX_RANK_ERROR, (path, field, name)
+
+
+def test_merge_is_associative_and_matches_one_pass():
+    tree = _tree()
+    a, b, c = map(_visit, _time_slices(tree, 3))
+    left = _copy(a).merge(_copy(b)).merge(_copy(c))
+    right = _copy(a).merge(_copy(b).merge(_copy(c)))
+    whole = _visit(tree)
+
+    # Everything but the KLL sketches merges exactly, in any grouping
+    for partial in (right, whole):
+        assert partial.total_records == left.total_records
+        assert partial.signatures == left.signatures
+        assert partial.field_ranges == left.field_ranges
+        assert partial.hp_time_ranges == left.hp_time_ranges
+        assert partial.path_formats == left.path_formats
+        assert partial.malformed_keys == left.malformed_keys
+        _assert_same_schema(partial.schema(), left.schema())
+    for partial in (left, right, whole):
+        _assert_quantiles_within_bound(partial.schema(), tree)
+
+
+def test_state_round_trip():
+    partial = _visit(_tree())
+    state = partial.to_state()
+    restored = PartialSchema.from_state(state)
+    assert restored.to_state() == state
+    assert PartialSchema.loads(partial.dumps()).to_state() == state
+    _assert_same_schema(restored.schema(), partial.schema())
+    assert restored.schema()["record_fields"]["quantiles"] == partial.schema()["record_fields"]["quantiles"]
+
+
+def test_states_of_other_versions_are_rejected():
+    state = PartialSchema().to_state()
+    assert state["version"] == PARTIAL_SCHEMA_VERSION
+    PartialSchema.from_state(state)
+    for version in (None, 1, PARTIAL_SCHEMA_VERSION - 1, PARTIAL_SCHEMA_VERSION + 1):
+        stale = {**state, "version": version} if version is not None else {k: v for k, v in state.items() if k != "version"}
+        with pytest.raises(ValueError, match="version"):
+            PartialSchema.from_state(stale)
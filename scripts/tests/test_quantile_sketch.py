@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from field_stats import KLL_K, QuantileSketch
+
+FRACTIONS = np.linspace(0, 1, 101)
+# Documented bound for k = 200 (field_stats.KLL_K)
+MAX_RANK_ERROR = 0.017
+
+
+def _rank_error(data: np.ndarray, sketch: QuantileSketch) -> float:
+    """Largest distance between a requested rank and the rank range of the value the sketch answered."""
+    data = np.sort(data)
+    worst = 0.0
+    for fraction, value in zip(FRACTIONS, sketch.quantiles(FRACTIONS)):
+        low = np.searchsorted(data, value, side="left") / len(data)
+        high = np.searchsorted(data, value, side="right") / len(data)
+        worst = max(worst, 0.0 if low <= fraction <= high else min(abs(low - fraction), abs(high - fraction)))
+    return worst
+
+
+def _datasets():
+    rng = np.random.default_rng(7)
+    n = 200_000
+    return {
+        "normal": rng.normal(size=n),
+        "sorted": np.arange(n, dtype=np.float64),
+        "reversed": np.arange(n, dtype=np.float64)[::-1].copy(),
+        "lognormal": rng.lognormal(0, 2, n),
+        "ties": rng.integers(0, 20, n).astype(np.float64),
+    }
+
+
+@pytest.mark.parametrize("name", list(_datasets()))
+def test_rank_error_of_merged_sketches(name):
+    data = _datasets()[name]
+    rng = np.random.default_rng(len(name))
+    single = QuantileSketch()
+    for chunk in np.array_split(data, 97):
+        single.update(chunk)
+    # Uneven shards merged in a random tree order, as shards, processes and sync runs combine
+    parts = []
+    for chunk in np.array_split(data, np.sort(rng.integers(1, len(data), 40))):
+        sketch = QuantileSketch()
+        sketch.update(chunk)
+        parts.append(sketch)
+    while len(parts) > 1:
+        i = int(rng.integers(0, len(parts) - 1))
+        parts[i].merge(parts.pop(i + 1))
+    merged = parts[0]
+
+    for sketch in (single, merged):
+        assert sketch.n == len(data)
+        assert _rank_error(data, sketch) <= MAX_RANK_ERROR
+        # Memory stays O(k) however many values and merges went in
+        assert sum(map(len, sketch.levels)) <= 3 * KLL_K
+
+
+def test_nan_is_ignored_and_empty_sketch_has_no_quantiles():
+    sketch = QuantileSketch()
+    assert sketch.quantiles([0.5]) == [None]
+    sketch.update(np.array([np.nan, 1.0, 2.0, 3.0, np.nan]))
+    assert sketch.n == 3
+    assert sketch.quantiles([0.0, 0.5, 1.0]) == [1.0, 2.0, 3.0]
+
+
+def test_state_round_trip_and_k_mismatch():
+    sketch = QuantileSketch()
+    sketch.update(np.random.default_rng(1).normal(size=10_000))
+    restored = QuantileSketch.from_state(sketch.to_state())
+    assert restored.quantiles(FRACTIONS) == sketch.quantiles(FRACTIONS)
+    assert restored.to_state() == sketch.to_state()
+    with pytest.raises(ValueError):
+        sketch.merge(QuantileSketch(k=100))
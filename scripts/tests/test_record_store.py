@@ -0,0 +1,65 @@
+import numpy as np
+
+from record_store import MISSING_INT, RecordStore, RecordStoreWriter, build_record_store
+from rtdb_stream import iter_tree_records
+from timestamps import timestamp_key_to_ns
+
+TREE = {
+    "Device_1": {
+        "BME_02": {
+            "Hp_301": {
+                "2026-02-01_10-00-05_000000000": {"GasADC": 5, "GasRes": 1.5e6, "Step": 2, "Status": "OK"},
+                "2026-02-01_10-00-01_000000000": {"GasADC": 1, "Step": 1, "Status": 0},
+                "not-a-timestamp": {"GasADC": 9},
+            },
+        },
+        "BME_01": {
+            "Hp_301": {"2026-02-01_10-00-03_000000000": {"gas_adc": 3, "humidity": "41.5", "extra": 1}},
+            "Hp_321": {"2026-02-01_11-00-00_000000000": "not a record"},
+        },
+    },
+    "Device_2": "primitive",
+}
+
+
+def test_partitions_are_time_sorted_columns(tmp_path):
+    manifest = build_record_store(TREE, str(tmp_path))
+    store = RecordStore(str(tmp_path))
+    assert store.partitions() == [("Device_1", "Hp_301")]
+    assert manifest["partitions"]["Device_1/Hp_301"]["rows"] == 3
+    assert manifest["skipped"]["bad_timestamp"] == 1
+    assert manifest["skipped"]["bad_timestamp_examples"] == ["not-a-timestamp"]
+    assert manifest["skipped"]["not_a_record"] == 1
+    assert manifest["skipped"]["unknown_fields"] == {"extra": 1}
+
+    part = store.partition("Device_1", "Hp_301")
+    keys = ["2026-02-01_10-00-01_000000000", "2026-02-01_10-00-03_000000000", "2026-02-01_10-00-05_000000000"]
+    assert part["timestamp_ns"].tolist() == [timestamp_key_to_ns(key) for key in keys]
+    assert store.sensor_ids(part["sensor"]).tolist() == ["BME_02", "BME_01", "BME_02"]
+    assert part["GasADC"].tolist() == [1, MISSING_INT["int32"], 5]
+    assert part["gas_adc"].tolist() == [MISSING_INT["int32"], 3, MISSING_INT["int32"]]
+    assert part["humidity"][1] == np.float32(41.5)
+    assert np.isnan(part["GasRes"][:2]).all() and part["GasRes"][2] == np.float32(1.5e6)
+    statuses = manifest["categories"]["Status"]
+    assert [statuses[code] if code >= 0 else None for code in part["Status"]] == [0, None, "OK"]
+
+
+def test_streamed_writer_matches_the_tree_build(tmp_path):
+    build_record_store(TREE, str(tmp_path / "tree"))
+    writer = RecordStoreWriter(str(tmp_path / "stream"))
+    events = list(writer.tap(iter_tree_records(TREE)))
+    writer.close()
+    assert events == list(iter_tree_records(TREE))
+    tree, stream = RecordStore(str(tmp_path / "tree")), RecordStore(str(tmp_path / "stream"))
+    for field in tree.manifest["fields"]:
+        np.testing.assert_array_equal(tree.column("Device_1", "Hp_301", field), stream.column("Device_1", "Hp_301", field))
+
+
+def test_more_categories_than_int16_holds(tmp_path):
+    count = 40000
+    hp = {f"2026-02-01_10-00-00_{i}": {"Status": f"code {i}", "Step": 1} for i in range(count)}
+    manifest = build_record_store({"Device_1": {"BME_01": {"Hp_301": hp}}}, str(tmp_path))
+    codes = RecordStore(str(tmp_path)).column("Device_1", "Hp_301", "Status")
+    assert codes.dtype == np.int32 and len(manifest["categories"]["Status"]) == count
+    statuses = manifest["categories"]["Status"]
+    assert sorted(statuses[code] for code in codes.tolist()) == sorted(record["Status"] for record in hp.values())
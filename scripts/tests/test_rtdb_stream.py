@@ -0,0 +1,100 @@
+import json
+import random
+
+import pytest
+import requests
+
+import firebase_rest
+from conftest import SNAPSHOT
+from rtdb_stream import RecordStream, RecordStreamParser, iter_tree_records
+
+# Escapes, non-ASCII text, numbers of every form, nested record values, and nodes above record
+# level that are primitives or empty objects
+TRICKY = {
+    "Device_1": {
+        "BME_01": {
+            "Hp_301": {
+                "2026-02-01_10-00-00_000000000": {"GasADC": -12, "Temp": 2.5e-3, "Hum": 1E+2, "Seq": 0},
+                "2026-02-01_10-00-01_000000000": {"Status": "a \"quoted\" \\ path\n\t\u00e9 \u2603 é", "Extra": [1, [2, {}]]},
+                "2026-02-01_10-00-02_000000000": {"nested": {"a": {"b": "}]"}}, "flag": True, "none": None},
+                "key with \"escape\"": "primitive record",
+                "2026-02-01_10-00-03_000000000": 123456789012345678901234567890,
+                "2026-02-01_10-00-04_000000000": None,
+                "2026-02-01_10-00-05_000000000": [],
+            },
+            "Hp_302": 5,
+            "Hp_303": {},
+            "Hp_304": "x",
+        },
+        "BME_02": {},
+        "BME_03": None,
+    },
+    "Device_2": "offline",
+    "Device_3": {},
+    "Dévice_4": {"BME_01": {"Hp_301": {"2026-02-01_10-00-00_1": {"Temp": -0.0}}}},
+}
+
+
+def _parse(chunks) -> list:
+    parser = RecordStreamParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    events.extend(parser.close())
+    return events
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_one_character_chunks_match_the_tree_walk(indent):
+    text = json.dumps(TRICKY, indent=indent, ensure_ascii=False)
+    assert _parse(text) == list(iter_tree_records(TRICKY))
+    # The same through RecordStream, with UTF-8 sequences split across byte chunks
+    data = text.encode()
+    assert list(RecordStream(data[i:i + 1] for i in range(len(data)))) == list(iter_tree_records(TRICKY))
+
+
+def test_every_chunk_boundary():
+    # Two chunks split at every position: inside keys, strings, escapes, numbers and literals
+    text = json.dumps(TRICKY)
+    expected = list(iter_tree_records(TRICKY))
+    for cut in range(len(text) + 1):
+        assert _parse([text[:cut], text[cut:]]) == expected, cut
+
+
+def test_truncated_input_raises():
+    text = json.dumps(TRICKY)
+    for end in range(len(text)):
+        with pytest.raises(ValueError):
+            _parse([text[:end]])
+
+
+@pytest.mark.parametrize("text", [
+    '{"a" 1}',
+    '{"a":1,}',
+    '{1:2}',
+    '{"a":{"b":1]}',
+    '{"a":1}}',
+    '{"a":1} x',
+    '{"D":{"B":{"H":{"k":tru}}}}',
+    '{"D":{"B":{"H":{"k":{"v":1}}}',
+    '{"D":{"B":{"H":{"k":"unterminated}}}}',
+    '{"D":{"B":{"H":{"k":{"v":[1,2}}}}}',
+])
+def test_malformed_input_raises(text):
+    with pytest.raises(ValueError):
+        _parse([text])
+    with pytest.raises(ValueError):
+        _parse(text)
+
+
+def test_stream_from_firebase_retries_transient_errors(rtdb):
+    random.seed(1)
+    rtdb.error_rate = 0.5
+    assert list(RecordStream.from_firebase("", chunk_size=97)) == list(iter_tree_records(SNAPSHOT))
+
+
+def test_stream_from_firebase_gives_up_after_the_retries(rtdb, monkeypatch):
+    monkeypatch.setattr(firebase_rest, "RETRY", firebase_rest.RetryPolicy(retries=2, base_delay=0.001))
+    rtdb.error_rate = 1.0
+    with pytest.raises(requests.HTTPError):
+        list(RecordStream.from_firebase(""))
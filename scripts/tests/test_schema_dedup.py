@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from extract_firebase_schema import build_detailed_schema, iter_detailed_schema
+from generate_dataset import DatasetConfig, generate_tree
+from schema_dedup import SAMPLE_FIELDS, dedup_detailed_schema, expand_detailed_schema
+
+
+def _trees() -> list:
+    tree = generate_tree(DatasetConfig(devices=3, sensors=2, records=400, seed=4))
+    messy = json.loads(json.dumps(tree))
+    hp = messy["Device_1"]["BME_01"]["Hp_301"]
+    hp[next(iter(hp))] = {"GasADC": None, "Extra": {"nested": [1, "a", None]}}
+    messy["Device_2"]["BME_02"] = {}
+    messy["Device_3"] = "offline"
+    messy["Config"] = {"interval": 5, "tags": ["a", "b"], "empty": []}
+    return [tree, messy, {}, [1, {"a": 2}], "scalar", None]
+
+
+def _strip_samples(node, record_path=None):
+    """The detailed schema as expanded without samples: no sample fields, record schemas under ".../?"."""
+    if not isinstance(node, dict):
+        return node
+    stripped = {}
+    for key, value in node.items():
+        if key in SAMPLE_FIELDS:
+            continue
+        if key == "_path" and record_path:
+            value = record_path[1] + value[len(record_path[0]):]
+        elif key == "_record_schema":
+            value = _strip_samples(value, (value["_path"], f"{stripped['_path']}/?"))
+        else:
+            value = _strip_samples(value, record_path)
+        stripped[key] = value
+    return stripped
+
+
+@pytest.mark.parametrize("tree", _trees())
+@pytest.mark.parametrize("path, limits", [
+    ("root", {}),
+    ("", {}),
+    ("root", {"max_depth": 3}),
+    ("root", {"max_breadth": 2}),
+    ("root", {"max_depth": 1, "max_breadth": 1}),
+])
+def test_expand_reverses_dedup(tree, path, limits):
+    detailed = build_detailed_schema(tree, path, **limits)
+    deduped = dedup_detailed_schema(iter_detailed_schema(tree, path, **limits))
+    assert expand_detailed_schema(deduped) == detailed
+    # Survives a JSON round trip, as written by --dedup
+    assert expand_detailed_schema(json.loads(json.dumps(deduped))) == json.loads(json.dumps(detailed))
+
+    without_samples = dedup_detailed_schema(iter_detailed_schema(tree, path, **limits), keep_samples=False)
+    assert expand_detailed_schema(without_samples) == _strip_samples(detailed)
+
+
+def test_identical_subtrees_share_a_shape():
+    tree = generate_tree(DatasetConfig(devices=4, sensors=3, records=200, seed=4))
+    deduped = dedup_detailed_schema(iter_detailed_schema(tree, "root"), keep_samples=False)
+    devices = expand_detailed_schema(deduped)["_children"]
+    assert len(devices) == 4
+    root = deduped["shapes"][deduped["root"]]
+    assert len(set(root["_children"].values())) < len(root["_children"])
+
+
+def test_unknown_version_is_rejected():
+    deduped = dedup_detailed_schema(iter_detailed_schema({"a": 1}, "root"))
+    with pytest.raises(ValueError, match="dedup format"):
+        expand_detailed_schema({**deduped, "_dedup": 0})
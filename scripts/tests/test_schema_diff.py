@@ -0,0 +1,31 @@
+import json
+import sys
+
+import schema_diff
+from schema_diff import EXIT_ERROR, diff_schemas, has_drift
+
+
+def _schema(field_types: dict) -> dict:
+    return {"complete_schema": {"levels": {}, "record_fields": {"field_types": field_types}}}
+
+
+def test_legacy_field_types_without_type_counts():
+    legacy = _schema({"GasADC": {"type": "integer", "sample": 0}, "Temp": {"type": "number", "sample": 0.5}})
+    current = _schema({
+        "GasADC": {"type": "integer", "types": {"integer": 10}, "sample": 1},
+        "Temp": {"type": "mixed", "types": {"number": 9, "string": 1}, "sample": 1.5},
+    })
+    assert not has_drift(diff_schemas(legacy, legacy))
+    changes = diff_schemas(legacy, current)["drift"]["type_changes"]
+    assert changes == [{
+        "field": "Temp",
+        "old": {"type": "number", "types": ["number"]},
+        "new": {"type": "mixed", "types": ["number", "string"]},
+    }]
+
+
+def test_unexpected_failure_is_not_reported_as_drift(tmp_path, monkeypatch):
+    old = tmp_path / "old.json"
+    old.write_text(json.dumps({"levels": {}, "record_fields": {"field_types": {"GasADC": "integer"}}}))
+    monkeypatch.setattr(sys, "argv", ["schema_diff.py", str(old), str(old)])
+    assert schema_diff.main() == EXIT_ERROR
@@ -0,0 +1,149 @@
+import time
+
+import numpy as np
+import pytest
+
+from timestamps import (
+    INVALID_NS, NS_PER_SECOND, ns_to_timestamp_key, parse_time_bound, parse_timestamp_keys, timestamp_key_to_ns,
+    window_key_range,
+)
+
+VALID = [
+    "2026-02-02_09-38-35_398398000",
+    "2026-02-02_09-38-35_7",  # short fractions are nanosecond counts, as in the dashboard
+    "1970-01-01_00-00-00_000000000",
+    "2024-02-29_23-59-59_999999999",
+    "2000-02-29_12-00-00_1",
+    "1678-01-01_00-00-00_0",
+    "2261-12-31_23-59-59_0",
+]
+MALFORMED = [
+    "",
+    "not a timestamp",
+    "2026-02-02_09-38-35",  # no fraction
+    "2026-02-02_09-38-35_",
+    "2026-02-02_09-38-35_1234567890",  # ten fraction digits
+    "2026-02-02 09-38-35_398398000",
+    "2026-02-02_09:38:35_398398000",
+    "2026-13-01_00-00-00_0",
+    "2026-00-01_00-00-00_0",
+    "2025-02-29_00-00-00_0",  # not a leap year
+    "1900-02-29_00-00-00_0",
+    "2026-04-31_00-00-00_0",
+    "2026-02-02_24-00-00_0",
+    "2026-02-02_09-60-00_0",
+    "2026-02-02_09-38-60_0",
+    "1677-12-31_23-59-59_0",  # outside int64 nanoseconds
+    "2262-01-01_00-00-00_0",
+    "2026-02-02_09-38-35_39839800a",
+    "２０２６-02-02_09-38-35_0",  # non-ASCII digits
+    "-2026-02-02_09-38-35_0",
+    "2026-02-02_09-38-35_0\n",
+]
+
+
+def test_valid_keys_match_the_scalar_parser_and_numpy():
+    ns, malformed = parse_timestamp_keys(VALID)
+    assert len(malformed) == 0
+    assert ns.tolist() == [timestamp_key_to_ns(key) for key in VALID]
+    seconds = np.array([f"{k[:10]}T{k[11:13]}:{k[14:16]}:{k[17:19]}" for k in VALID], dtype="datetime64[ns]")
+    nanos = [int(k[20:]) for k in VALID]
+    assert ns.tolist() == (seconds.astype(np.int64) + nanos).tolist()
+
+
+def test_malformed_keys_are_flagged_not_zeroed():
+    keys = [key for pair in zip(VALID * 3, MALFORMED) for key in pair]
+    ns, malformed = parse_timestamp_keys(keys)
+    assert malformed.tolist() == list(range(1, len(keys), 2))
+    assert (ns[malformed] == INVALID_NS).all()
+    assert ns[0::2].tolist() == [timestamp_key_to_ns(key) for key in keys[0::2]]
+    assert all(timestamp_key_to_ns(key) is None for key in MALFORMED)
+
+
+def test_keys_of_one_width_match_the_scalar_parser():
+    # A batch of one key width takes the joined-buffer path instead of the padded matrix
+    by_width = {}
+    for key in VALID + MALFORMED:
+        by_width.setdefault(len(key), []).append(key)
+    for keys in by_width.values():
+        ns, malformed = parse_timestamp_keys(keys * 2)
+        expected = [timestamp_key_to_ns(key) for key in keys * 2]
+        assert ns.tolist() == [INVALID_NS if value is None else value for value in expected]
+        assert malformed.tolist() == [i for i, value in enumerate(expected) if value is None]
+
+
+def test_empty_input():
+    ns, malformed = parse_timestamp_keys([])
+    assert ns.dtype == np.int64 and len(ns) == 0 and len(malformed) == 0
+
+
+def test_key_round_trip():
+    ns = timestamp_key_to_ns("2026-02-02_09-38-35_398398000")
+    assert ns_to_timestamp_key(ns) == "2026-02-02_09-38-35_398398000"
+
+
+def test_time_bounds_and_key_window():
+    now = timestamp_key_to_ns("2026-02-02_12-00-00_000000000")
+    assert parse_time_bound("90m", now_ns=now) == now - 90 * 60 * NS_PER_SECOND
+    assert parse_time_bound("2026-02-02", now_ns=now) == now - 12 * 3600 * NS_PER_SECOND
+    assert parse_time_bound("2026-02-02T12:00:00Z") == now
+    with pytest.raises(ValueError):
+        parse_time_bound("yesterday")
+    assert window_key_range(now, now + NS_PER_SECOND) == ("2026-02-02_12-00-00", "2026-02-02_12-00-00_~")
+
+
+NOW = timestamp_key_to_ns("2026-02-02_12-00-00_000000000")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("30s", NOW - 30 * NS_PER_SECOND),
+    ("90m", NOW - 90 * 60 * NS_PER_SECOND),
+    ("1.5h", NOW - 5400 * NS_PER_SECOND),
+    (" 7d ", NOW - 7 * 86400 * NS_PER_SECOND),
+    ("2w", NOW - 14 * 86400 * NS_PER_SECOND),
+    ("2026-02-02", NOW - 12 * 3600 * NS_PER_SECOND),
+    ("2026-02-02T06:00", NOW - 6 * 3600 * NS_PER_SECOND),
+    ("2026-02-02T12:00:00Z", NOW),
+    ("2026-02-02T12:00:00.000000005", NOW + 5),
+    ("2026-02-02_12-00-00_5", NOW + 5),  # a timestamp key: the fraction is a nanosecond count
+])
+def test_parse_time_bound(text, expected):
+    assert parse_time_bound(text, now_ns=NOW) == expected
+
+
+@pytest.mark.parametrize("text", ["", "NaT", "yesterday", "5x", "-1h", "h", "2026-13-01", "2026-02-30"])
+def test_parse_time_bound_rejects(text):
+    with pytest.raises(ValueError):
+        parse_time_bound(text, now_ns=NOW)
+
+
+def test_relative_bounds_count_back_from_the_clock():
+    before = time.time_ns()
+    value = parse_time_bound("1h")
+    assert before - 3600 * NS_PER_SECOND <= value <= time.time_ns() - 3600 * NS_PER_SECOND
+
+
+@pytest.mark.parametrize("since, until", [
+    ("2026-02-01_10-00-05_500000000", "2026-02-01_10-00-07_250000000"),
+    ("2026-02-01_10-00-05_000000000", "2026-02-01_10-00-07_000000000"),
+    (None, "2026-02-01_10-00-06_000000001"),
+    ("2026-02-01_10-00-06_999999999", None),
+])
+def test_key_window_covers_keys_of_every_width(since, until):
+    since_ns = timestamp_key_to_ns(since) if since else None
+    until_ns = timestamp_key_to_ns(until) if until else None
+    start_at, end_at = window_key_range(since_ns, until_ns)
+    fractions = ["0", "1", "5", "25", "49", "250000000", "500000000", "500000001", "000000001", "999999999"]
+    keys = [f"2026-02-01_10-00-{second:02d}_{fraction}" for second in range(3, 10) for fraction in fractions]
+    seconds = {
+        key[:19] for key in keys
+        if (since_ns is None or timestamp_key_to_ns(key[:19] + "_999999999") >= since_ns)
+        and (until_ns is None or timestamp_key_to_ns(key[:19] + "_0") < until_ns)
+    }
+    for key in keys:
+        ns = timestamp_key_to_ns(key)
+        in_window = (since_ns is None or ns >= since_ns) and (until_ns is None or ns < until_ns)
+        in_bounds = (start_at is None or key >= start_at) and (end_at is None or key <= end_at)
+        # The bounds hold exactly the whole seconds the window touches, whatever the fraction width
+        assert in_bounds == (key[:19] in seconds), key
+        assert in_bounds or not in_window, key
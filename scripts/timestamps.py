@@ -0,0 +1,188 @@
+"""
+Timestamp keys of heater-profile nodes: YYYY-MM-DD_HH-MM-SS_nanoseconds
+(e.g. 2026-02-02_09-38-35_398398000).
+
+Keys carry no timezone; they are converted as UTC wall-clock time, so the
+resulting epoch nanoseconds order and subtract correctly but are not shifted
+to the device's local zone. The trailing part is an integer nanosecond count,
+as in the dashboard's parseTimestampToSecondsWithNanos.
+"""
+
+import re
+import time
+from datetime import date
+from typing import Optional, Sequence
+
+import numpy as np
+
+_KEY_PARTS = re.compile(r"(\d{4})-(\d{2})-(\d{2})_(\d{2})-(\d{2})-(\d{2})_(\d{1,9})", re.ASCII)
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NS_PER_SECOND = 1_000_000_000
+# Whole years representable as int64 epoch nanoseconds
+MIN_YEAR, MAX_YEAR = 1678, 2261
+
+
+def timestamp_key_to_ns(key: str) -> Optional[int]:
+    """Convert one timestamp key to epoch nanoseconds; None if the key is malformed."""
+    match = _KEY_PARTS.fullmatch(key)
+    if not match:
+        return None
+    year, month, day, hour, minute, second, nanos = map(int, match.groups())
+    if not MIN_YEAR <= year <= MAX_YEAR or hour > 23 or minute > 59 or second > 59:
+        return None
+    try:
+        days = date(year, month, day).toordinal() - _EPOCH_ORDINAL
+    except ValueError:
+        return None
+    return (days * 86400 + hour * 3600 + minute * 60 + second) * NS_PER_SECOND + nanos
+
+
+# Sentinel stored in place of malformed keys; they are also returned separately by index
+INVALID_NS = int(np.iinfo(np.int64).min)
+
+_MIN_KEY_LEN = 21  # one nanosecond digit
+_MAX_KEY_LEN = 29  # nine nanosecond digits
+# Separators sit every third column from 4 to 19: "--_--_"
+_SEPARATOR_COLUMNS = slice(4, 20, 3)
+_SEPARATORS = np.frombuffer(b"--_--_", dtype=np.uint8)
+# Tens and units columns of the two-digit groups: century, year of century, month, day, hour, minute, second
+_TENS_COLUMNS = [0, 2, 5, 8, 11, 14, 17]
+_UNITS_COLUMNS = [1, 3, 6, 9, 12, 15, 18]
+_DIGIT_COUNT_WEIGHTS = np.ones(_MAX_KEY_LEN, dtype=np.float32)
+# Place values of the nanosecond digits (float64 is exact: nine digits stay below 2 ** 53)
+_FRACTION_WEIGHTS = 10.0 ** np.arange(_MAX_KEY_LEN - 20)[::-1]
+# 10 ** (number of fraction digits missing from a key of each length)
+_FRACTION_SCALE = 10 ** np.clip(_MAX_KEY_LEN - np.arange(_MAX_KEY_LEN + 1), 0, _MAX_KEY_LEN - 20).astype(np.int64)
+
+
+def _month_tables() -> tuple[np.ndarray, np.ndarray]:
+    """
+    Epoch day before the first day, and number of days, of every month, indexed by year * 16 + month for
+    any four-digit year and month below 16; zero days for months that are not valid in int64 nanoseconds.
+    """
+    months = np.arange(
+        np.datetime64(f"{MIN_YEAR}-01", "M"), np.datetime64(f"{MAX_YEAR + 1}-01", "M") + 1, dtype="datetime64[M]",
+    )
+    first_days = months.astype("datetime64[D]").astype(np.int64)
+    years, month_numbers = np.divmod(months[:-1].astype(np.int64), 12)
+    index = (years + 1970) * 16 + month_numbers + 1
+    day_before, days = np.zeros(10000 * 16, dtype=np.int64), np.zeros(10000 * 16, dtype=np.uint8)
+    day_before[index], days[index] = first_days[:-1] - 1, np.diff(first_days)
+    return day_before, days
+
+
+_MONTH_DAY_BEFORE, _MONTH_DAYS = _month_tables()
+
+
+def parse_timestamp_keys(keys: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convert many timestamp keys to epoch nanoseconds in one vectorised pass.
+
+    Returns (ns, malformed): ns is an int64 array aligned with `keys` holding INVALID_NS for every
+    key that is not a valid YYYY-MM-DD_HH-MM-SS_nanoseconds timestamp, and malformed holds the
+    indices of those keys, so nothing is silently turned into 0.
+    """
+    n = len(keys)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    widths = set(map(len, keys))
+    width = widths.pop() if len(widths) == 1 else None
+    chars = lengths = None
+    if width is not None and _MIN_KEY_LEN <= width <= _MAX_KEY_LEN:
+        # Usual case, keys of one width: a byte matrix straight from the joined keys, no padding
+        try:
+            chars = np.frombuffer("".join(keys).encode("ascii"), dtype=np.uint8).reshape(n, width)
+        except UnicodeEncodeError:
+            pass
+    if chars is None:
+        width = _MAX_KEY_LEN
+        # Fixed-width byte matrix, one row per key; longer keys are truncated but already fail the length check
+        try:
+            chars = np.array(keys, dtype=f"S{width}").view(np.uint8).reshape(n, width)
+        except UnicodeEncodeError:
+            wide = np.array(keys, dtype=f"<U{width}").view(np.uint32).reshape(n, width)
+            chars = np.where(wide < 128, wide, 0).astype(np.uint8)
+        lengths = np.fromiter(map(len, keys), dtype=np.int64, count=n)
+
+    # Digit values; anything else (including the zero padding after a key) wraps around to > 9 and is zeroed
+    digits = chars - np.uint8(ord("0"))
+    well_formed = digits <= 9
+    digits *= well_formed
+    # Then well_formed marks the columns holding what the format expects there: a digit or the separator
+    well_formed[:, _SEPARATOR_COLUMNS] = chars[:, _SEPARATOR_COLUMNS] == _SEPARATORS
+    nanos = (digits[:, 20:] @ _FRACTION_WEIGHTS[_MAX_KEY_LEN - width:]).astype(np.int64)
+    if lengths is None:
+        valid = well_formed.view(f"S{width}")[:, 0] == b"\x01" * width
+    else:
+        # The padding is never well formed, so a key is when exactly its own columns are
+        valid = (lengths >= _MIN_KEY_LEN) & (lengths <= _MAX_KEY_LEN)
+        valid &= well_formed @ _DIGIT_COUNT_WEIGHTS == lengths
+        # The fraction was read as nine digits with the padding as zeros; drop the missing ones
+        nanos //= _FRACTION_SCALE[np.minimum(lengths, _MAX_KEY_LEN)]
+
+    # Two-digit groups fit uint8. Months outside 1-12 and years outside MIN_YEAR-MAX_YEAR have no days
+    # in the month tables, so no day fits them
+    groups = digits[:, _TENS_COLUMNS] * np.uint8(10) + digits[:, _UNITS_COLUMNS]
+    century, year_of_century, month, day, hour, minute, second = np.ascontiguousarray(groups.T)
+    month_index = century * np.int32(1600) + year_of_century * np.int32(16) + np.minimum(month, 15)
+    valid &= (day >= 1) & (day <= _MONTH_DAYS[month_index])
+    valid &= (hour <= 23) & (minute <= 59) & (second <= 59)
+
+    time_of_day = hour * np.int32(3600) + minute * np.int32(60) + second
+    seconds = (_MONTH_DAY_BEFORE[month_index] + day) * 86400 + time_of_day
+    ns = np.where(valid, seconds * NS_PER_SECOND + nanos, INVALID_NS)
+    return ns, np.flatnonzero(~valid)
+
+
+def format_ns(ns: int) -> str:
+    """Epoch nanoseconds -> ISO-8601 string with nanosecond precision."""
+    return str(np.datetime64(int(ns), "ns"))
+
+
+def ns_to_timestamp_key(ns: int) -> str:
+    """Epoch nanoseconds -> timestamp key (nine nanosecond digits, as the firmware writes them)."""
+    seconds, nanos = divmod(int(ns), NS_PER_SECOND)
+    text = str(np.datetime64(seconds, "s"))
+    return f"{text[:10]}_{text[11:13]}-{text[14:16]}-{text[17:19]}_{nanos:09d}"
+
+
+_RELATIVE = re.compile(r"^(\d+(?:\.\d+)?)([smhdw])$")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_time_bound(text: str, now_ns: Optional[int] = None) -> int:
+    """
+    Epoch nanoseconds for a --since / --until value: a duration back from now ("90m", "24h", "7d"),
+    an ISO date or date-time ("2026-02-01", "2026-02-01T10:00:00") or a timestamp key.
+    ISO times are UTC wall clock, like the keys themselves. Raises ValueError for anything else.
+    """
+    text = text.strip()
+    match = _RELATIVE.match(text)
+    if match:
+        if now_ns is None:
+            now_ns = time.time_ns()
+        return now_ns - round(float(match.group(1)) * _UNIT_SECONDS[match.group(2)] * NS_PER_SECOND)
+    ns = timestamp_key_to_ns(text)
+    if ns is not None:
+        return ns
+    try:
+        value = np.datetime64(text.rstrip("Z"), "ns")
+    except ValueError:
+        value = None
+    # numpy reads "" and "NaT" as not-a-time instead of failing
+    if value is None or np.isnat(value):
+        raise ValueError(f"Not a time: {text!r} (use e.g. 24h, 7d, 2026-02-01 or 2026-02-01T10:00:00)")
+    return int(value.astype(np.int64))
+
+
+def window_key_range(since_ns: Optional[int], until_ns: Optional[int]) -> tuple[Optional[str], Optional[str]]:
+    """
+    Inclusive (startAt, endAt) key bounds covering [since_ns, until_ns), whole seconds wide so they hold
+    for keys with any number of nanosecond digits. Keys a little outside the window (same second) can
+    fall inside the bounds; filter on the parsed times for the exact window.
+    """
+    start_at = ns_to_timestamp_key(since_ns)[:19] if since_ns is not None else None
+    # "~" sorts after every digit, so this is past any key of that second
+    end_at = ns_to_timestamp_key(until_ns - 1)[:19] + "_~" if until_ns is not None else None
+    return start_at, end_at